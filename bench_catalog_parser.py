@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark the products.ts lexer against the legacy regex extractors.
+
+Builds synthetic catalogs by repeating the real entries from
+src/data/products.ts with fresh ids (every 100th entry gets a
+description containing `}` ahead of its other fields, which the regexes
+silently drop) and times both approaches, plus loading the compiled
+catalog_artifact form (opening it for one lookup, and reading every
+product):
+
+    python bench_catalog_parser.py --sizes 1000 10000 50000
+"""
+
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import catalog
+import catalog_artifact
+
+# The patterns used by scrape_real_images / verify_and_fix_images before
+# the lexer replaced them
+LEGACY_URL_PATTERN = r'\{[^}]*id:\s*[\'"]([^\'"]*)[\'"][^}]*name:\s*[\'"]([^\'"]*)[\'"][^}]*url:\s*[\'"]([^\'"]*)[\'"][^}]*\}'
+LEGACY_IMAGE_PATTERN = r'\{[^}]*id:\s*[\'"]([^\'"]*)[\'"][^}]*name:\s*[\'"]([^\'"]*)[\'"][^}]*image:\s*[\'"]([^\'"]*)[\'"][^}]*category:\s*[\'"]([^\'"]*)[\'"][^}]*\}'
+
+BRACE_DESCRIPTION = "description: 'Ships with mounting kit {canopy, chain}, bulbs not included.',"
+
+
+def build_synthetic_catalog(size, source_path=catalog.PRODUCTS_FILE):
+    """
+    Return products.ts-style source with `size` entries
+    """
+    with open(source_path, 'rb') as f:
+        data = f.read()
+    records = catalog.parse_products(data)
+    templates = [data[record.start:record.end].decode('utf-8') for record in records]
+    id_pattern = re.compile(r"id:\s*'[^']*'")
+    description_pattern = re.compile(r"description:\s*'(?:[^'\\]|\\.)*',")
+
+    entries = []
+    for i in range(size):
+        entry = id_pattern.sub(f"id: '{9000000000000 + i}'", templates[i % len(templates)], count=1)
+        if i % 100 == 99:
+            # Description ahead of name/url, as field order is free in TS
+            entry = description_pattern.sub('', entry, count=1)
+            entry = entry.replace('{', '{\n    ' + BRACE_DESCRIPTION, 1)
+        entries.append('  ' + entry)
+
+    return ("import { Product } from '../types';\n\nexport const products: Product[] = [\n"
+            + ',\n'.join(entries) + '\n];\n')
+
+
+def time_it(func, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def time_artifact(parsed, source, repeat):
+    """
+    (seconds to open + look up one id, seconds to read every product)
+    from an artifact compiled in a scratch directory
+    """
+    workdir = tempfile.mkdtemp(prefix='brightet-artifact-')
+    try:
+        path = os.path.join(workdir, 'products.ts')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(source)
+        out_dir = os.path.join(workdir, 'catalog')
+        catalog_artifact.build_artifact(path, out_dir)
+        last_id = parsed.products[-1].id
+        lookup_time, _ = time_it(lambda: catalog_artifact.load_products(path, out_dir).get(last_id), repeat)
+        full_time, _ = time_it(lambda: catalog_artifact.load_products(path, out_dir).with_fields('id', 'image'),
+                               repeat)
+        return lookup_time, full_time
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run(sizes, repeat):
+    print(f"{'entries':>8} {'bytes':>11} {'regex (url)':>12} {'regex (img)':>12} {'lexer':>10} "
+          f"{'artifact 1':>11} {'artifact all':>13} {'regex found':>12} {'lexer found':>12}")
+    for size in sizes:
+        source = build_synthetic_catalog(size)
+        data = source.encode('utf-8')
+
+        url_time, url_matches = time_it(lambda: re.findall(LEGACY_URL_PATTERN, source, re.DOTALL), repeat)
+        image_time, image_matches = time_it(lambda: re.findall(LEGACY_IMAGE_PATTERN, source, re.DOTALL), repeat)
+        lexer_time, parsed = time_it(lambda: catalog.Catalog(data), repeat)
+        lookup_time, full_time = time_artifact(parsed, source, repeat)
+
+        print(f"{size:>8} {len(data):>11,} {url_time * 1000:>10.1f}ms {image_time * 1000:>10.1f}ms "
+              f"{lexer_time * 1000:>8.1f}ms {lookup_time * 1000:>9.1f}ms {full_time * 1000:>11.1f}ms "
+              f"{len(image_matches):>12} {len(parsed):>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the products.ts parser")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark product image extraction on the saved pages in fixtures/pages.
+
+Compares the full BeautifulSoup selector cascade with the streaming
+early-exit extractor: CPU time per page, bytes of body consumed and
+whether both pick the same image.
+
+    python bench_html_extract.py --repeat 50
+"""
+
+import argparse
+import glob
+import os
+import time
+
+import html_extract
+from scrape_real_images import BASE_URL, find_image_with_soup
+
+FIXTURE_PAGES = 'fixtures/pages/*.html'
+
+# Product names the fixture pages were saved for
+PAGE_PRODUCTS = {
+    'dawn_theme.html': '11.8" Modern LED Crystal Chandelier – Flush Mount with K9 Crystals',
+    'lazy_gallery.html': '12-Light Gold Crystal Flush Mount Chandelier',
+    'legacy_theme.html': 'Mini Pendant Lights Set of 6 – Brass Finish',
+}
+
+
+def time_per_call(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def bench_page(path, repeat, chunk_size):
+    with open(path, 'rb') as f:
+        data = f.read()
+    product_name = PAGE_PRODUCTS.get(os.path.basename(path), 'Product')
+
+    soup_time, (soup_url, _) = time_per_call(
+        lambda: find_image_with_soup(data, product_name, BASE_URL), repeat)
+    stream_time, (stream_url, _, consumed) = time_per_call(
+        lambda: html_extract.extract_product_image(
+            html_extract.iter_chunks(data, chunk_size), product_name, BASE_URL), repeat)
+
+    return {
+        'page': os.path.basename(path),
+        'bytes': len(data),
+        'soup_ms': soup_time * 1000,
+        'stream_ms': stream_time * 1000,
+        'stream_bytes': consumed,
+        'soup_url': soup_url,
+        'stream_url': stream_url,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML image extraction on fixture pages")
+    parser.add_argument('--pages', default=FIXTURE_PAGES)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--chunk-size', type=int, default=html_extract.CHUNK_SIZE)
+    args = parser.parse_args()
+
+    print(f"{'page':<22} {'size':>8} {'bs4':>9} {'stream':>9} {'read':>8} {'speedup':>8}  result")
+    for path in sorted(glob.glob(args.pages)):
+        row = bench_page(path, args.repeat, args.chunk_size)
+        if row['soup_url'] == row['stream_url']:
+            verdict = 'same image'
+        elif row['soup_url'] is None:
+            verdict = 'stream only (bs4 cascade found nothing)'
+        else:
+            verdict = f"DIFFERENT: bs4={row['soup_url']} stream={row['stream_url']}"
+        print(f"{row['page']:<22} {row['bytes']:>8,} {row['soup_ms']:>7.2f}ms {row['stream_ms']:>7.2f}ms "
+              f"{row['stream_bytes'] / row['bytes']:>7.0%} {row['soup_ms'] / row['stream_ms']:>7.1f}x  {verdict}")
+
+
+if __name__ == "__main__":
+    main()
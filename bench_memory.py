@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Peak-memory check for the streaming image tools on large catalogs.
+
+Generates synthetic products.ts files (up to 100k products by default)
+whose pages and images are served by stub_shopify_server.py, runs
+verify_and_fix_images.py, test_images.py and scrape_real_images.py
+against each as child processes and records their peak RSS. Every 100th product points at a missing Unsplash placeholder, so
+the verifier also finds, records and patches fixes along the way. Each
+scratch checkout also gets a compiled public/catalog artifact, like the
+real repo, so patching products.ts rebuilds it as it would there.
+
+Exits non-zero when a run fails, when peak RSS passes `--max-rss-mb`,
+or when it grows by more than `--max-growth-mb` from the smallest to the
+largest catalog - memory should stay flat whatever the catalog size.
+
+    python bench_memory.py --sizes 10000 100000 --workers 16
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import catalog_artifact
+import image_status
+import verify_and_fix_images
+from bench_pipeline import run_child, write_products_ts
+from stub_shopify_server import start_stub_server, synthetic_catalog
+
+DEFAULT_SIZES = (10000, 100000)
+PLACEHOLDER_EVERY = 100
+
+
+def build_catalog(size):
+    """
+    Synthetic store catalog with one image per product; every
+    PLACEHOLDER_EVERY-th product gets a broken Unsplash URL instead
+    """
+    shop_catalog = synthetic_catalog(size, images_per_product=1)
+    for n, product in enumerate(shop_catalog):
+        if n % PLACEHOLDER_EVERY == PLACEHOLDER_EVERY - 1:
+            product['images'][0]['src'] = f"/images.unsplash.com/photo-{n}.jpg?"
+    return shop_catalog
+
+
+def seed_alternatives(path):
+    """
+    Mark the verifier's brightet.com replacement images as working in the
+    status store, so fixing placeholders doesn't go out to the real store
+    """
+    store = image_status.ImageStatusStore(path)
+    now = time.time()
+    for url in verify_and_fix_images.get_alternative_brightet_images().values():
+        store.put(url, {'url': url, 'status_code': 200, 'content_type': 'image/jpeg', 'error': None,
+                        'checked_at': now})
+    store.close()
+
+
+def commands(workdir, base_url, workers):
+    host = base_url.split('//', 1)[1]
+    return {
+        'verify': ['verify_and_fix_images.py', '--delay', '0', '--workers', str(workers), '--no-cache',
+                   '--status-store', os.path.join(workdir, 'verify_status.sqlite3'), '--progress-interval', '30'],
+        'test': ['test_images.py', '--host', host, '--delay', '0', '--workers', str(workers), '--no-cache',
+                 '--status-store', os.path.join(workdir, 'test_status.sqlite3'), '--progress-interval', '30'],
+        # Last, as it replaces the placeholders the other two look for
+        'scrape': ['scrape_real_images.py', '--base-url', base_url, '--concurrency', str(workers), '--no-adaptive',
+                   '--rate', '100000', '--burst', '1000', '--no-cache', '--progress-interval', '30'],
+    }
+
+
+def bench_size(size, args):
+    shop_catalog = build_catalog(size)
+    server = start_stub_server(shop_catalog, image_kb=1, seed=args.seed)
+    workdir = tempfile.mkdtemp(prefix=f'brightet-memory-{size}-')
+    rows = []
+    try:
+        write_products_ts(os.path.join(workdir, 'src', 'data', 'products.ts'), shop_catalog, server.base_url)
+        products_path = os.path.join(workdir, 'src', 'data', 'products.ts')
+        products_bytes = os.path.getsize(products_path)
+        catalog_artifact.build_artifact(products_path, os.path.join(workdir, catalog_artifact.DEFAULT_ARTIFACT_DIR))
+        seed_alternatives(os.path.join(workdir, 'verify_status.sqlite3'))
+
+        for name, command in commands(workdir, server.base_url, args.workers).items():
+            exit_code, wall, peak_rss = run_child(command, workdir, os.path.join(workdir, f"{name}.log"))
+            fixes_path = os.path.join(workdir, verify_and_fix_images.FIXES_PATH)
+            fixes = 0
+            if name == 'verify' and os.path.exists(fixes_path):
+                with open(fixes_path, 'r', encoding='utf-8') as f:
+                    fixes = len(json.load(f))
+            rows.append({'script': name, 'products': size, 'products_mb': products_bytes / (1024 * 1024),
+                         'exit_code': exit_code, 'wall_s': wall, 'peak_rss_mb': peak_rss / (1024 * 1024),
+                         'fixes': fixes})
+            if exit_code != 0:
+                print(f"   ❌ {name} exited with {exit_code}, see {os.path.join(workdir, name + '.log')}")
+                args.keep = True
+    finally:
+        server.shutdown()
+        server.server_close()
+        if args.keep:
+            print(f"📁 Scratch directory kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return rows
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Check that the image tools run in flat memory on big catalogs")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="synthetic catalog sizes to run, smallest first")
+    parser.add_argument('--workers', type=int, default=16, help="parallel probes per script")
+    parser.add_argument('--max-rss-mb', type=float, default=64.0,
+                        help="fail if any script's peak RSS exceeds this")
+    parser.add_argument('--max-growth-mb', type=float, default=8.0,
+                        help="fail if peak RSS grows by more than this from the smallest to the largest size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep', action='store_true', help="keep the scratch directories and script logs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = sorted(args.sizes)
+    print(f"{'script':<8} {'products':>9} {'ts MB':>7} {'exit':>4} {'wall':>9} {'rss MB':>7} {'fixes':>6}")
+    results = []
+    for size in sizes:
+        for row in bench_size(size, args):
+            results.append(row)
+            print(f"{row['script']:<8} {row['products']:>9} {row['products_mb']:>7.1f} {row['exit_code']:>4} "
+                  f"{row['wall_s']:>8.1f}s {row['peak_rss_mb']:>7.1f} {row['fixes']:>6}")
+
+    failures = []
+    for row in results:
+        if row['exit_code'] != 0:
+            failures.append(f"{row['script']} failed at {row['products']} products")
+        if row['peak_rss_mb'] > args.max_rss_mb:
+            failures.append(f"{row['script']} peaked at {row['peak_rss_mb']:.1f} MB with {row['products']} "
+                            f"products (limit {args.max_rss_mb:.0f} MB)")
+    for script in sorted({row['script'] for row in results}):
+        runs = [row for row in results if row['script'] == script]
+        growth = runs[-1]['peak_rss_mb'] - runs[0]['peak_rss_mb']
+        if len(runs) > 1 and growth > args.max_growth_mb:
+            failures.append(f"{script} grew {growth:.1f} MB from {runs[0]['products']} to {runs[-1]['products']} "
+                            f"products (limit {args.max_growth_mb:.0f} MB)")
+
+    if failures:
+        print("\n❌ Memory check failed:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.exit(1)
+    print("\n✅ Peak memory stayed within limits")
+
+
+if __name__ == "__main__":
+    main()
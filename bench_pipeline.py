@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the image scripts against a local Shopify stand-in.
+
+Starts stub_shopify_server.py with a synthetic catalog (pages, feed and
+JPEGs served locally with configurable latency and error rate), writes a
+matching products.ts into a scratch directory and runs each script there
+as a child process. Reports wall time, products/s, request rate, p50/p99
+server-side request latency and the child's peak RSS; `--history`
+appends each run as a JSON line so results can be compared over time.
+`scrape-bs4` and `scrape-pool` parse the same pages on the fetching
+threads and in a process pool respectively; compare them with a large
+`--page-kb` to see how much the parse stage overlaps with network I/O.
+
+    python bench_pipeline.py --products 500 --latency 0.02 --error-rate 0.01
+    python bench_pipeline.py --scripts scrape-bs4,scrape-pool --page-kb 64 --parse-workers 4
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from stub_shopify_server import SYNTHETIC_CATEGORIES, start_stub_server, synthetic_catalog
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCRIPTS = ('scrape', 'verify', 'test')
+
+
+def script_commands(base_url, concurrency, parse_workers=None):
+    """
+    How each script is run against the stub: no politeness delays, no
+    persistent caches, so every run measures the network path
+    (scrape-default keeps the cache on, as a plain run does)
+    """
+    host = base_url.split('//', 1)[1]
+    scrape = ['scrape_real_images.py', '--base-url', base_url, '--concurrency', str(concurrency),
+              '--max-concurrency', str(concurrency * 4), '--rate', '1000', '--burst', '100', '--no-cache']
+    return {
+        'scrape': scrape,
+        # Out-of-the-box settings: persistent HTTP cache on (in the scratch dir)
+        'scrape-default': [arg for arg in scrape if arg != '--no-cache'],
+        'scrape-bs4': scrape + ['--parser', 'bs4'],
+        'scrape-pool': scrape + ['--parser', 'bs4', '--parse-workers', str(parse_workers or os.cpu_count() or 1)],
+        'verify': ['verify_and_fix_images.py', '--delay', '0', '--refresh', '--no-cache'],
+        'test': ['test_images.py', '--host', host, '--delay', '0', '--refresh', '--no-cache'],
+        'probe': ['test_images.py', '--host', host, '--delay', '0', '--refresh', '--no-cache', '--probe', 'range'],
+        'mirror': ['image_mirror.py', '--concurrency', str(concurrency), '--rate', '1000', '--burst', '100',
+                   '--refresh'],
+    }
+
+
+def ts_string(value):
+    return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+
+
+def write_products_ts(path, shop_catalog, base_url):
+    """
+    products.ts in the repo's layout for the synthetic catalog, pointing
+    at the stub's image and page URLs
+    """
+    entries = []
+    for n, product in enumerate(shop_catalog):
+        image = base_url + product['images'][0]['src'] + '&width=800'
+        entries.append(
+            "  {\n"
+            f"    id: '{product['id']}',\n"
+            f"    name: {ts_string(product['title'])},\n"
+            f"    price: {19.99 + n % 500:.2f},\n"
+            f"    image: {ts_string(image)},\n"
+            f"    category: {ts_string(product['product_type'])},\n"
+            f"    description: {ts_string('Synthetic product for benchmarking')},\n"
+            "    brand: 'Brightet',\n"
+            "    inStock: true,\n"
+            f"    url: {ts_string('/products/' + product['handle'])}\n"
+            "  }"
+        )
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("import { Product } from '../types';\n\nexport const products: Product[] = [\n")
+        f.write(',\n'.join(entries))
+        f.write("\n];\n")
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of an unsorted list
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+# Runs the script as its own child and reports "<exit code> <ru_maxrss>".
+# On Linux a process's ru_maxrss starts from the peak of whatever spawned
+# it, so measured straight from here it would include this process's
+# synthetic catalog; the launcher itself stays small.
+RSS_LAUNCHER = (
+    "import os, subprocess, sys\n"
+    "process = subprocess.Popen(sys.argv[2:])\n"
+    "_, status, usage = os.wait4(process.pid, 0)\n"
+    "os.write(int(sys.argv[1]), f'{os.waitstatus_to_exitcode(status)} {usage.ru_maxrss}'.encode())\n"
+)
+
+
+def run_child(command, cwd, log_path):
+    """
+    Run a script to completion; returns (exit_code, wall_seconds, peak_rss_bytes)
+    """
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    read_fd, write_fd = os.pipe()
+    with open(log_path, 'w', encoding='utf-8') as log, os.fdopen(read_fd, 'rb') as report:
+        started = time.perf_counter()
+        try:
+            process = subprocess.Popen(
+                [sys.executable, '-c', RSS_LAUNCHER, str(write_fd), sys.executable,
+                 os.path.join(SCRIPT_DIR, command[0])] + command[1:],
+                cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT, pass_fds=(write_fd,))
+        finally:
+            os.close(write_fd)
+        result = report.read().split()
+        process.wait()
+        wall = time.perf_counter() - started
+    if len(result) != 2:
+        return process.returncode or 1, wall, 0
+    exit_code, max_rss = (int(value) for value in result)
+    # ru_maxrss is KB on Linux, bytes on macOS
+    peak_rss = max_rss if sys.platform == 'darwin' else max_rss * 1024
+    return exit_code, wall, peak_rss
+
+
+def bench_script(name, command, server, workdir, product_count):
+    server.reset_stats()
+    exit_code, wall, peak_rss = run_child(command, workdir, os.path.join(workdir, f"{name}.log"))
+    latencies = [seconds for _, _, seconds in server.timings]
+    return {
+        'script': name,
+        'exit_code': exit_code,
+        'wall_s': wall,
+        'products_per_s': product_count / wall if wall else None,
+        'requests': server.requests,
+        'requests_per_s': server.requests / wall if wall else None,
+        'throttled': server.throttled,
+        'p50_ms': percentile(latencies, 50) * 1000 if latencies else None,
+        'p99_ms': percentile(latencies, 99) * 1000 if latencies else None,
+        'peak_inflight': server.peak_inflight,
+        'peak_rss_mb': peak_rss / (1024 * 1024),
+    }
+
+
+def format_ms(value):
+    return f"{value:7.1f}" if value is not None else f"{'-':>7}"
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=SCRIPT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the image scripts against a local stub store")
+    parser.add_argument('--products', type=int, default=200, help="synthetic catalog size")
+    parser.add_argument('--latency', type=float, default=0.02, help="seconds added to every stub response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument('--image-kb', type=int, default=64, help="size of each synthetic image")
+    parser.add_argument('--page-kb', type=int, default=0,
+                        help="header markup added to each product page before the gallery")
+    parser.add_argument('--parse-workers', type=int, default=None,
+                        help="parse processes for scrape-pool (default: one per CPU core)")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--scripts', default=','.join(DEFAULT_SCRIPTS),
+                        help="comma-separated subset of: scrape, scrape-default, scrape-bs4, scrape-pool, verify, test, "
+                             "probe, mirror")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--history', default=None,
+                        help="append this run's results as a JSON line to the given file")
+    parser.add_argument('--keep', action='store_true', help="keep the scratch directory and script logs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    shop_catalog = synthetic_catalog(args.products, seed=args.seed)
+    server = start_stub_server(shop_catalog, latency=args.latency, error_rate=args.error_rate,
+                               throttle_rate=args.throttle_rate, image_kb=args.image_kb, page_kb=args.page_kb,
+                               seed=args.seed)
+    commands = script_commands(server.base_url, args.concurrency, args.parse_workers)
+    names = [name.strip() for name in args.scripts.split(',') if name.strip()]
+    unknown = [name for name in names if name not in commands]
+    if unknown:
+        raise SystemExit(f"Unknown script(s): {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix='brightet-bench-')
+    write_products_ts(os.path.join(workdir, 'src', 'data', 'products.ts'), shop_catalog, server.base_url)
+    print(f"🧪 Stub store at {server.base_url}: {args.products} products across "
+          f"{len(SYNTHETIC_CATEGORIES)} categories, {args.latency * 1000:.0f}ms latency, "
+          f"{args.error_rate:.0%} errors, {args.throttle_rate:.0%} throttled")
+
+    results = []
+    try:
+        print(f"\n{'script':<14} {'exit':>4} {'wall':>8} {'prod/s':>8} {'reqs':>6} {'req/s':>8} "
+              f"{'p50 ms':>7} {'p99 ms':>7} {'rss MB':>7}")
+        for name in names:
+            row = bench_script(name, commands[name], server, workdir, args.products)
+            results.append(row)
+            print(f"{name:<14} {row['exit_code']:>4} {row['wall_s']:>7.2f}s {row['products_per_s']:>8.1f} "
+                  f"{row['requests']:>6} {row['requests_per_s']:>8.1f} {format_ms(row['p50_ms'])} "
+                  f"{format_ms(row['p99_ms'])} {row['peak_rss_mb']:>7.1f}")
+            if row['exit_code'] != 0:
+                print(f"   ❌ {name} exited with {row['exit_code']}, see {os.path.join(workdir, name + '.log')}")
+                args.keep = True
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if args.history:
+        entry = {
+            'ts': time.time(),
+            'revision': git_revision(),
+            'config': {key: getattr(args, key) for key in
+                       ('products', 'latency', 'error_rate', 'throttle_rate', 'image_kb', 'page_kb', 'concurrency',
+                        'parse_workers', 'seed')},
+            'results': results,
+        }
+        with open(args.history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+        print(f"\n💾 Results appended to {args.history}")
+
+    if args.keep:
+        print(f"📁 Scratch directory kept at {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
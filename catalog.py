@@ -0,0 +1,564 @@
+"""
+Single-pass parser and index for src/data/products.ts.
+
+The products array literal is lexed once, left to right, with a
+tokenizer that never backtracks, so parsing stays linear in file size
+and does not depend on field order or on which characters appear inside
+string values (a `}` in a description is just part of the string).
+
+Every product comes back as a ProductRecord holding its typed field
+values and the byte span of its object. The offsets of each value, which
+field_edit uses to splice new image URLs in with a single pass, are only
+worked out for the records being edited.
+
+For catalogs too big to hold, iter_products() walks a memory-mapped file
+one record at a time and write_patched() streams the file back out with
+edits spliced in as they are produced, so reading, deciding and writing
+run as one pass in constant memory.
+"""
+
+import mmap
+import os
+import re
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import metrics
+
+PRODUCTS_FILE = 'src/data/products.ts'
+# Streaming readers and writers of a mapped file drop the pages they've
+# passed once this much has built up
+RELEASE_EVERY = 4 * 1024 * 1024
+
+TOKEN_PATTERN = re.compile(rb"""
+    (?P<ws>\s+)
+  | (?P<line_comment>//[^\n]*)
+  | (?P<block_comment>/\*.*?\*/)
+  | (?P<string>'(?:[^'\\\n]|\\.)*'|"(?:[^"\\\n]|\\.)*"|`(?:[^`\\]|\\.)*`)
+  | (?P<number>-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<ident>[A-Za-z_$][\w$]*)
+  | (?P<punct>[{}\[\]:,;=()<>.?|&!*+/-])
+""", re.VERBOSE | re.DOTALL)
+
+SKIP_TOKENS = {'ws', 'line_comment', 'block_comment'}
+
+ESCAPE_PATTERN = re.compile(r"\\(u\{[0-9a-fA-F]+\}|u[0-9a-fA-F]{4}|x[0-9a-fA-F]{2}|.)", re.DOTALL)
+SIMPLE_ESCAPES = {'n': '\n', 't': '\t', 'r': '\r', 'b': '\b', 'f': '\f', 'v': '\v', '0': '\0', '\n': ''}
+
+LITERALS = {b'true': True, b'false': False, b'null': None, b'undefined': None}
+
+
+class CatalogParseError(ValueError):
+    pass
+
+
+@dataclass
+class Token:
+    kind: str
+    value: bytes
+    start: int
+    end: int
+
+
+@dataclass
+class ProductRecord:
+    """
+    One entry of the products array.
+
+    `fields` holds the parsed values (str, int/float, bool, list, dict);
+    `spans` maps each field name to the (start, end) byte offsets of its
+    value in the file, quotes included for strings. Records parsed on the
+    fast path leave it None; record_spans() fills it in from the file for
+    the few records that get edited.
+    """
+    fields: dict
+    spans: dict
+    start: int
+    end: int
+    index: int = 0
+
+    def __getitem__(self, name):
+        return self.fields[name]
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def get(self, name, default=None):
+        return self.fields.get(name, default)
+
+    @property
+    def id(self):
+        return self.fields.get('id')
+
+    @property
+    def image(self):
+        return self.fields.get('image')
+
+    @property
+    def category(self):
+        return self.fields.get('category')
+
+    def to_dict(self):
+        return dict(self.fields)
+
+
+def _unescape(match):
+    escape = match.group(1)
+    if escape.startswith('u{'):
+        return chr(int(escape[2:-1], 16))
+    if escape[0] in 'ux' and len(escape) > 1:
+        return chr(int(escape[1:], 16))
+    return SIMPLE_ESCAPES.get(escape, escape)
+
+
+def decode_string(raw):
+    """
+    Turn a quoted JS string token into its Python value
+    """
+    if b'\\' not in raw:
+        return raw[1:-1].decode('utf-8')
+    return ESCAPE_PATTERN.sub(_unescape, raw[1:-1].decode('utf-8'))
+
+
+def encode_string(value, quote="'"):
+    """
+    Inverse of decode_string for the characters that can appear in a
+    catalog value: produces a quoted JS string literal as bytes
+    """
+    escaped = value.replace('\\', '\\\\').replace(quote, '\\' + quote).replace('\n', '\\n')
+    return (quote + escaped + quote).encode('utf-8')
+
+
+def tokenize(data, pos=0):
+    """
+    Yield significant tokens from `data` (bytes) starting at `pos`
+    """
+    end = len(data)
+    match = TOKEN_PATTERN.match
+    while pos < end:
+        m = match(data, pos)
+        if m is None:
+            raise CatalogParseError(f"Unexpected character {data[pos:pos + 1]!r} at byte {pos}")
+        kind = m.lastgroup
+        if kind not in SKIP_TOKENS:
+            yield Token(kind, m.group(), pos, m.end())
+        pos = m.end()
+
+
+_WS = rb'\s*(?:(?://[^\n]*|/\*.*?\*/)\s*)*'
+# Unrolled-loop string literals: one character class run per segment
+# between escapes, so there is no per-character alternation
+_STRING = (rb"'[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+           rb'|"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+           rb"|`[^`\\]*(?:\\.[^`\\]*)*`")
+_NUMBER = rb'-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?'
+_IDENT = rb'[A-Za-z_$][\w$]*'
+_SCALAR = (rb'(?:(?P<string>' + _STRING + rb')|(?P<number>' + _NUMBER + rb')'
+           rb'|(?P<literal>true|false|null|undefined)(?![\w$]))')
+_KEY = rb'(?:(?P<ikey>' + _IDENT + rb')|(?P<skey>' + _STRING + rb'))'
+
+WS_PATTERN = re.compile(_WS, re.DOTALL)
+SCALAR_PATTERN = re.compile(_SCALAR, re.DOTALL)
+KEY_PATTERN = re.compile(_WS + _KEY + _WS + rb':', re.DOTALL)
+# Fast path: a whole `key: scalar,` property in one anchored match
+PROPERTY_PATTERN = re.compile(
+    _WS + _KEY + _WS + rb':' + _WS + _SCALAR + _WS + rb'(?:(?P<comma>,)|(?=\}))',
+    re.DOTALL,
+)
+
+# Fastest path, for the usual product made only of `key: scalar` pairs
+# with no comments: FLAT_OBJECT_PATTERN checks and bounds the whole object
+# in one match, then one findall over it returns every key and raw value
+# without building match objects. Possessive repeats let anything else
+# fail over to the general parser without backtracking.
+_BARE_PROPERTY = (rb'\s*+(?:' + _IDENT + rb'|' + _STRING + rb')\s*+:\s*+'
+                  rb'(?:' + _STRING + rb'|' + _NUMBER + rb'|(?:true|false|null|undefined)(?![\w$]))\s*+')
+FLAT_OBJECT_PATTERN = re.compile(rb'\{(?:' + _BARE_PROPERTY + rb',)*+(?:' + _BARE_PROPERTY + rb')?+\}')
+FLAT_PROPERTY_PATTERN = re.compile(
+    rb'\s*+(?:(' + _IDENT + rb')|(' + _STRING + rb'))\s*+:\s*+'
+    rb'(?:(' + _STRING + rb')|(' + _NUMBER + rb')|(true|false|null|undefined)(?![\w$]))'
+)
+
+
+def _scalar_value(m):
+    kind = m.lastgroup
+    raw = m.group(kind)
+    if kind == 'string':
+        return decode_string(raw)
+    if kind == 'number':
+        return float(raw) if (b'.' in raw or b'e' in raw or b'E' in raw) else int(raw)
+    return LITERALS[raw]
+
+
+class _Parser:
+    """
+    Recursive-descent parser driven by anchored regex matches at the
+    current byte offset. Every match starts where the previous one ended,
+    so the input is consumed exactly once.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    def error(self, message, pos):
+        return CatalogParseError(f"{message} at byte {pos}")
+
+    def skip(self, pos):
+        return WS_PATTERN.match(self.data, pos).end()
+
+    def expect(self, char, pos):
+        pos = self.skip(pos)
+        if self.data[pos:pos + 1] != char:
+            found = self.data[pos:pos + 1] or b'end of file'
+            raise self.error(f"Expected {char!r}, found {found!r}", pos)
+        return pos + 1
+
+    def parse_value(self, pos):
+        """
+        Parse one value; returns (value, start, end) where end is also
+        the position to continue from
+        """
+        pos = self.skip(pos)
+        char = self.data[pos:pos + 1]
+        if char == b'{':
+            fields, start, end = self.parse_object(pos)
+            return fields, start, end
+        if char == b'[':
+            return self.parse_array(pos)
+        m = SCALAR_PATTERN.match(self.data, pos)
+        if m is None:
+            raise self.error(f"Unsupported value {self.data[pos:pos + 20]!r}", pos)
+        return _scalar_value(m), pos, m.end()
+
+    def parse_array(self, pos):
+        start = pos = self.expect(b'[', pos) - 1
+        pos += 1
+        items = []
+        while True:
+            pos = self.skip(pos)
+            if self.data[pos:pos + 1] == b']':
+                return items, start, pos + 1
+            value, _, pos = self.parse_value(pos)
+            items.append(value)
+            pos = self.skip(pos)
+            if self.data[pos:pos + 1] == b',':
+                pos += 1
+            elif self.data[pos:pos + 1] != b']':
+                raise self.error("Expected ',' or ']'", pos)
+
+    def parse_object(self, pos, spans=None):
+        data = self.data
+        match_property = PROPERTY_PATTERN.match
+        start = pos = self.expect(b'{', pos) - 1
+        pos += 1
+        fields = {}
+        while True:
+            m = match_property(data, pos)
+            if m is not None:
+                ikey, skey, string, number, literal, _ = m.groups()
+                key = ikey.decode('utf-8') if ikey is not None else decode_string(skey)
+                if string is not None:
+                    fields[key] = decode_string(string)
+                    group = 3
+                elif number is not None:
+                    fields[key] = float(number) if (b'.' in number or b'e' in number or b'E' in number) else int(number)
+                    group = 4
+                else:
+                    fields[key] = LITERALS[literal]
+                    group = 5
+                if spans is not None:
+                    spans[key] = m.span(group)
+                pos = m.end()
+                continue
+
+            pos = self.skip(pos)
+            if data[pos:pos + 1] == b'}':
+                return fields, start, pos + 1
+
+            m = KEY_PATTERN.match(data, pos)
+            if m is None:
+                raise self.error("Expected property name", pos)
+            key = m.group('ikey')
+            key = key.decode('utf-8') if key is not None else decode_string(m.group('skey'))
+            value, value_start, pos = self.parse_value(m.end())
+            fields[key] = value
+            if spans is not None:
+                spans[key] = (value_start, pos)
+            pos = self.skip(pos)
+            if data[pos:pos + 1] == b',':
+                pos += 1
+            elif data[pos:pos + 1] != b'}':
+                raise self.error("Expected ',' or '}'", pos)
+
+    def parse_flat_object(self, pos):
+        """
+        (fields, end) for an object of plain `key: scalar` properties at
+        `pos`, or None when it holds anything else
+        """
+        data = self.data
+        m = FLAT_OBJECT_PATTERN.match(data, pos)
+        if m is None:
+            return None
+        end = m.end()
+        fields = {}
+        for ikey, skey, string, number, literal in FLAT_PROPERTY_PATTERN.findall(data, pos + 1, end - 1):
+            key = ikey.decode('utf-8') if ikey else decode_string(skey)
+            if string:
+                fields[key] = string[1:-1].decode('utf-8') if b'\\' not in string else decode_string(string)
+            elif number:
+                fields[key] = float(number) if (b'.' in number or b'e' in number or b'E' in number) else int(number)
+            else:
+                fields[key] = LITERALS[literal]
+        return fields, end
+
+    def parse_records(self, pos):
+        return list(self.iter_records(pos))
+
+    def iter_records(self, pos):
+        pos = self.expect(b'[', pos)
+        index = 0
+        while True:
+            start = pos = self.skip(pos)
+            if self.data[pos:pos + 1] == b']':
+                return
+            flat = self.parse_flat_object(pos)
+            if flat is not None:
+                fields, pos = flat
+                spans = None
+            else:
+                spans = {}
+                fields, start, pos = self.parse_object(pos, spans)
+            yield ProductRecord(fields, spans, start, pos, index)
+            index += 1
+            pos = self.skip(pos)
+            if self.data[pos:pos + 1] == b',':
+                pos += 1
+            elif self.data[pos:pos + 1] != b']':
+                raise self.error("Expected ',' or ']'", pos)
+
+
+def find_array_start(data, name=b'products'):
+    """
+    Byte offset of the `[` that opens `export const <name> ... = [`
+    """
+    seen_name = False
+    for token in tokenize(data):
+        if token.kind == 'ident' and token.value == name:
+            seen_name = True
+        elif seen_name and token.value == b'=':
+            next_token = next(tokenize(data, token.end), None)
+            if next_token is None or next_token.value != b'[':
+                raise CatalogParseError(f"`{name.decode()}` is not assigned an array literal")
+            return next_token.start
+        elif seen_name and token.value == b';':
+            seen_name = False
+    raise CatalogParseError(f"No `{name.decode()}` array found")
+
+
+def parse_products(data, name=b'products'):
+    """
+    Parse the products array out of the file contents (bytes)
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return _Parser(data).parse_records(find_array_start(data, name))
+
+
+def iter_products(data, name=b'products'):
+    """
+    Yield products one at a time without keeping them; `data` can be an
+    mmap (see mapped()) so the file isn't read into memory either
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    released = 0
+    for record in _Parser(data).iter_records(find_array_start(data, name)):
+        yield record
+        released = release_behind(data, released, record.end)
+
+
+@contextmanager
+def mapped(path=PRODUCTS_FILE):
+    """
+    The file mapped read-only; pages are loaded as the parser reaches them
+    """
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            yield data
+
+
+def release_behind(data, released, pos):
+    """
+    Drop the resident pages of a mapped file between `released` and `pos`
+    once RELEASE_EVERY bytes have built up, so a single pass over it keeps
+    RSS flat. They're read back from the file if touched again. Returns
+    the new watermark; a no-op for bytes.
+    """
+    if pos - released < RELEASE_EVERY or not isinstance(data, mmap.mmap) or not hasattr(mmap, 'MADV_DONTNEED'):
+        return released
+    end = pos - pos % mmap.PAGESIZE
+    data.madvise(mmap.MADV_DONTNEED, released, end - released)
+    return end
+
+
+class Catalog:
+    """
+    Parsed products.ts plus lookups by id, category and image URL
+    """
+
+    def __init__(self, data, path=PRODUCTS_FILE):
+        self.path = path
+        self.reindex(data)
+
+    def reindex(self, data):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.data = data
+        self.products = parse_products(data)
+        self.by_id = {}
+        self.duplicate_ids = []
+        self.by_category = {}
+        self.by_image = {}
+        for record in self.products:
+            product_id = record.get('id')
+            if product_id in self.by_id:
+                self.duplicate_ids.append(product_id)
+            else:
+                self.by_id[product_id] = record
+            self.by_category.setdefault(record.get('category'), []).append(record)
+            if record.get('image'):
+                self.by_image.setdefault(record['image'], []).append(record)
+
+    @classmethod
+    def load(cls, path=PRODUCTS_FILE):
+        with open(path, 'rb') as f:
+            data = f.read()
+        with metrics.timer('catalog_parse'):
+            return cls(data, path)
+
+    def __len__(self):
+        return len(self.products)
+
+    def __iter__(self):
+        return iter(self.products)
+
+    def get(self, product_id):
+        return self.by_id.get(product_id)
+
+    def with_fields(self, *names):
+        """
+        Products that define every one of the given fields
+        """
+        return [record for record in self.products if all(record.get(name) is not None for name in names)]
+
+    @property
+    def categories(self):
+        return sorted(category for category in self.by_category if category is not None)
+
+
+def load_catalog(path=PRODUCTS_FILE):
+    return Catalog.load(path)
+
+
+def record_spans(data, record):
+    """
+    The record's field spans, parsing its object in `data` again if the
+    fast path skipped them
+    """
+    if record.spans is None:
+        spans = {}
+        _Parser(data).parse_object(record.start, spans)
+        record.spans = spans
+    return record.spans
+
+
+def field_edit(data, record, field_name, new_value):
+    """
+    (start, end, replacement bytes) setting one record's string field, or
+    None when there's nothing to change
+    """
+    if new_value is None or field_name not in record or record.get(field_name) == new_value:
+        return None
+    spans = record_spans(data, record)
+    if field_name not in spans:
+        return None
+    start, end = spans[field_name]
+    quote = data[start:start + 1].decode('ascii') if data[start:start + 1] in (b"'", b'"') else "'"
+    return start, end, encode_string(new_value, quote)
+
+
+@contextmanager
+def atomic_file(path):
+    """
+    Binary file to write `path` through: a temp file next to it that is
+    fsynced and renamed over the original when the block exits cleanly,
+    so readers (and the Vite watcher) never see a partial file
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, temp_path)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+def write_atomic(path, data):
+    """
+    Replace `path` with `data` atomically (see atomic_file)
+    """
+    with atomic_file(path) as f:
+        f.write(data)
+
+
+def write_patched(path, data, edits):
+    """
+    Stream `data` (the contents of `path`, usually mapped()) into a new
+    `path` with `edits` spliced in. Edits are (start, end, replacement)
+    in ascending order and may come from a generator that is itself
+    walking `data`, so the whole read -> decide -> write flow runs in one
+    pass. Nothing is written when there are no edits. Returns the count.
+
+    Records one `write` observation for the file output alone: time spent
+    in `edits` working out the next edit (probes, network waits) is left
+    out of it.
+    """
+    edits = iter(edits)
+    edit = next(edits, None)
+    if edit is None:
+        return 0
+    changed = 0
+    pos = released = 0
+    deciding = 0.0
+    started = time.perf_counter()
+    try:
+        with memoryview(data) as view, atomic_file(path) as f:
+            while True:
+                stop = edit[0] if edit is not None else len(view)
+                if stop < pos:
+                    raise ValueError(f"Edit at byte {stop} overlaps or precedes byte {pos}")
+                while pos < stop:
+                    chunk_end = min(stop, pos + RELEASE_EVERY)
+                    f.write(view[pos:chunk_end])
+                    pos = chunk_end
+                    released = release_behind(data, released, pos)
+                if edit is None:
+                    return changed
+                f.write(edit[2])
+                pos = edit[1]
+                changed += 1
+                waited = time.perf_counter()
+                edit = next(edits, None)
+                deciding += time.perf_counter() - waited
+    finally:
+        metrics.observe('write', time.perf_counter() - started - deciding, file=os.path.basename(path))
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Precompiled, sharded form of src/data/products.ts.
+
+Compiles the catalog once into public/catalog/:
+
+    index.json                  categories (name, slug, shard file, count)
+                                in the order they first appear in the
+                                catalog, the page files, and the
+                                fingerprint of the products.ts it was
+                                built from
+    shards/<slug>.<hash>.json   one JSON array per category, one product
+                                per line
+    pages/<n>.<hash>.json       the catalog in order, PAGE_SIZE products
+                                per file, for the storefront's "All" view
+    ids.<hash>.json             every product in catalog order with its
+                                shard and the byte span of its object there
+    search.<hash>.json          token -> product ordinals, plus brand and
+                                stock facets, for search and filtering
+
+Shard and index files are content-hashed so they can be cached forever;
+index.json is the only fixed name and is written last.
+The storefront fetches index.json and then only the shards or pages it
+shows.
+Python tools open the artifact through load_products(), which maps shards
+with mmap and decodes a product only when it is asked for, and falls back
+to parsing products.ts whenever the artifact is missing or stale.
+
+    python catalog_artifact.py
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import re
+import sqlite3
+import tempfile
+
+import catalog
+import metrics
+from catalog import PRODUCTS_FILE, ProductRecord, write_atomic
+
+DEFAULT_ARTIFACT_DIR = 'public/catalog'
+INDEX_NAME = 'index.json'
+SHARDS_DIR = 'shards'
+PAGES_DIR = 'pages'
+PAGE_SIZE = 24
+ARTIFACT_VERSION = 2
+UNCATEGORIZED = 'Uncategorized'
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+# Fields whose words go into the search index
+SEARCH_FIELDS = ('name', 'category', 'brand', 'material', 'color', 'sku')
+
+
+def slugify(value):
+    return '-'.join(TOKEN_PATTERN.findall(value.lower())) or 'other'
+
+
+def unique_slug(category, taken):
+    """
+    slugify(category), or when another category already took that slug
+    ("Wall Lights" and "wall-lights"), the slug plus a short hash of the
+    raw name, so the two keep separate shards
+    """
+    slug = slugify(category)
+    if slug not in taken:
+        return slug
+    digest = hashlib.sha256(category.encode('utf-8')).hexdigest()
+    for length in range(6, len(digest) + 1):
+        candidate = f"{slug}-{digest[:length]}"
+        if candidate not in taken:
+            return candidate
+    raise ValueError(f"No free slug for category {category!r}")
+
+
+def search_tokens(fields):
+    words = set()
+    for name in SEARCH_FIELDS:
+        value = fields.get(name)
+        if isinstance(value, str):
+            words.update(word for word in TOKEN_PATTERN.findall(value.lower()) if len(word) > 1)
+    return words
+
+
+def fingerprint(path):
+    """
+    size and sha256 of the source file. No mtime: index.json is committed,
+    and a checkout's mtime would make every rebuild rewrite it.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return {'path': path, 'size': os.path.getsize(path), 'sha256': digest.hexdigest()}
+
+
+def _encode(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+
+
+class _HashedFile:
+    """
+    Write-only file in a scratch directory that hashes what goes through
+    it, so it can be renamed to its content-hashed name once complete
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.size = 0
+        self._file = open(path, 'wb')
+        self._digest = hashlib.sha256()
+
+    def write(self, data):
+        self._file.write(data)
+        self._digest.update(data)
+        self.size += len(data)
+
+    def write_array(self, items):
+        """
+        Write an iterable of encoded values as one JSON array
+        """
+        self.write(b'[')
+        for n, item in enumerate(items):
+            self.write(item if n == 0 else b',' + item)
+        self.write(b']')
+
+    def finish(self, directory, stem):
+        """
+        Move the file into `directory` as <stem>.<hash>.json and return
+        that name
+        """
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        name = f"{stem}.{self._digest.hexdigest()[:12]}.json"
+        os.replace(self.path, os.path.join(directory, name))
+        return name
+
+
+class _Shard:
+    """
+    One category's shard, or one page of the catalog, written a product
+    per line as records stream by
+    """
+
+    def __init__(self, path, category=None):
+        self.category = category
+        self.count = 0
+        self.file = _HashedFile(path)
+        self.file.write(b'[\n')
+
+    def add(self, record):
+        """
+        Append a record; returns the (start, end) of its object in the shard
+        """
+        if self.count:
+            self.file.write(b',\n')
+        start = self.file.size
+        self.file.write(_encode(record.fields))
+        self.count += 1
+        return start, self.file.size
+
+    def finish(self, directory, slug):
+        self.file.write(b'\n]\n')
+        return self.file.finish(directory, slug)
+
+
+def _spill_records(records, scratch, db, page_dir):
+    """
+    Stream records into per-category shard files, finished page files and
+    a scratch SQLite database holding each product's shard span, search
+    tokens and facets, so no more than one record is held at a time.
+    Returns ({slug: _Shard} in order of first appearance, [page index entry]).
+    """
+    shards = {}
+    slugs = {}
+    pages = []
+    page = None
+    for ordinal, record in enumerate(records):
+        category = record.get('category') or UNCATEGORIZED
+        slug = slugs.get(category)
+        if slug is None:
+            slug = slugs[category] = unique_slug(category, shards)
+            if slug != slugify(category):
+                print(f"⚠️  Category {category!r} has the same slug as {shards[slugify(category)].category!r}; "
+                      f"its shard uses {slug!r}")
+            shards[slug] = _Shard(os.path.join(scratch, f"{len(shards)}.shard"), category)
+        shard = shards[slug]
+        start, end = shard.add(record)
+        if page is None:
+            page = _Shard(os.path.join(scratch, 'page'))
+        page.add(record)
+        if page.count == PAGE_SIZE:
+            pages.append(_finish_page(page, page_dir, len(pages)))
+            page = None
+        brand = record.get('brand') or None
+        db.execute('INSERT INTO products VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                   (ordinal, _encode(record.get('id')), slug, start, end, _encode(record.get('price')),
+                    bool(record.get('inStock', True)), brand))
+        db.executemany('INSERT INTO tokens VALUES (?, ?)',
+                       ((token, ordinal) for token in search_tokens(record.fields)))
+    if page is not None:
+        pages.append(_finish_page(page, page_dir, len(pages)))
+    return shards, pages
+
+
+def _finish_page(page, page_dir, number):
+    return {'file': f"{PAGES_DIR}/{page.finish(page_dir, str(number))}", 'count': page.count}
+
+
+def _write_search(db, out):
+    """
+    Write the search index from the scratch database:
+    {"facets": {"brand": {brand: [ordinal, ...]}, "inStock": [...]},
+     "ids": [...], "prices": [...], "tokens": {token: [ordinal, ...]}}
+    with keys in sorted order, as _encode would write it
+    """
+    def postings(query):
+        """
+        `{"key":[ordinal,...],...}` from rows of (key, ordinal) grouped by
+        key, written as the rows arrive: a token every product has is as
+        long as the catalog, so its list isn't built up first
+        """
+        key = None
+        out.write(b'{')
+        for row_key, ordinal in db.execute(query):
+            ordinal = str(ordinal).encode('ascii')
+            if key is None:
+                out.write(_encode(row_key) + b':[' + ordinal)
+            elif row_key != key:
+                out.write(b'],' + _encode(row_key) + b':[' + ordinal)
+            else:
+                out.write(b',' + ordinal)
+            key = row_key
+        out.write(b'}' if key is None else b']}')
+
+    out.write(b'{"facets":{"brand":')
+    postings('SELECT brand, ordinal FROM products WHERE brand IS NOT NULL ORDER BY brand, ordinal')
+    out.write(b',"inStock":')
+    out.write_array(str(ordinal).encode('ascii')
+                    for ordinal, in db.execute('SELECT ordinal FROM products WHERE in_stock ORDER BY ordinal'))
+    out.write(b'},"ids":')
+    out.write_array(product_id for product_id, in db.execute('SELECT id FROM products ORDER BY ordinal'))
+    out.write(b',"prices":')
+    out.write_array(price for price, in db.execute('SELECT price FROM products ORDER BY ordinal'))
+    out.write(b',"tokens":')
+    postings('SELECT token, ordinal FROM tokens ORDER BY token, ordinal')
+    out.write(b'}')
+
+
+def build_artifact(path=PRODUCTS_FILE, out_dir=DEFAULT_ARTIFACT_DIR):
+    """
+    Compile products.ts at `path` into `out_dir`, dropping files from
+    earlier builds. Returns the new index.
+
+    The file is streamed through catalog.iter_products and everything
+    that has to be regrouped (shards, the catalog-order id list, search
+    postings) is spilled to a scratch directory and SQLite database, so
+    memory stays flat however big the catalog is.
+    """
+    shard_dir = os.path.join(out_dir, SHARDS_DIR)
+    page_dir = os.path.join(out_dir, PAGES_DIR)
+    os.makedirs(shard_dir, exist_ok=True)
+    os.makedirs(page_dir, exist_ok=True)
+    written = set()
+    categories = []
+    extra = {}
+    with tempfile.TemporaryDirectory(dir=out_dir, prefix='.build-') as scratch, \
+            contextlib.closing(sqlite3.connect(os.path.join(scratch, 'build.sqlite3'))) as db:
+        # Scratch data: no journal or fsyncs, and a small page cache so
+        # the ORDER BY sorts spill to disk instead of growing in memory
+        db.executescript(
+            'PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF; PRAGMA cache_size = -512;'
+            'CREATE TABLE products (ordinal INTEGER PRIMARY KEY, id BLOB, slug TEXT, start INTEGER, '
+            '"end" INTEGER, price BLOB, in_stock INTEGER, brand TEXT);'
+            'CREATE TABLE tokens (token TEXT, ordinal INTEGER);'
+        )
+        with catalog.mapped(path) as data:
+            shards, pages = _spill_records(catalog.iter_products(data), scratch, db, page_dir)
+        written.update(page['file'] for page in pages)
+
+        shard_files = {}
+        for slug, shard in shards.items():
+            name = shard.finish(shard_dir, slug)
+            shard_files[slug] = f"{SHARDS_DIR}/{name}"
+            written.add(shard_files[slug])
+            categories.append({'name': shard.category, 'slug': slug, 'file': shard_files[slug], 'count': shard.count})
+
+        ids = _HashedFile(os.path.join(scratch, 'ids'))
+        ids.write_array(b'[' + product_id + b',' + _encode(shard_files[slug]) + f',{start},{end}]'.encode('ascii')
+                        for product_id, slug, start, end
+                        in db.execute('SELECT id, slug, start, "end" FROM products ORDER BY ordinal'))
+        extra['ids'] = ids.finish(out_dir, 'ids')
+        search = _HashedFile(os.path.join(scratch, 'search'))
+        _write_search(db, search)
+        extra['search'] = search.finish(out_dir, 'search')
+        written.update(extra.values())
+        count, = db.execute('SELECT COUNT(*) FROM products').fetchone()
+
+    index = {
+        'version': ARTIFACT_VERSION,
+        'source': fingerprint(path),
+        'count': count,
+        'categories': categories,
+        'pageSize': PAGE_SIZE,
+        'pages': pages,
+        **extra,
+    }
+    # The index is the commit point: readers never see it pointing at
+    # files that don't exist yet
+    write_atomic(os.path.join(out_dir, INDEX_NAME), json.dumps(index, indent=2).encode('utf-8'))
+    for directory, prefix in ((out_dir, ''), (shard_dir, SHARDS_DIR), (page_dir, PAGES_DIR)):
+        for name in os.listdir(directory):
+            relative = f"{prefix}/{name}" if prefix else name
+            if name.endswith('.json') and name != INDEX_NAME and relative not in written:
+                os.remove(os.path.join(directory, name))
+    return index
+
+
+def read_index(artifact_dir=DEFAULT_ARTIFACT_DIR):
+    path = os.path.join(artifact_dir, INDEX_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return index if index.get('version') == ARTIFACT_VERSION else None
+
+
+def is_fresh(index, source=PRODUCTS_FILE):
+    """
+    Whether the artifact was built from the current contents of `source`.
+    A size mismatch settles it cheaply; otherwise the content hash decides.
+    """
+    try:
+        size = os.path.getsize(source)
+    except OSError:
+        return False
+    built = index['source']
+    if size != built['size']:
+        return False
+    return fingerprint(source)['sha256'] == built['sha256']
+
+
+class CatalogArtifact:
+    """
+    Read-only, lazily loaded view of a compiled catalog with the same
+    lookups as catalog.Catalog. Records carry no byte spans, so anything
+    that patches products.ts must use catalog.load_catalog instead.
+    """
+
+    def __init__(self, artifact_dir, index):
+        self.artifact_dir = artifact_dir
+        self.index = index
+        self.path = index['source']['path']
+        self._entries = None
+        self._by_id = None
+        self._maps = {}
+        self._records = {}
+
+    @classmethod
+    def open(cls, artifact_dir=DEFAULT_ARTIFACT_DIR, source=PRODUCTS_FILE):
+        """
+        The artifact in `artifact_dir`, or None if it's missing or stale
+        """
+        index = read_index(artifact_dir)
+        if index is None or not is_fresh(index, source):
+            return None
+        return cls(artifact_dir, index)
+
+    def _load_entries(self):
+        if self._entries is None:
+            with open(os.path.join(self.artifact_dir, self.index['ids']), 'rb') as f:
+                self._entries = json.loads(f.read())
+            self._by_id = {}
+            for ordinal, entry in enumerate(self._entries):
+                self._by_id.setdefault(entry[0], ordinal)
+        return self._entries
+
+    def _shard(self, file_name):
+        shard = self._maps.get(file_name)
+        if shard is None:
+            with open(os.path.join(self.artifact_dir, file_name), 'rb') as f:
+                shard = self._maps[file_name] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return shard
+
+    def record(self, ordinal):
+        record = self._records.get(ordinal)
+        if record is None:
+            _, file_name, start, end = self._load_entries()[ordinal]
+            fields = json.loads(self._shard(file_name)[start:end])
+            record = self._records[ordinal] = ProductRecord(fields, {}, start, end, ordinal)
+        return record
+
+    def __len__(self):
+        return self.index['count']
+
+    def __iter__(self):
+        return (self.record(ordinal) for ordinal in range(len(self._load_entries())))
+
+    def get(self, product_id):
+        self._load_entries()
+        ordinal = self._by_id.get(product_id)
+        return self.record(ordinal) if ordinal is not None else None
+
+    def with_fields(self, *names):
+        """
+        Products that define every one of the given fields
+        """
+        return [record for record in self if all(record.get(name) is not None for name in names)]
+
+    @property
+    def categories(self):
+        return sorted(entry['name'] for entry in self.index['categories'] if entry['name'] != UNCATEGORIZED)
+
+    def in_category(self, category):
+        """
+        Every product of one category, decoding only that shard
+        """
+        for entry in self.index['categories']:
+            if entry['name'] == category:
+                return json.loads(self._shard(entry['file'])[:])
+        return []
+
+    def search(self, query):
+        """
+        Ids of products matching every word of `query`
+        """
+        with open(os.path.join(self.artifact_dir, self.index['search']), 'rb') as f:
+            search = json.loads(f.read())
+        words = [word for word in TOKEN_PATTERN.findall(query.lower()) if len(word) > 1]
+        if not words:
+            return []
+        matches = set(search['tokens'].get(words[0], []))
+        for word in words[1:]:
+            matches &= set(search['tokens'].get(word, []))
+        return [search['ids'][ordinal] for ordinal in sorted(matches)]
+
+    def close(self):
+        for shard in self._maps.values():
+            shard.close()
+        self._maps = {}
+
+
+def load_products(path=PRODUCTS_FILE, artifact_dir=DEFAULT_ARTIFACT_DIR):
+    """
+    Catalog for read-only use: the compiled artifact when it's up to date
+    with `path`, else products.ts parsed as usual
+    """
+    with metrics.timer('catalog_load') as labels:
+        artifact = CatalogArtifact.open(artifact_dir, path)
+        labels['source'] = 'artifact' if artifact is not None else 'products.ts'
+    return artifact if artifact is not None else catalog.load_catalog(path)
+
+
+def refresh_artifact(path=PRODUCTS_FILE, artifact_dir=DEFAULT_ARTIFACT_DIR):
+    """
+    Rebuild an existing artifact for `path` after products.ts was
+    rewritten, so it doesn't go stale. Returns True if it was rebuilt.
+    """
+    index = read_index(artifact_dir)
+    if index is None or os.path.abspath(index['source']['path']) != os.path.abspath(path):
+        return False
+    build_artifact(path, artifact_dir)
+    return True
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compile products.ts into per-category shards and indexes")
+    parser.add_argument('--products', default=PRODUCTS_FILE)
+    parser.add_argument('--out-dir', default=DEFAULT_ARTIFACT_DIR)
+    parser.add_argument('--check', action='store_true',
+                        help="only report whether the artifact is up to date (exit 1 if not)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.check:
+        index = read_index(args.out_dir)
+        if index is not None and is_fresh(index, args.products):
+            print(f"✅ {args.out_dir} is up to date with {args.products}")
+            return
+        print(f"❌ {args.out_dir} is missing or older than {args.products}; run catalog_artifact.py")
+        raise SystemExit(1)
+
+    index = build_artifact(args.products, args.out_dir)
+    total = sum(os.path.getsize(os.path.join(args.out_dir, entry['file'])) for entry in index['categories'])
+    print(f"📦 {index['count']} products compiled into {len(index['categories'])} category shards "
+          f"({total / 1024:.1f} KB) and {len(index['pages'])} pages in {args.out_dir}")
+    for entry in index['categories']:
+        print(f"   - {entry['name']}: {entry['count']} products -> {entry['file']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Fault-injection checks for the scraper's host throttle.
+
+Each check starts stub_shopify_server.py with one kind of misbehaviour
+and runs the scraper (or the throttle directly) against it under a
+deadline, so a leaked concurrency slot or a stuck circuit breaker shows
+up as a failure instead of a hung nightly run. Exits non-zero if any
+check fails.
+
+    python check_throttle.py
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+import http_client
+import scrape_real_images
+from rate_limit import AIMDController, HostThrottle
+from stub_shopify_server import start_stub_server, synthetic_catalog
+
+DEFAULT_TIMEOUT = 30.0
+
+
+def run_with_deadline(func, timeout):
+    """
+    (finished, result or exception) of func() run on a daemon thread
+    """
+    outcome = {}
+
+    def target():
+        try:
+            outcome['result'] = func()
+        except BaseException as e:
+            outcome['result'] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive(), outcome.get('result')
+
+
+def stub_products(shop_catalog):
+    return [{'id': str(product['id']), 'name': product['title'], 'url': f"/products/{product['handle']}"}
+            for product in shop_catalog]
+
+
+def check_decode_errors_release_slots(timeout):
+    """
+    Pages that can't be decoded fail in the parser, not in requests; the
+    AIMD slot each one took must still be returned
+    """
+    shop_catalog = synthetic_catalog(8, images_per_product=1)
+    server = start_stub_server(shop_catalog, page_charset='x-unknown-charset')
+    try:
+        finished, counts = run_with_deadline(
+            lambda: scrape_real_images.scrape_products(stub_products(shop_catalog), concurrency=2, rate=1000,
+                                                       burst=100, base_url=server.base_url, max_concurrency=2,
+                                                       progress_interval=60),
+            timeout)
+    finally:
+        server.shutdown()
+        server.server_close()
+    if not finished:
+        return f"scrape hung on undecodable pages (no result within {timeout:.0f}s)"
+    if isinstance(counts, BaseException):
+        return f"scrape raised {counts!r} on undecodable pages"
+    if counts[0]:
+        return "undecodable pages produced an image URL"
+    return None
+
+
+def check_half_open_waiters_outlast_trial(timeout):
+    """
+    While a half-open breaker's trial request is in flight, other requests
+    to the host must wait for its outcome rather than use up their retries
+    """
+    url = 'http://stub.invalid/products/trial'
+    throttle = HostThrottle(rate=1000, burst=100, failure_threshold=1, reset_timeout=0.2)
+    throttle.acquire(url)
+    throttle.release(url, 503)
+    time.sleep(0.3)
+    # This request is the trial; keep it in flight for several poll intervals
+    throttle.acquire(url)
+    outcome = []
+    waiter = threading.Thread(target=lambda: outcome.append(
+        scrape_real_images.with_retries(url, 'Trial waiter', lambda _: 'page', throttle=throttle)))
+    waiter.start()
+    time.sleep(3.5)
+    throttle.release(url, 200)
+    waiter.join(timeout)
+    if waiter.is_alive():
+        return f"request behind the trial still waiting {timeout:.0f}s after it succeeded"
+    if outcome != ['page']:
+        return "request behind a half-open trial gave up before the trial finished"
+    return None
+
+
+def check_local_errors_not_counted(timeout):
+    """
+    A request that fails on our side (here a parser error) says nothing
+    about the host: it must neither close a half-open breaker nor count
+    as a healthy completion for the AIMD limit, but must free its slot
+    """
+    url = 'http://stub.invalid/products/local-error'
+    controller = AIMDController(initial=1, maximum=4, increase_every=1)
+    throttle = HostThrottle(rate=1000, burst=100, controller=controller, failure_threshold=1, reset_timeout=0.2)
+    throttle.acquire(url)
+    throttle.release(url, 503)
+    time.sleep(0.3)
+
+    def parser_error(_):
+        raise ValueError("unparseable page")
+
+    finished, result = run_with_deadline(
+        lambda: scrape_real_images.with_retries(url, 'Local error', parser_error, throttle=throttle), timeout)
+    if not finished:
+        return f"with_retries hung on a local error (no result within {timeout:.0f}s)"
+    breaker = throttle.breaker_for(url)
+    if breaker.state != breaker.HALF_OPEN:
+        return f"a local error moved the half-open breaker to {breaker.state}"
+    if not breaker.allow():
+        return "a local error kept the half-open trial in flight"
+    if controller.active or controller.current_limit != 1:
+        return (f"a local error left {controller.active} slots taken and the limit at "
+                f"{controller.current_limit} (expected 0 and 1)")
+    return None
+
+
+def check_throttled_session_leaves_retry_after(timeout):
+    """
+    With the throttle in charge, a 429's Retry-After must reach it: the
+    transport may not sleep on the header (uncapped, holding the slot)
+    or resend the request itself
+    """
+    shop_catalog = synthetic_catalog(1, images_per_product=1)
+    server = start_stub_server(shop_catalog, throttle_rate=1.0, retry_after=300)
+    try:
+        http_client.get_session(1, throttled=True)
+        url = server.base_url + stub_products(shop_catalog)[0]['url']
+        finished, response = run_with_deadline(lambda: http_client.get(url), timeout)
+        sent = server.requests
+    finally:
+        http_client.close_session()
+        server.shutdown()
+        server.server_close()
+    if not finished:
+        return f"transport slept on Retry-After (no response within {timeout:.0f}s)"
+    if isinstance(response, BaseException):
+        return f"request raised {response!r}"
+    if response.status_code != 429 or sent != 1:
+        return f"expected one 429 handed back, got {response.status_code} after {sent} requests"
+    return None
+
+
+def check_scrape_retries_cap_retry_after(timeout):
+    """
+    The scraper's own retry loop must wait out a 429 for at most the
+    throttle's max_retry_after, however long Retry-After asks for
+    """
+    shop_catalog = synthetic_catalog(1, images_per_product=1)
+    server = start_stub_server(shop_catalog, throttle_rate=1.0, retry_after=300)
+    throttle = HostThrottle(rate=1000, burst=100, max_retry_after=1.0)
+    try:
+        http_client.get_session(1, throttled=True)
+        url = server.base_url + stub_products(shop_catalog)[0]['url']
+        finished, page = run_with_deadline(
+            lambda: scrape_real_images.with_retries(url, 'Throttled page', scrape_real_images.fetch_page,
+                                                    retries=2, throttle=throttle),
+            timeout)
+        sent = server.requests
+    finally:
+        http_client.close_session()
+        server.shutdown()
+        server.server_close()
+    if not finished:
+        return f"retry loop slept on the raw Retry-After (no result within {timeout:.0f}s)"
+    if isinstance(page, BaseException):
+        return f"with_retries raised {page!r}"
+    if page is not None or sent != 2:
+        return f"expected 2 throttled attempts and no page, got {sent} requests"
+    return None
+
+
+CHECKS = {
+    'decode-errors': check_decode_errors_release_slots,
+    'half-open': check_half_open_waiters_outlast_trial,
+    'local-errors': check_local_errors_not_counted,
+    'retry-after': check_throttled_session_leaves_retry_after,
+    'retry-after-scrape': check_scrape_retries_cap_retry_after,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fault-injection checks for the scraper's host throttle")
+    parser.add_argument('--checks', default=','.join(CHECKS),
+                        help=f"comma-separated subset of: {', '.join(CHECKS)}")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help="seconds each check may take before it counts as hung")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    http_client.disable_cache()
+    names = args.checks.split(',')
+    failures = []
+    for name in names:
+        print(f"\n🧪 {name}")
+        problem = CHECKS[name](args.timeout)
+        if problem:
+            failures.append(f"{name}: {problem}")
+    print()
+    if failures:
+        print("❌ Throttle checks failed:")
+        for failure in failures:
+            print(f"   - {failure}")
+        sys.stdout.flush()
+        # A hung check leaves worker threads that a normal exit would wait on
+        os._exit(1)
+    print(f"✅ {len(names)} throttle checks passed")
+
+
+if __name__ == "__main__":
+    main()
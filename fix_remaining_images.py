@@ -1,9 +1,13 @@
 #!/usr/bin/env python3
 """
 Script to replace remaining Unsplash images with authentic Brightet.com images
+
+    python image_tools.py fix
 """
 
-import re
+import sys
+
+import image_tools
 
 # Authentic Brightet.com images we collected
 authentic_images = [
@@ -29,32 +33,33 @@ authentic_images = [
     'https://brightet.com/cdn/shop/files/09fd34c551a7b45d811e0a87350652b1.jpg?v=1755546889',
 ]
 
-def fix_images():
-    # Read the products file
-    with open('project/src/data/products.ts', 'r', encoding='utf-8') as f:
-        content = f.read()
+def add_arguments(parser):
+    pass
 
-    # Find all Unsplash URLs
-    unsplash_pattern = r"image: 'https://images\.unsplash\.com/[^']+'"
-    unsplash_matches = re.findall(unsplash_pattern, content)
+def run(session, args):
+    # Find all Unsplash images in the products file the run was given
+    unsplash_products = [
+        record for record in session.products('id', 'image')
+        if record['image'].startswith('https://images.unsplash.com/')
+    ]
 
-    print(f"Found {len(unsplash_matches)} Unsplash images to replace")
+    print(f"Found {len(unsplash_products)} Unsplash images to replace")
 
     # Replace each Unsplash image with an authentic Brightet image
-    image_index = 0
-    for match in unsplash_matches:
+    image_updates = {}
+    for image_index, record in enumerate(unsplash_products):
         # Cycle through authentic images
         replacement_image = authentic_images[image_index % len(authentic_images)]
-        replacement = f"image: '{replacement_image}'"
-        content = content.replace(match, replacement, 1)
-        image_index += 1
-        print(f"Replaced: {match} -> {replacement}")
+        image_updates.setdefault(record['id'], replacement_image)
+        print(f"Replaced: {record['image']} -> {image_updates[record['id']]}")
+
+    # Written back with the other stages' changes at the end of the run
+    session.update_images(image_updates)
 
-    # Write back to file
-    with open('project/src/data/products.ts', 'w', encoding='utf-8') as f:
-        f.write(content)
+    print(f"Successfully replaced {len(unsplash_products)} images!")
 
-    print(f"Successfully replaced {len(unsplash_matches)} images!")
+def main(argv=None):
+    image_tools.main(['fix'] + (sys.argv[1:] if argv is None else list(argv)))
 
 if __name__ == "__main__":
-    fix_images()
+    main()
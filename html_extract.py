@@ -0,0 +1,242 @@
+"""
+Streaming, early-exit product image extraction.
+
+Instead of downloading the whole product page and building a full
+BeautifulSoup tree, the body is fed chunk by chunk into the stdlib HTML
+tokenizer. Every <img> is checked against all of the scraper's selectors
+at once (a compiled selector plan), and parsing stops - and the
+connection is released - as soon as either
+
+  * the selector cascade's answer is settled (every higher-priority
+    selector has seen its first match), or
+  * a high-confidence product image turns up: a Shopify CDN image inside
+    the theme's product media/gallery markup.
+
+On Shopify pages the main product photo sits near the top of the
+document, so most of the page is never transferred or parsed. When no
+early exit fires, the result is exactly what the BeautifulSoup cascade
+in scrape_real_images.find_image_with_soup returns.
+"""
+
+import codecs
+from html.parser import HTMLParser
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+# Shopify CDN paths: the legacy selectors only look for `cdn.shop`, but the
+# storefront serves product files from `<store>/cdn/shop/files/...`
+SHOPIFY_CDN_MARKERS = ('cdn.shop', '/cdn/shop/')
+CHUNK_SIZE = 16 * 1024
+
+# Descendant selectors `.<class> img`, in cascade order after the two
+# cdn.shop attribute selectors
+CONTAINER_CLASSES = (
+    'product-single__photo',
+    'product__photo',
+    'product-image',
+    'main-product-image',
+)
+
+# Ancestor / img classes that mark the product gallery across Shopify themes
+PRODUCT_MEDIA_CLASSES = (
+    'product__media',
+    'product__media-item',
+    'product-single__photo',
+    'product__photo',
+    'product-image',
+    'main-product-image',
+    'product-gallery',
+    'product-featured-image',
+    'product-image-main',
+)
+
+VOID_ELEMENTS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+}
+
+# Rank of each selector in the cascade
+RANK_DATA_SRC_CDN = 0
+RANK_SRC_CDN = 1
+RANK_CONTAINER = 2  # 2..5, one per CONTAINER_CLASSES entry
+RANK_ALT = 6
+RANK_ZOOM = 7
+RANK_FEATURED = 8
+RANK_MAIN = 9
+RANK_COUNT = 10
+
+
+class _Settled(Exception):
+    pass
+
+
+def is_image_url(url):
+    return any(ext in url.lower() for ext in IMAGE_EXTENSIONS)
+
+
+def absolutize(url, base_url):
+    if url.startswith('//'):
+        return 'https:' + url
+    if url.startswith('/'):
+        return base_url + url
+    return url
+
+
+class SelectorPlan:
+    """
+    The scraper's selector cascade, precompiled into checks against a
+    single <img> tag and the set of classes on its open ancestors
+    """
+
+    def __init__(self, product_name):
+        words = product_name.split()
+        # A quote in the name breaks the CSS attribute selector, which the
+        # soup cascade skips; mirror that
+        self.alt_word = words[0] if words and '"' not in words[0] else None
+
+    def is_high_confidence(self, attrs, ancestor_classes, url):
+        """
+        A cdn.shop image inside product gallery markup is the product photo
+        """
+        if not url or not any(marker in url for marker in SHOPIFY_CDN_MARKERS) or not is_image_url(url):
+            return False
+        if 'data-zoom-src' in attrs:
+            return True
+        classes = (attrs.get('class') or '').split()
+        return any(cls in classes or ancestor_classes.get(cls) for cls in PRODUCT_MEDIA_CLASSES)
+
+    def ranks(self, attrs, ancestor_classes):
+        data_src = attrs.get('data-src') or ''
+        src = attrs.get('src') or ''
+        classes = (attrs.get('class') or '').split()
+        matched = []
+        if 'cdn.shop' in data_src:
+            matched.append(RANK_DATA_SRC_CDN)
+        if 'cdn.shop' in src:
+            matched.append(RANK_SRC_CDN)
+        for offset, container in enumerate(CONTAINER_CLASSES):
+            if ancestor_classes.get(container):
+                matched.append(RANK_CONTAINER + offset)
+        if self.alt_word is not None and self.alt_word in (attrs.get('alt') or ''):
+            matched.append(RANK_ALT)
+        if 'data-zoom-src' in attrs:
+            matched.append(RANK_ZOOM)
+        if 'product-featured-image' in classes:
+            matched.append(RANK_FEATURED)
+        if 'product-image-main' in classes:
+            matched.append(RANK_MAIN)
+        return matched
+
+
+class ProductImageParser(HTMLParser):
+    """
+    Tokenizes a product page incrementally and tracks, for each selector,
+    the first <img> it would select (what `select_one` returns)
+    """
+
+    def __init__(self, product_name, base_url):
+        super().__init__(convert_charrefs=True)
+        self.plan = SelectorPlan(product_name)
+        self.base_url = base_url
+        self.decided = [False] * RANK_COUNT
+        self.candidates = [None] * RANK_COUNT
+        self.fallback = None
+        self.result = None
+        self.via_fallback = False
+        self._open = []
+        self._ancestor_classes = {}
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'img':
+            self._handle_img(dict(attrs))
+            return
+        if tag in VOID_ELEMENTS:
+            return
+        classes = ()
+        for name, value in attrs:
+            if name == 'class' and value:
+                classes = value.split()
+                break
+        self._open.append((tag, classes))
+        for cls in classes:
+            self._ancestor_classes[cls] = self._ancestor_classes.get(cls, 0) + 1
+
+    def handle_endtag(self, tag):
+        if tag in VOID_ELEMENTS:
+            return
+        # Pop back to the matching open tag, tolerating unclosed children
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i][0] == tag:
+                for _, classes in self._open[i:]:
+                    for cls in classes:
+                        self._ancestor_classes[cls] -= 1
+                del self._open[i:]
+                return
+
+    def _resolve(self, attrs):
+        url = attrs.get('data-src') or attrs.get('src')
+        if not url:
+            return None
+        url = absolutize(url, self.base_url)
+        return url if is_image_url(url) else None
+
+    def _handle_img(self, attrs):
+        for rank in self.plan.ranks(attrs, self._ancestor_classes):
+            if not self.decided[rank]:
+                self.decided[rank] = True
+                self.candidates[rank] = self._resolve(attrs)
+
+        src = attrs.get('data-src') or attrs.get('src')
+        if self.fallback is None and src and 'cdn.shop' in src and is_image_url(src):
+            self.fallback = absolutize(src, self.base_url)
+
+        if self.plan.is_high_confidence(attrs, self._ancestor_classes, src):
+            self.result = absolutize(src, self.base_url)
+            raise _Settled()
+
+        # The answer is settled once every higher-priority selector has
+        # seen its first match and one of them produced a valid URL
+        for rank in range(RANK_COUNT):
+            if not self.decided[rank]:
+                return
+            if self.candidates[rank]:
+                self.result = self.candidates[rank]
+                raise _Settled()
+
+    def finish(self):
+        """
+        End of document: selectors that never matched are skipped
+        """
+        for rank in range(RANK_COUNT):
+            if self.candidates[rank]:
+                return self.candidates[rank], False
+        return self.fallback, self.fallback is not None
+
+
+def extract_product_image(chunks, product_name, base_url, encoding='utf-8'):
+    """
+    Feed an iterable of body chunks (bytes) through the parser, stopping
+    as soon as the image is settled.
+
+    Returns (image_url or None, via_fallback, bytes_consumed).
+    """
+    parser = ProductImageParser(product_name, base_url)
+    decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+    consumed = 0
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            consumed += len(chunk)
+            parser.feed(decoder.decode(chunk))
+        parser.feed(decoder.decode(b'', final=True))
+        parser.close()
+    except _Settled:
+        return parser.result, False, consumed
+    image_url, via_fallback = parser.finish()
+    return image_url, via_fallback, consumed
+
+
+def iter_chunks(data, chunk_size=CHUNK_SIZE):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
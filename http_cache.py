@@ -0,0 +1,338 @@
+"""
+Persistent on-disk HTTP cache with conditional revalidation.
+
+Responses are stored in a small SQLite file keyed by method and URL,
+together with their ETag / Last-Modified validators. Within the TTL a
+cached response is served without touching the network; after that the
+request is sent with If-None-Match / If-Modified-Since so an unchanged
+page or image costs a bodyless 304. The store is size-bounded and evicts
+least-recently-used entries first.
+
+Callers that stream a body and keep only something derived from it (the
+scraper's image URL for a page) store that value with the validators
+instead of the body: lookup_derived / store_derived / touch_derived.
+Those values count towards the same size bound and are evicted in the
+same LRU order as full responses.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_CACHE_PATH = '.cache/http_cache.sqlite3'
+DEFAULT_TTL = 60 * 60  # 1 hour: nightly runs revalidate instead of re-downloading
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Hop-by-hop / transfer headers that must not be replayed from the cache
+SKIP_HEADERS = {'connection', 'keep-alive', 'transfer-encoding', 'content-encoding', 'content-length'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+CREATE TABLE IF NOT EXISTS derived (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS derived_accessed_at ON derived (accessed_at);
+"""
+# Both tables count towards max_bytes and share one LRU order
+TABLES = ('responses', 'derived')
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.stored = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def as_dict(self):
+        return {
+            'hits': self.hits,
+            'revalidated': self.revalidated,
+            'misses': self.misses,
+            'stored': self.stored,
+            'evicted': self.evicted,
+        }
+
+    def report(self):
+        total = self.hits + self.revalidated + self.misses
+        saved = self.hits + self.revalidated
+        rate = (saved / total * 100) if total else 0.0
+        return (f"📦 HTTP cache: {self.hits} hits, {self.revalidated} revalidated (304), "
+                f"{self.misses} misses — {rate:.1f}% served without a full download")
+
+
+class HTTPCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        # Kept up to date by store() so it doesn't re-sum the table each time
+        self._total_bytes = self._stored_bytes()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _stored_bytes(self):
+        return sum(self._db.execute(f"SELECT COALESCE(SUM(size), 0) FROM {table}").fetchone()[0]
+                   for table in TABLES)
+
+    @staticmethod
+    def key_for(method, url):
+        return f"{method.upper()} {url}"
+
+    def lookup(self, method, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, status, headers, body, etag, last_modified, stored_at FROM responses WHERE key = ?",
+                (self.key_for(method, url),),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'url': row[0],
+            'status': row[1],
+            'headers': json.loads(row[2]),
+            'body': row[3],
+            'etag': row[4],
+            'last_modified': row[5],
+            'stored_at': row[6],
+        }
+
+    def is_fresh(self, entry):
+        """
+        Whether a stored entry may still be used without revalidating
+        """
+        return time.time() - entry['stored_at'] < self.ttl
+
+    @staticmethod
+    def validator_headers(entry):
+        """
+        If-None-Match / If-Modified-Since for revalidating a stored entry
+        """
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def lookup_derived(self, kind, url):
+        """
+        Value stored by store_derived() for `url`, with its validators
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, etag, last_modified, stored_at FROM derived WHERE key = ?",
+                (self.key_for(kind, url),),
+            ).fetchone()
+        if row is None:
+            return None
+        return {'value': json.loads(row[0]), 'etag': row[1], 'last_modified': row[2], 'stored_at': row[3]}
+
+    def store_derived(self, kind, url, response, value):
+        """
+        Keep `value` (JSON-serialisable) computed from `response` in place
+        of its body, so the next request for `url` can be conditional
+        """
+        value = json.dumps(value)
+        now = time.time()
+        key = self.key_for(kind, url)
+        with self._lock:
+            replaced = self._db.execute("SELECT size FROM derived WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO derived "
+                "(key, value, etag, last_modified, stored_at, accessed_at, size) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, value, response.headers.get('ETag'), response.headers.get('Last-Modified'), now, now,
+                 len(value)),
+            )
+            self._db.commit()
+            self._total_bytes += len(value) - (replaced[0] if replaced else 0)
+            over = self._total_bytes > self.max_bytes
+        self.stats.incr('stored')
+        if over:
+            self.evict()
+
+    def touch_derived(self, kind, url, response=None):
+        """
+        Mark a stored value as used; with the `response` of a 304 that
+        confirmed it, also restart its TTL
+        """
+        now = time.time()
+        with self._lock:
+            if response is not None:
+                self._db.execute(
+                    "UPDATE derived SET accessed_at = ?, stored_at = ?, etag = COALESCE(?, etag), "
+                    "last_modified = COALESCE(?, last_modified) WHERE key = ?",
+                    (now, now, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                     self.key_for(kind, url)),
+                )
+            else:
+                self._db.execute("UPDATE derived SET accessed_at = ? WHERE key = ?", (now, self.key_for(kind, url)))
+            self._db.commit()
+
+    def touch(self, method, url, refreshed=False, etag=None, last_modified=None):
+        now = time.time()
+        with self._lock:
+            if refreshed:
+                self._db.execute(
+                    "UPDATE responses SET accessed_at = ?, stored_at = ?, "
+                    "etag = COALESCE(?, etag), last_modified = COALESCE(?, last_modified) WHERE key = ?",
+                    (now, now, etag, last_modified, self.key_for(method, url)),
+                )
+            else:
+                self._db.execute(
+                    "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                    (now, self.key_for(method, url)),
+                )
+            self._db.commit()
+
+    def store(self, method, url, response):
+        body = b'' if method.upper() == 'HEAD' else response.content
+        headers = {name: value for name, value in response.headers.items() if name.lower() not in SKIP_HEADERS}
+        now = time.time()
+        key = self.key_for(method, url)
+        with self._lock:
+            replaced = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, url, status, headers, body, etag, last_modified, stored_at, accessed_at, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, response.url or url, response.status_code, json.dumps(headers),
+                 body, response.headers.get('ETag'), response.headers.get('Last-Modified'), now, now, len(body)),
+            )
+            self._db.commit()
+            self._total_bytes += len(body) - (replaced[0] if replaced else 0)
+            over = self._total_bytes > self.max_bytes
+        self.stats.incr('stored')
+        if over:
+            self.evict()
+
+    def evict(self):
+        """
+        Drop least-recently-used responses and derived values until the
+        store fits in max_bytes
+        """
+        with self._lock:
+            # Re-sum here (rare) in case another process shares the file
+            total = self._stored_bytes()
+            self._total_bytes = total
+            if total <= self.max_bytes:
+                return
+            evicted = 0
+            entries = self._db.execute(
+                "SELECT 'responses', key, size, accessed_at FROM responses "
+                "UNION ALL SELECT 'derived', key, size, accessed_at FROM derived ORDER BY accessed_at"
+            ).fetchall()
+            for table, key, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                self._db.execute(f"DELETE FROM {table} WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+            self._db.commit()
+            self._total_bytes = total
+        self.stats.incr('evicted', evicted)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.execute("DELETE FROM derived")
+            self._db.commit()
+            self._total_bytes = 0
+
+    @staticmethod
+    def is_cacheable(response):
+        if response.status_code != 200:
+            return False
+        cache_control = response.headers.get('Cache-Control', '').lower()
+        return 'no-store' not in cache_control
+
+    @staticmethod
+    def to_response(entry, request_url):
+        response = Response()
+        response.status_code = entry['status']
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response._content = entry['body']
+        response.url = entry['url'] or request_url
+        response.reason = 'OK'
+        response.encoding = None
+        response.from_cache = True
+        return response
+
+    def fetch(self, session, method, url, **kwargs):
+        """
+        Serve `method url` from the cache, revalidating with the origin
+        once the entry is older than the TTL
+        """
+        entry = self.lookup(method, url)
+        if entry is not None and self.is_fresh(entry):
+            self.stats.incr('hits')
+            self.touch(method, url)
+            return self.to_response(entry, url)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        if entry is not None:
+            headers.update(self.validator_headers(entry))
+
+        response = session.request(method, url, headers=headers, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            self.stats.incr('revalidated')
+            self.touch(method, url, refreshed=True,
+                       etag=response.headers.get('ETag'),
+                       last_modified=response.headers.get('Last-Modified'))
+            response.close()
+            return self.to_response(entry, url)
+
+        self.stats.incr('misses')
+        if self.is_cacheable(response):
+            self.store(method, url, response)
+        return response
+
+
+def add_cache_arguments(parser):
+    parser.add_argument('--no-cache', action='store_true',
+                        help="bypass the persistent HTTP cache")
+    parser.add_argument('--cache-path', default=DEFAULT_CACHE_PATH,
+                        help="SQLite file backing the HTTP cache")
+    parser.add_argument('--cache-ttl', type=float, default=DEFAULT_TTL,
+                        help="seconds a cached response is served without revalidation")
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="size bound for the cache before LRU eviction kicks in")
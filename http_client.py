@@ -0,0 +1,242 @@
+"""
+Shared HTTP client for the image scripts.
+
+All requests to brightet.com go through one pooled keep-alive session so
+repeated calls reuse TCP+TLS connections instead of paying a new
+handshake each time. Headers, timeouts and the retry policy live here
+so the scraper, verifier and tester behave the same way. When enabled,
+GET/HEAD requests are served through the persistent cache in
+http_cache.py. Every request is timed into metrics.py: connection
+setup (DNS + TCP + TLS), time to first byte, and body transfer.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+import metrics
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+# (connect, read) timeout in seconds
+DEFAULT_TIMEOUT = (5, 10)
+
+DEFAULT_POOL_SIZE = 10
+
+_session = None
+_session_pool_size = 0
+_session_throttled = False
+_session_lock = threading.Lock()
+_cache = None
+
+
+def build_retry_policy(throttled=False):
+    """
+    Transport-level retries: reconnect on dropped connections and retry
+    gateway errors, honouring Retry-After. Application-level retries
+    (e.g. the scraper's attempt loop) sit on top of this.
+
+    With `throttled`, a rate_limit.HostThrottle is in charge of 429/5xx
+    and Retry-After, so only connection failures are retried here: urllib3
+    would otherwise sleep the full, uncapped Retry-After while the caller
+    holds its concurrency slot, and the throttle would never see the status.
+    """
+    if throttled:
+        return Retry(
+            total=2,
+            connect=2,
+            read=0,
+            status=0,
+            backoff_factor=0.5,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+    return Retry(
+        total=2,
+        connect=2,
+        read=0,
+        status=2,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+class TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        with metrics.timer('connect', host=self.host):
+            super().connect()
+
+
+class TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        with metrics.timer('connect', host=self.host):
+            super().connect()
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter whose pools time each new connection (reused keep-alive
+    connections cost nothing and record nothing)
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': TimedHTTPConnectionPool,
+            'https': TimedHTTPSConnectionPool,
+        }
+
+
+def build_session(pool_size=DEFAULT_POOL_SIZE, throttled=False):
+    """
+    Create a keep-alive session whose connection pool holds `pool_size`
+    connections per host, enough for that many concurrent workers.
+    `throttled` picks the retry policy (see build_retry_policy).
+    """
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    adapter = TimedHTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=build_retry_policy(throttled),
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session(concurrency=None, throttled=None):
+    """
+    Return the process-wide session, (re)building it if a larger pool
+    is needed for the requested concurrency, or if `throttled` (when
+    given) asks for the other retry policy
+    """
+    global _session, _session_pool_size, _session_throttled
+    pool_size = max(concurrency or DEFAULT_POOL_SIZE, 1)
+    with _session_lock:
+        if throttled is None:
+            throttled = _session_throttled
+        if _session is None or pool_size > _session_pool_size or throttled != _session_throttled:
+            if _session is not None:
+                _session.close()
+            pool_size = max(pool_size, _session_pool_size)
+            _session = build_session(pool_size, throttled)
+            _session_pool_size = pool_size
+            _session_throttled = throttled
+        return _session
+
+
+def close_session():
+    global _session, _session_pool_size, _session_throttled
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pool_size = 0
+        _session_throttled = False
+
+
+def enable_cache(path=None, ttl=None, max_bytes=None):
+    """
+    Route GET/HEAD requests through the persistent HTTP cache
+    """
+    global _cache
+    from http_cache import HTTPCache, DEFAULT_CACHE_PATH, DEFAULT_TTL, DEFAULT_MAX_BYTES
+
+    disable_cache()
+    _cache = HTTPCache(
+        path or DEFAULT_CACHE_PATH,
+        DEFAULT_TTL if ttl is None else ttl,
+        DEFAULT_MAX_BYTES if max_bytes is None else max_bytes,
+    )
+    return _cache
+
+
+def disable_cache():
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = None
+
+
+def get_cache():
+    return _cache
+
+
+def configure_cache(args):
+    """
+    Apply the --no-cache / --cache-* options added by
+    http_cache.add_cache_arguments
+    """
+    if args.no_cache:
+        disable_cache()
+        return None
+    return enable_cache(args.cache_path, args.cache_ttl, int(args.cache_max_mb * 1024 * 1024))
+
+
+def cache_report():
+    return _cache.stats.report() if _cache is not None else None
+
+
+def request(method, url, timeout=DEFAULT_TIMEOUT, **kwargs):
+    session = get_session()
+    cache = _cache
+    host = urlsplit(url).netloc
+    started = time.perf_counter()
+    try:
+        if cache is None or kwargs.get('stream'):
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        else:
+            response = cache.fetch(session, method, url, timeout=timeout, **kwargs)
+    except requests.exceptions.RequestException as e:
+        metrics.observe('request', time.perf_counter() - started, host=host, method=method, status=type(e).__name__)
+        metrics.count('requests', host=host, method=method, status='error')
+        raise
+    record_response(response, method, host, time.perf_counter() - started, kwargs.get('stream'))
+    return response
+
+
+def record_response(response, method, host, seconds, stream=False):
+    status = response.status_code
+    metrics.count('requests', host=host, method=method, status=status)
+    if getattr(response, 'from_cache', False):
+        metrics.observe('cache', seconds, host=host, method=method, status=status)
+        return
+    metrics.observe('request', seconds, host=host, method=method, status=status)
+    # elapsed runs from sending the request to parsing the response headers
+    ttfb = response.elapsed.total_seconds()
+    metrics.observe('ttfb', ttfb, host=host, method=method, status=status)
+    if not stream and method != 'HEAD':
+        metrics.observe('body', max(0.0, seconds - ttfb), host=host, method=method, status=status)
+
+
+def get(url, timeout=DEFAULT_TIMEOUT, **kwargs):
+    return request('GET', url, timeout=timeout, **kwargs)
+
+
+def head(url, timeout=DEFAULT_TIMEOUT, allow_redirects=True, **kwargs):
+    return request('HEAD', url, timeout=timeout, allow_redirects=allow_redirects, **kwargs)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Responsive derivatives for the mirrored catalog images.
+
+Reads the content-addressed store written by image_mirror.py and renders
+each source image at a fixed set of widths in AVIF, WebP and JPEG, fanning
+the work out over a process pool (resizing and encoding are CPU-bound).
+Outputs are keyed by the source sha256, so a rerun only renders images
+that are new or whose derivative settings changed. A srcset manifest maps
+product id -> ready-to-use `srcset` strings per format.
+
+    python image_mirror.py && python image_derivatives.py --workers 8
+"""
+
+import argparse
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image, ImageOps, features
+
+import image_mirror
+import metrics
+from catalog import write_atomic
+
+DERIVATIVES_DIR = 'derivatives'
+SRCSET_MANIFEST_NAME = 'srcset.json'
+DEFAULT_WIDTHS = (320, 640, 960, 1280, 1600)
+# Preferred first: <picture> lists <source> types in this order
+DEFAULT_FORMATS = ('avif', 'webp', 'jpeg')
+FALLBACK_WIDTH = 960
+EXIF_ORIENTATION = 0x0112
+
+FORMAT_OPTIONS = {
+    'avif': {'ext': '.avif', 'mime': 'image/avif', 'save': {'quality': 55, 'speed': 6}},
+    'webp': {'ext': '.webp', 'mime': 'image/webp', 'save': {'quality': 78, 'method': 4}},
+    'jpeg': {'ext': '.jpg', 'mime': 'image/jpeg', 'save': {'quality': 82, 'optimize': True, 'progressive': True}},
+}
+
+
+def available_formats(formats):
+    """
+    Drop formats this Pillow build can't encode (AVIF needs Pillow 11.3+
+    or the pillow-avif-plugin)
+    """
+    usable = []
+    for fmt in formats:
+        if fmt == 'jpeg' or features.check(fmt):
+            usable.append(fmt)
+        else:
+            print(f"⚠️  Pillow can't encode {fmt.upper()} here, skipping it")
+    return usable
+
+
+def settings_key(widths, formats):
+    """
+    Identifies the derivative settings; a change re-renders every source
+    """
+    parts = [','.join(str(w) for w in widths)]
+    for fmt in formats:
+        parts.append(fmt + ':' + ','.join(f"{k}={v}" for k, v in sorted(FORMAT_OPTIONS[fmt]['save'].items())))
+    return ';'.join(parts)
+
+
+def target_widths(source_width, widths):
+    """
+    Requested widths below the source width, plus the source width itself
+    when it falls in between - images are never upscaled
+    """
+    targets = [w for w in widths if w < source_width]
+    if len(targets) < len(widths):
+        targets.append(source_width)
+    return sorted(set(targets))
+
+
+def render_derivatives(source_path, out_dir, widths, formats):
+    """
+    Worker: decode one source image and write every width x format.
+    Runs in a child process; returns plain data only.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    with Image.open(source_path) as image:
+        raw_width, raw_height = image.size
+        source_width, source_height = image.size
+        if image.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+            source_width, source_height = source_height, source_width
+        targets = target_widths(source_width, widths)
+
+        # JPEG can decode at 1/2, 1/4, 1/8 scale directly - much cheaper
+        # than a full decode when the largest target is far below the source
+        scale = max(targets) / source_width
+        image.draft('RGB', (math.ceil(raw_width * scale), math.ceil(raw_height * scale)))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        outputs = []
+        # Largest first so each step resizes from the previous, smaller image
+        current = image
+        for width in sorted(targets, reverse=True):
+            height = max(1, round(source_height * width / source_width))
+            if current.width != width:
+                current = current.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+            for fmt in formats:
+                options = FORMAT_OPTIONS[fmt]
+                frame = current.convert('RGB') if fmt == 'jpeg' and current.mode != 'RGB' else current
+                path = os.path.join(out_dir, f"{width}{options['ext']}")
+                temp_path = path + '.tmp'
+                frame.save(temp_path, fmt.upper(), **options['save'])
+                os.replace(temp_path, path)
+                outputs.append({'width': width, 'height': height, 'format': fmt,
+                                'file': os.path.basename(path), 'bytes': os.path.getsize(path)})
+    return {'width': source_width, 'height': source_height, 'outputs': outputs}
+
+
+class DerivativeStore:
+    def __init__(self, mirror_dir=image_mirror.DEFAULT_MIRROR_DIR, url_prefix=image_mirror.DEFAULT_URL_PREFIX):
+        self.mirror_dir = mirror_dir
+        self.url_prefix = url_prefix.rstrip('/')
+        self.manifest_path = os.path.join(mirror_dir, SRCSET_MANIFEST_NAME)
+        self.manifest = {'settings': None, 'sources': {}, 'products': {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest.update(json.load(f))
+
+    def out_dir(self, digest):
+        return os.path.join(self.mirror_dir, DERIVATIVES_DIR, digest[:2], digest)
+
+    def public_url(self, digest, file_name):
+        return f"{self.url_prefix}/{DERIVATIVES_DIR}/{digest[:2]}/{digest}/{file_name}"
+
+    def is_current(self, digest, settings):
+        """
+        Source already rendered with these settings and every file still on disk
+        """
+        entry = self.manifest['sources'].get(digest)
+        if not entry or entry.get('settings') != settings:
+            return False
+        out_dir = self.out_dir(digest)
+        return all(os.path.exists(os.path.join(out_dir, output['file'])) for output in entry['outputs'])
+
+    def srcset_entry(self, digest, formats):
+        entry = self.manifest['sources'][digest]
+        sources = {}
+        for fmt in formats:
+            outputs = sorted((o for o in entry['outputs'] if o['format'] == fmt), key=lambda o: o['width'])
+            if outputs:
+                sources[FORMAT_OPTIONS[fmt]['mime']] = ', '.join(
+                    f"{self.public_url(digest, o['file'])} {o['width']}w" for o in outputs)
+        fallbacks = [o for o in entry['outputs'] if o['format'] == 'jpeg'] or entry['outputs']
+        fallback = min(fallbacks, key=lambda o: (abs(o['width'] - FALLBACK_WIDTH), o['width']))
+        return {
+            'width': entry['width'],
+            'height': entry['height'],
+            'src': self.public_url(digest, fallback['file']),
+            'srcset': sources,
+        }
+
+    def save(self):
+        write_atomic(self.manifest_path, json.dumps(self.manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+
+def build_derivatives(mirror_manifest, store, widths=DEFAULT_WIDTHS, formats=DEFAULT_FORMATS, workers=None,
+                      progress_interval=2.0):
+    """
+    Render every mirrored object whose derivatives are missing or stale,
+    then rebuild the product srcset entries. Returns (rendered, skipped, failed).
+    """
+    settings = settings_key(widths, formats)
+    objects = mirror_manifest.get('objects', {})
+    pending = {digest: obj for digest, obj in objects.items() if not store.is_current(digest, settings)}
+    skipped = len(objects) - len(pending)
+    print(f"🖼️  {len(objects)} source images: {len(pending)} to render, {skipped} already up to date")
+
+    rendered = failed = 0
+    if pending:
+        progress = metrics.ProgressReporter(len(pending), 'images', progress_interval)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(render_derivatives,
+                                image_mirror.object_path(store.mirror_dir, digest, obj['ext']),
+                                store.out_dir(digest), widths, formats): digest
+                for digest, obj in pending.items()
+            }
+            for future in as_completed(futures):
+                digest = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"   ❌ {digest[:12]}: {e}")
+                    store.manifest['sources'].pop(digest, None)
+                    failed += 1
+                    progress.update(failed=1)
+                    continue
+                result['settings'] = settings
+                store.manifest['sources'][digest] = result
+                rendered += 1
+                progress.update(rendered=1)
+        progress.finish()
+
+    store.manifest['settings'] = settings
+    products = {}
+    for product_id, entry in mirror_manifest.get('products', {}).items():
+        if entry['sha256'] in store.manifest['sources']:
+            products[product_id] = store.srcset_entry(entry['sha256'], formats)
+    store.manifest['products'] = products
+    return rendered, skipped, failed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render responsive WebP/AVIF derivatives of mirrored images")
+    parser.add_argument('--mirror-dir', default=image_mirror.DEFAULT_MIRROR_DIR)
+    parser.add_argument('--url-prefix', default=image_mirror.DEFAULT_URL_PREFIX)
+    parser.add_argument('--widths', type=lambda value: tuple(sorted(int(w) for w in value.split(','))),
+                        default=DEFAULT_WIDTHS, help="comma-separated target widths in pixels")
+    parser.add_argument('--formats', type=lambda value: tuple(value.split(',')), default=DEFAULT_FORMATS,
+                        help="comma-separated output formats (avif, webp, jpeg)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: one per CPU core)")
+    parser.add_argument('--progress-interval', type=float, default=2.0,
+                        help="seconds between progress lines")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    unknown = [fmt for fmt in args.formats if fmt not in FORMAT_OPTIONS]
+    if unknown:
+        raise SystemExit(f"Unknown format(s): {', '.join(unknown)}")
+
+    manifest_path = os.path.join(args.mirror_dir, image_mirror.MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        print(f"❌ No mirror manifest at {manifest_path}; run image_mirror.py first")
+        return
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        mirror_manifest = json.load(f)
+
+    store = DerivativeStore(args.mirror_dir, args.url_prefix)
+    rendered, skipped, failed = build_derivatives(mirror_manifest, store, args.widths,
+                                                  available_formats(args.formats), args.workers,
+                                                  args.progress_interval)
+    store.save()
+
+    print(f"\n🎉 {rendered} rendered, {skipped} skipped (unchanged), {failed} failed")
+    print(f"💾 srcset manifest for {len(store.manifest['products'])} products written to {store.manifest_path}")
+
+
+if __name__ == "__main__":
+    main()
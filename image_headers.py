@@ -0,0 +1,119 @@
+"""
+Identify an image from its first bytes.
+
+Reads just enough of a JPEG, PNG, GIF or WebP header to get the real
+format and pixel dimensions, so a probe can validate an image from a
+few KB instead of trusting the Content-Type header or downloading it.
+"""
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_IEND = b'IEND\xaeB`\x82'
+
+# Start-of-frame markers carry the dimensions; C4 (DHT), C8 (JPG) and
+# CC (DAC) share the range but are not frames
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+JPEG_SOS = 0xDA
+JPEG_EOI = b'\xff\xd9'
+
+TAIL_BYTES = 16
+
+
+def _jpeg_size(data):
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            raise ValueError("bad JPEG marker")
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # Fill byte
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Markers without a length
+            pos += 2
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            if pos + 9 > len(data):
+                return None
+            height = int.from_bytes(data[pos + 5:pos + 7], 'big')
+            width = int.from_bytes(data[pos + 7:pos + 9], 'big')
+            return width, height
+        if marker == JPEG_SOS:
+            raise ValueError("JPEG scan data before any frame header")
+        pos += 2 + int.from_bytes(data[pos + 2:pos + 4], 'big')
+    return None
+
+
+def _webp_size(data):
+    chunk = data[12:16]
+    if chunk == b'VP8 ':
+        if len(data) < 30:
+            return None
+        if data[23:26] != b'\x9d\x01\x2a':
+            raise ValueError("bad VP8 frame start code")
+        return (int.from_bytes(data[26:28], 'little') & 0x3FFF,
+                int.from_bytes(data[28:30], 'little') & 0x3FFF)
+    if chunk == b'VP8L':
+        if len(data) < 25:
+            return None
+        if data[20] != 0x2F:
+            raise ValueError("bad VP8L signature")
+        bits = int.from_bytes(data[21:25], 'little')
+        return 1 + (bits & 0x3FFF), 1 + ((bits >> 14) & 0x3FFF)
+    if chunk == b'VP8X':
+        if len(data) < 30:
+            return None
+        return 1 + int.from_bytes(data[24:27], 'little'), 1 + int.from_bytes(data[27:30], 'little')
+    if len(data) < 16:
+        return None
+    raise ValueError(f"unknown WebP chunk {chunk!r}")
+
+
+def sniff_image(data):
+    """
+    Returns (format, width, height). format is None when the bytes aren't a
+    recognised image; width/height are None when the header continues past
+    the end of `data`. Raises ValueError for a recognised but corrupt header.
+    """
+    data = bytes(data)
+    if data.startswith(b'\xff\xd8'):
+        fmt, size = 'jpeg', _jpeg_size(data)
+    elif data.startswith(PNG_SIGNATURE):
+        if len(data) < 24:
+            return 'png', None, None
+        if data[12:16] != b'IHDR':
+            raise ValueError("PNG without IHDR chunk")
+        fmt, size = 'png', (int.from_bytes(data[16:20], 'big'), int.from_bytes(data[20:24], 'big'))
+    elif data[:6] in (b'GIF87a', b'GIF89a'):
+        if len(data) < 10:
+            return 'gif', None, None
+        fmt, size = 'gif', (int.from_bytes(data[6:8], 'little'), int.from_bytes(data[8:10], 'little'))
+    elif data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        fmt, size = 'webp', _webp_size(data)
+    else:
+        return None, None, None
+    if size is None:
+        return fmt, None, None
+    return fmt, size[0], size[1]
+
+
+def is_complete(fmt, head, tail, total_size):
+    """
+    Whether a file of `total_size` bytes starting with `head` and ending
+    with `tail` looks whole: the format's end marker is present (JPEG EOI,
+    PNG IEND, GIF trailer) or the WebP RIFF size matches. None if unknown.
+    """
+    if fmt == 'webp':
+        if len(head) < 8 or total_size is None:
+            return None
+        return int.from_bytes(head[4:8], 'little') + 8 <= total_size
+    if not tail:
+        return None
+    if fmt == 'jpeg':
+        # Some encoders pad after EOI
+        return tail.rstrip(b'\x00\r\n ').endswith(JPEG_EOI)
+    if fmt == 'png':
+        return tail.endswith(PNG_IEND)
+    if fmt == 'gif':
+        return tail.rstrip(b'\x00').endswith(b';')
+    return None
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Local content-addressed mirror of every catalog image.
+
+Each image referenced by products.ts is downloaded once and stored under
+its sha256 (`public/mirror/sha256/ab/abcdef....jpg`), so products sharing
+the same bytes share one file and Vite serves the copies at `/mirror/...`
+for the 3D/CV front-end. Downloads stream to disk in chunks, run in
+parallel under the per-host rate limit, and pick up interrupted partial
+files with Range requests. A manifest maps product id -> local path.
+
+    python image_tools.py mirror --concurrency 8
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+import requests
+
+import http_client
+import image_status
+import image_tools
+import metrics
+import pipeline
+from catalog import write_atomic
+from rate_limit import CircuitOpenError, HostThrottle, parse_retry_after
+
+DEFAULT_MIRROR_DIR = 'public/mirror'
+# URL prefix the mirror directory is served under (Vite serves public/ at /)
+DEFAULT_URL_PREFIX = '/mirror'
+MANIFEST_NAME = 'manifest.json'
+PARTIAL_DIR = '.partial'
+CHUNK_SIZE = 64 * 1024
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RATE = 4.0
+DEFAULT_BURST = 4
+
+CONTENT_TYPE_EXTENSIONS = {
+    'image/jpeg': '.jpg',
+    'image/jpg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/avif': '.avif',
+    'image/gif': '.gif',
+    'image/svg+xml': '.svg',
+}
+
+
+class IncompleteDownload(requests.exceptions.RequestException):
+    """
+    The body ended before Content-Length/Content-Range said it would;
+    the partial file is kept so the next attempt resumes from it
+    """
+
+
+def extension_for(url, content_type):
+    ext = CONTENT_TYPE_EXTENSIONS.get((content_type or '').split(';')[0].strip().lower())
+    if ext:
+        return ext
+    ext = os.path.splitext(urlsplit(url).path)[1].lower()
+    return '.jpg' if ext == '.jpeg' else (ext or '.bin')
+
+
+def object_path(mirror_dir, digest, ext):
+    return os.path.join(mirror_dir, 'sha256', digest[:2], digest + ext)
+
+
+def partial_paths(mirror_dir, url):
+    """
+    Partial download file plus its sidecar holding the validator used for
+    If-Range, keyed by the URL (the content hash isn't known yet)
+    """
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    base = os.path.join(mirror_dir, PARTIAL_DIR, key)
+    return base + '.part', base + '.json'
+
+
+def hash_file(path, digest=None):
+    digest = digest or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest
+
+
+class ImageMirror:
+    def __init__(self, mirror_dir=DEFAULT_MIRROR_DIR, url_prefix=DEFAULT_URL_PREFIX, throttle=None,
+                 timeout=http_client.DEFAULT_TIMEOUT, refresh=False):
+        self.mirror_dir = mirror_dir
+        self.url_prefix = url_prefix.rstrip('/')
+        self.throttle = throttle
+        self.timeout = timeout
+        self.manifest_path = os.path.join(mirror_dir, MANIFEST_NAME)
+        self.manifest = {'products': {}, 'objects': {}, 'urls': {}}
+        self.downloaded = 0
+        self.resumed = 0
+        self.deduped = 0
+        self.reused = 0
+        self.bytes_downloaded = 0
+        self._lock = threading.Lock()
+        if os.path.exists(self.manifest_path) and not refresh:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                self.manifest.update(json.load(f))
+
+    def local_path(self, digest):
+        """
+        Path of a stored object relative to the mirror root
+        """
+        ext = self.manifest['objects'][digest]['ext']
+        return os.path.relpath(object_path(self.mirror_dir, digest, ext), self.mirror_dir).replace(os.sep, '/')
+
+    def public_url(self, digest):
+        return f"{self.url_prefix}/{self.local_path(digest)}"
+
+    def cached_digest(self, url):
+        """
+        Digest of an earlier download of this URL whose object is still on disk
+        """
+        digest = self.manifest['urls'].get(url)
+        obj = self.manifest['objects'].get(digest) if digest else None
+        if obj and os.path.exists(object_path(self.mirror_dir, digest, obj['ext'])):
+            return digest
+        return None
+
+    def _request(self, url, headers):
+        if self.throttle is not None:
+            self.throttle.acquire(url)
+        started = time.monotonic()
+        try:
+            response = http_client.get(url, timeout=self.timeout, stream=True, headers=headers)
+        except requests.exceptions.RequestException:
+            if self.throttle is not None:
+                self.throttle.release(url, error=True)
+            raise
+        if self.throttle is not None:
+            self.throttle.release(url, response.status_code, time.monotonic() - started,
+                                  parse_retry_after(response.headers.get('Retry-After')))
+        return response
+
+    def download(self, url):
+        """
+        Stream `url` into the store, resuming a partial file if one exists.
+        Returns the sha256 digest of the stored bytes.
+        """
+        part_path, meta_path = partial_paths(self.mirror_dir, url)
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        meta = {}
+        if offset and os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+
+        # Identity encoding so byte offsets refer to the stored file
+        headers = {'Accept-Encoding': 'identity'}
+        if offset:
+            headers['Range'] = f'bytes={offset}-'
+            validator = meta.get('etag') or meta.get('last_modified')
+            if validator:
+                headers['If-Range'] = validator
+
+        response = self._request(url, headers)
+        if response.status_code == 416 and offset:
+            # The partial is already the whole file (or the file shrank);
+            # start over rather than trust it
+            response.close()
+            offset = 0
+            os.remove(part_path)
+            response = self._request(url, {'Accept-Encoding': 'identity'})
+        with response:
+            response.raise_for_status()
+
+            if response.status_code == 206:
+                expected = image_status.total_from_content_range(response.headers.get('Content-Range'))
+                digest = hash_file(part_path)
+                mode = 'ab'
+                with self._lock:
+                    self.resumed += 1
+            else:
+                # Full body: the server ignored the Range or the file changed
+                length = response.headers.get('Content-Length')
+                expected = int(length) if length and length.isdigit() else None
+                digest = hashlib.sha256()
+                offset = 0
+                mode = 'wb'
+
+            content_type = response.headers.get('Content-Type', '')
+            with open(meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'url': url, 'etag': response.headers.get('ETag'),
+                           'last_modified': response.headers.get('Last-Modified')}, f)
+
+            size = offset
+            body = metrics.TimedIterator(response.iter_content(CHUNK_SIZE), 'body',
+                                         host=urlsplit(url).netloc, method='GET', status=response.status_code)
+            with open(part_path, mode) as f:
+                for chunk in body:
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            with self._lock:
+                self.bytes_downloaded += size - offset
+
+        if expected is not None and size != expected:
+            raise IncompleteDownload(f"got {size} of {expected} bytes for {url}")
+
+        digest = digest.hexdigest()
+        ext = extension_for(url, content_type)
+        final_path = object_path(self.mirror_dir, digest, ext)
+        with self._lock:
+            if os.path.exists(final_path):
+                # Same bytes already stored for another URL
+                os.remove(part_path)
+                self.deduped += 1
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(part_path, final_path)
+                self.downloaded += 1
+            os.remove(meta_path)
+            self.manifest['objects'][digest] = {'ext': ext, 'bytes': size, 'content_type': content_type}
+            self.manifest['urls'][url] = digest
+        return digest
+
+    def fetch(self, url, retries=3):
+        """
+        Digest for `url`, downloading it only if the mirror doesn't hold it yet
+        """
+        digest = self.cached_digest(url)
+        if digest is not None:
+            with self._lock:
+                self.reused += 1
+            return digest
+        for attempt in range(retries):
+            try:
+                return self.download(url)
+            except CircuitOpenError as e:
+                if attempt == retries - 1:
+                    raise
+                time.sleep(e.retry_in)
+            except requests.exceptions.RequestException:
+                if attempt == retries - 1:
+                    raise
+                # Partial bytes stay on disk; the next attempt sends a Range
+                time.sleep(2 ** attempt)
+
+    def save(self):
+        os.makedirs(self.mirror_dir, exist_ok=True)
+        write_atomic(self.manifest_path, json.dumps(self.manifest, indent=2, sort_keys=True).encode('utf-8'))
+
+    def report(self):
+        return (f"🪞 Mirror: {self.downloaded} downloaded ({self.resumed} resumed), {self.deduped} identical "
+                f"to a stored image, {self.reused} already mirrored, "
+                f"{self.bytes_downloaded / (1024 * 1024):.1f} MB transferred")
+
+
+def mirror_catalog(products, mirror, concurrency=DEFAULT_CONCURRENCY, progress_interval=2.0, total=None):
+    """
+    Download every distinct image URL used by `products` (records with id
+    and image) and record product id -> local path in the manifest.
+    `products` may be a generator: they go through a bounded window of
+    downloads, and products sharing a URL wait for the download already
+    in flight instead of starting another. Returns (mirrored, failed)
+    product counts.
+    """
+    # Keyed on the exact URL: width/height/crop params change the bytes
+    # served, so normalizing would mirror one rendition for all of them.
+    # Identical bytes still end up as one object, deduped by sha256.
+    in_flight = {}
+    # A URL that failed isn't tried again for the other products using it
+    failed_urls = {}
+    lock = threading.Lock()
+
+    def fetch_shared(product):
+        url = product['image']
+        with lock:
+            if url in failed_urls:
+                return None
+            future = in_flight.get(url)
+            owner = future is None
+            if owner:
+                future = in_flight[url] = Future()
+        if not owner:
+            return future.result()
+        digest = None
+        try:
+            digest = mirror.fetch(url)
+        except Exception as e:
+            print(f"   ❌ {url[:80]}: {e}")
+            with lock:
+                failed_urls[url] = str(e)
+        finally:
+            # Later products find a finished URL in the manifest
+            with lock:
+                in_flight.pop(url, None)
+            future.set_result(digest)
+        return digest
+
+    if total is None and hasattr(products, '__len__'):
+        total = len(products)
+    progress = metrics.ProgressReporter(total, 'products', progress_interval)
+    http_client.get_session(concurrency, throttled=mirror.throttle is not None)
+    mirrored = failed = 0
+    entries = mirror.manifest['products']
+    for product, digest in pipeline.ordered_map(fetch_shared, products, concurrency):
+        if digest is None:
+            failed += 1
+            progress.update(failed=1)
+            continue
+        entries[str(product['id'])] = {
+            'path': mirror.public_url(digest),
+            'sha256': digest,
+            'source': product['image'],
+        }
+        mirrored += 1
+        progress.update(mirrored=1)
+    progress.finish()
+    return mirrored, failed
+
+
+def add_arguments(parser):
+    parser.add_argument('--mirror-dir', default=DEFAULT_MIRROR_DIR)
+    parser.add_argument('--url-prefix', default=DEFAULT_URL_PREFIX,
+                        help="URL the mirror directory is served under, used for manifest paths")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help="max requests per second to any single host")
+    parser.add_argument('--burst', type=int, default=DEFAULT_BURST)
+    parser.add_argument('--refresh', action='store_true',
+                        help="ignore the existing manifest and download every image again")
+
+
+def run(session, args):
+    # Streamed from products.ts; only the count is taken up front
+    total = sum(1 for _ in session.products('id', 'image'))
+    print(f"📦 Mirroring images for {total} products into {args.mirror_dir}")
+
+    mirror = ImageMirror(args.mirror_dir, args.url_prefix, HostThrottle(args.rate, args.burst),
+                         refresh=args.refresh)
+    try:
+        mirrored, failed = mirror_catalog(session.products('id', 'image'), mirror, args.concurrency,
+                                          args.progress_interval, total)
+    except KeyboardInterrupt:
+        print("\n⏹️  Interrupted - partial downloads are kept and resume on the next run")
+        mirror.save()
+        raise
+    mirror.save()
+
+    print(f"\n🎉 {mirrored} products mirrored, {failed} without a local copy")
+    print(mirror.report())
+    print(f"💾 Manifest written to {mirror.manifest_path}")
+
+
+def main(argv=None):
+    image_tools.main(['mirror'] + (sys.argv[1:] if argv is None else list(argv)))
+
+
+if __name__ == "__main__":
+    main()
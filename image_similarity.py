@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Perceptual-hash index over the mirrored catalog images.
+
+The verifier only checks that an image URL answers 200; it can't tell that
+the fix-up scripts, which cycle through short lists of stock photos, gave
+a pendant light and a floor lamp the same picture. This computes a 64-bit
+dHash and pHash for every image in the local mirror (cached by content
+sha256) and runs an all-pairs Hamming-distance search with NumPy in
+blocks, then reports products sharing an image and near-duplicate groups
+that span more than one category.
+
+    python image_mirror.py && python image_similarity.py --threshold 8
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+import catalog
+import catalog_artifact
+import image_mirror
+from catalog import write_atomic
+
+DEFAULT_INDEX_PATH = '.cache/phash_index.json'
+DEFAULT_THRESHOLD = 8
+# Size of each uint64 XOR temporary in near_pairs; the block's other
+# temporaries (popcounts, masks) are smaller
+BLOCK_BYTES = 32 * 1024 * 1024
+HASH_SIZE = 8
+PHASH_SIZE = 32
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+_DCT = _dct_matrix(PHASH_SIZE)
+_BIT_WEIGHTS = (1 << np.arange(HASH_SIZE * HASH_SIZE - 1, -1, -1, dtype=np.uint64)).astype(np.uint64)
+
+
+def _pack(bits):
+    return int((bits.ravel().astype(np.uint64) * _BIT_WEIGHTS).sum(dtype=np.uint64))
+
+
+def grayscale(image, size):
+    image.draft('L', (size[0] * 4, size[1] * 4))
+    return np.asarray(image.convert('L').resize(size, Image.LANCZOS), dtype=np.float64)
+
+
+def dhash(image):
+    """
+    Horizontal gradient hash: is each pixel brighter than its right neighbour
+    """
+    pixels = grayscale(image, (HASH_SIZE + 1, HASH_SIZE))
+    return _pack(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash(image):
+    """
+    DCT hash: low-frequency coefficients above their median
+    """
+    pixels = grayscale(image, (PHASH_SIZE, PHASH_SIZE))
+    coefficients = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    return _pack(coefficients > np.median(coefficients.ravel()[1:]))
+
+
+def hash_image(path):
+    with Image.open(path) as image:
+        image.load()
+        return {'dhash': dhash(image), 'phash': phash(image)}
+
+
+def popcount(values):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    # NumPy < 2.0: count bits byte by byte
+    as_bytes = values.reshape(values.shape + (1,)).view(np.uint8)
+    return np.unpackbits(as_bytes, axis=-1).sum(axis=-1)
+
+
+def block_rows(count, budget=BLOCK_BYTES):
+    """
+    Rows per near_pairs block so one row-block x `count` uint64 array fits
+    in `budget` bytes
+    """
+    return max(1, budget // (max(count, 1) * 8))
+
+
+def near_pairs(dhashes, phashes, threshold, block_size=None):
+    """
+    All index pairs (i < j) whose dHash and pHash are both within
+    `threshold` bits. Distances are computed a block of rows at a time,
+    sized by block_rows() unless `block_size` is given, so memory stays
+    within a fixed budget instead of growing with n x n.
+    """
+    dhashes = np.asarray(dhashes, dtype=np.uint64)
+    phashes = np.asarray(phashes, dtype=np.uint64)
+    block_size = block_size or block_rows(len(dhashes))
+    pairs = []
+    for start in range(0, len(dhashes), block_size):
+        stop = min(start + block_size, len(dhashes))
+        d = popcount(dhashes[start:stop, None] ^ dhashes[None, :])
+        p = popcount(phashes[start:stop, None] ^ phashes[None, :])
+        rows, cols = np.nonzero((d <= threshold) & (p <= threshold))
+        rows += start
+        keep = rows < cols
+        pairs.extend(zip(rows[keep].tolist(), cols[keep].tolist()))
+    return pairs
+
+
+def group_pairs(count, pairs):
+    """
+    Union-find over the pairs; returns groups (lists of indices) of size > 1
+    """
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[root_j] = root_i
+    groups = {}
+    for i in range(count):
+        groups.setdefault(find(i), []).append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+class HashIndex:
+    """
+    dHash/pHash per content sha256, persisted so unchanged images aren't
+    decoded again
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self.hashes = {}
+        self.computed = 0
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.hashes = json.load(f)
+
+    def update(self, mirror_dir, objects):
+        for digest, obj in objects.items():
+            if digest in self.hashes:
+                continue
+            path = image_mirror.object_path(mirror_dir, digest, obj['ext'])
+            try:
+                self.hashes[digest] = hash_image(path)
+            except (OSError, ValueError) as e:
+                print(f"   ⚠️  Can't hash {digest[:12]}: {e}")
+                continue
+            self.computed += 1
+
+    def save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        write_atomic(self.path, json.dumps(self.hashes, indent=2, sort_keys=True).encode('utf-8'))
+
+
+def find_duplicates(products, product_digests, hashes, threshold=DEFAULT_THRESHOLD):
+    """
+    Group products whose images are identical (same sha256) or perceptually
+    near-identical. Returns a list of groups, each a dict with the
+    products, whether the bytes are identical and the categories involved.
+    """
+    digests = sorted({digest for digest in product_digests.values() if digest in hashes})
+    position = {digest: i for i, digest in enumerate(digests)}
+    pairs = near_pairs([hashes[d]['dhash'] for d in digests], [hashes[d]['phash'] for d in digests], threshold)
+
+    by_digest = {}
+    for product in products:
+        digest = product_digests.get(str(product['id']))
+        if digest in position:
+            by_digest.setdefault(digest, []).append(product)
+
+    # Images used by several products form a group even with no near neighbour
+    grouped = group_pairs(len(digests), pairs)
+    in_group = {i for members in grouped for i in members}
+    grouped.extend([position[d]] for d, users in by_digest.items() if len(users) > 1 and position[d] not in in_group)
+
+    groups = []
+    for members in grouped:
+        members_products = [p for i in members for p in by_digest.get(digests[i], [])]
+        if len(members_products) < 2:
+            continue
+        groups.append({
+            'identical': len(members) == 1,
+            'images': [digests[i] for i in members],
+            'categories': sorted({p.get('category') or '?' for p in members_products}),
+            'products': [{'id': p['id'], 'name': p.get('name'), 'category': p.get('category'),
+                          'sha256': product_digests[str(p['id'])]} for p in members_products],
+        })
+    groups.sort(key=lambda group: (-len(group['categories']), -len(group['products'])))
+    return groups
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Find catalog products sharing the same or near-identical images")
+    parser.add_argument('--products', default=catalog.PRODUCTS_FILE)
+    parser.add_argument('--mirror-dir', default=image_mirror.DEFAULT_MIRROR_DIR)
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH,
+                        help="JSON file caching perceptual hashes by image sha256")
+    parser.add_argument('--threshold', type=int, default=DEFAULT_THRESHOLD,
+                        help="max differing bits (of 64) for two images to count as near-duplicates")
+    parser.add_argument('--json', dest='json_path', default=None,
+                        help="also write the duplicate groups to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    manifest_path = os.path.join(args.mirror_dir, image_mirror.MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        print(f"❌ No mirror manifest at {manifest_path}; run image_mirror.py first")
+        return
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    products = [record.to_dict() for record in catalog_artifact.load_products(args.products).with_fields('id', 'image')]
+    product_digests = {product_id: entry['sha256'] for product_id, entry in manifest.get('products', {}).items()}
+    print(f"📦 {len(products)} products, {len(product_digests)} with a mirrored image")
+
+    index = HashIndex(args.index)
+    index.update(args.mirror_dir, manifest.get('objects', {}))
+    if index.computed:
+        index.save()
+    print(f"🔢 {len(index.hashes)} images hashed ({index.computed} new)")
+
+    started = time.perf_counter()
+    groups = find_duplicates(products, product_digests, index.hashes, args.threshold)
+    elapsed = time.perf_counter() - started
+
+    mismatched = [group for group in groups if len(group['categories']) > 1]
+    print(f"⏱️  Duplicate scan took {elapsed * 1000:.1f}ms")
+    print(f"\n🧩 {len(groups)} groups of products showing the same or near-identical image, "
+          f"{len(mismatched)} spanning more than one category")
+    for group in groups:
+        kind = 'identical file' if group['identical'] else f"{len(group['images'])} near-identical files"
+        flag = '❌ cross-category' if len(group['categories']) > 1 else '⚠️  shared'
+        print(f"\n{flag}: {len(group['products'])} products, {kind} ({', '.join(group['categories'])})")
+        for product in group['products']:
+            print(f"   - [{product['id']}] {str(product['name'])[:60]} ({product['category']})")
+
+    if args.json_path:
+        write_atomic(args.json_path, json.dumps(groups, indent=2).encode('utf-8'))
+        print(f"\n💾 Groups written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+"""
+Shared image URL status store for verify_and_fix_images and test_images.
+
+Many products point at the same CDN file, often with different
+cache-busting params (`&width=800` vs `&width=1500`). URLs are
+normalized so each underlying image is probed once, and the raw probe
+results (status code, content type, error) are kept in a small SQLite
+file with a TTL so both scripts - and repeated runs - reuse them. Records
+are looked up on demand and written in small batches, so memory doesn't
+grow with the number of URLs. Each script then interprets the stored
+record with its own rules.
+
+With `--probe range` the probe is a Range GET for the first few KB
+instead of a HEAD: the header bytes give the real format and dimensions,
+and a tail read checks the file isn't truncated, so an error page served
+as image/jpeg no longer passes. Those records describe the bytes of one
+rendition, so they are keyed on the URL with its rendering params kept;
+only the reachability part is shared under the normalized URL.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+
+import http_client
+import image_headers
+import metrics
+
+DEFAULT_STORE_PATH = '.cache/image_status.sqlite3'
+DEFAULT_TTL = 6 * 60 * 60
+# Probe results buffered before they are written out in one transaction
+FLUSH_EVERY = 200
+PROBE_METHODS = ('head', 'range')
+# First Range request; most headers fit, JPEGs with a big EXIF block
+# take another read or two
+PROBE_BYTES = 4096
+MAX_PROBE_BYTES = 64 * 1024
+
+# Query params that only change how the CDN renders the same file
+CACHE_BUSTING_PARAMS = {'width', 'height', 'crop', 'pad_color', 'format', 'quality'}
+# Fields of a probe record that hold for every rendition of a file
+REACHABILITY_FIELDS = ('url', 'status_code', 'content_type', 'error', 'checked_at')
+# Prefix keeping per-rendition keys apart from normalized ones
+RENDITION_KEY_PREFIX = 'rendition:'
+
+
+def normalize_url(url, keep_rendering=False):
+    """
+    Canonical form used as the store key: lower-case scheme/host, no
+    fragment, rendering params dropped (unless `keep_rendering`) and the
+    rest sorted
+    """
+    parts = urlsplit(url.strip())
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if keep_rendering or key.lower() not in CACHE_BUSTING_PARAMS
+    )
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(query), ''))
+
+
+def rendition_key(url):
+    """
+    Store key for records describing the bytes of one rendition (range
+    probes): width, format, crop etc. change those bytes, so they stay
+    """
+    return RENDITION_KEY_PREFIX + normalize_url(url, keep_rendering=True)
+
+
+def probe_image(url, timeout=10):
+    """
+    HEAD the URL once and record what came back
+    """
+    record = {'url': url, 'status_code': None, 'content_type': '', 'error': None, 'checked_at': time.time()}
+    try:
+        response = http_client.head(url, timeout=timeout)
+        record['status_code'] = response.status_code
+        record['content_type'] = response.headers.get('content-type', '').lower()
+    except requests.exceptions.RequestException as e:
+        record['error'] = f"Request failed: {str(e)}"
+    except Exception as e:
+        record['error'] = f"Error: {str(e)}"
+    return record
+
+
+def total_from_content_range(value):
+    # "bytes 1000-4999/5000" -> 5000
+    if not value or '/' not in value:
+        return None
+    total = value.rsplit('/', 1)[1].strip()
+    return int(total) if total.isdigit() else None
+
+
+def read_range(url, start, end, timeout=10, enough=None, limit=None):
+    """
+    GET bytes start..end (inclusive). Returns (response, data); if the
+    server ignores the Range only the requested amount is read, or with
+    `enough`, the body is read on until enough(data) or `limit` bytes.
+    """
+    response = http_client.get(url, timeout=timeout, stream=True,
+                               headers={'Range': f'bytes={start}-{end}', 'Accept-Encoding': 'identity'})
+    data = bytearray()
+    with response:
+        if response.status_code in (200, 206):
+            wanted = end - start + 1
+            # A 200 can't be resumed with another Range, so keep reading it
+            if response.status_code == 200 and enough is not None:
+                limit = max(wanted, limit or wanted)
+            else:
+                enough, limit = None, wanted
+            for chunk in response.iter_content(PROBE_BYTES):
+                data += chunk
+                if len(data) >= limit or (len(data) >= wanted and (enough is None or enough(data))):
+                    break
+            del data[limit:]
+    return response, bytes(data)
+
+
+def header_read(data):
+    """
+    True once `data` holds the image header's dimensions, or isn't an image
+    """
+    fmt, width, _ = image_headers.sniff_image(data)
+    return fmt is None or width is not None
+
+
+def probe_image_range(url, timeout=10, probe_bytes=PROBE_BYTES, max_bytes=MAX_PROBE_BYTES):
+    """
+    Range GET the start of the file, parse the image header for format and
+    dimensions, and read the last few bytes to check the file is whole
+    """
+    record = {'url': url, 'status_code': None, 'content_type': '', 'error': None, 'checked_at': time.time(),
+              'method': 'range', 'format': None, 'width': None, 'height': None,
+              'size': None, 'complete': None, 'bytes_read': 0}
+    try:
+        response, head = read_range(url, 0, probe_bytes - 1, timeout, enough=header_read, limit=max_bytes)
+        record['status_code'] = response.status_code
+        record['content_type'] = response.headers.get('content-type', '').lower()
+        if response.status_code not in (200, 206):
+            return record
+        partial = response.status_code == 206
+        if partial:
+            size = total_from_content_range(response.headers.get('Content-Range'))
+        else:
+            length = response.headers.get('Content-Length')
+            size = int(length) if length and length.isdigit() else None
+        record['size'] = size
+        bytes_read = len(head)
+
+        fmt, width, height = image_headers.sniff_image(head)
+        # Header runs past what we have: fetch the next stretch, doubling
+        while (partial and fmt and width is None and len(head) < max_bytes
+               and (size is None or len(head) < size)):
+            _, more = read_range(url, len(head), min(len(head) * 2, max_bytes) - 1, timeout)
+            if not more:
+                break
+            head += more
+            bytes_read += len(more)
+            fmt, width, height = image_headers.sniff_image(head)
+        record.update(format=fmt, width=width, height=height)
+
+        if fmt is not None:
+            tail = b''
+            if size is not None and len(head) >= size:
+                tail = head[-image_headers.TAIL_BYTES:]
+            elif partial and size is not None:
+                _, tail = read_range(url, max(0, size - image_headers.TAIL_BYTES), size - 1, timeout)
+                bytes_read += len(tail)
+            elif not partial and size is not None and len(head) < probe_bytes:
+                # Server ignored the Range and the body ended early
+                tail = head[-image_headers.TAIL_BYTES:]
+            record['complete'] = image_headers.is_complete(fmt, head, tail, size)
+        record['bytes_read'] = bytes_read
+    except requests.exceptions.RequestException as e:
+        record['error'] = f"Request failed: {str(e)}"
+    except ValueError as e:
+        record['error'] = f"Corrupt image header: {str(e)}"
+    except Exception as e:
+        record['error'] = f"Error: {str(e)}"
+    return record
+
+
+def range_problem(record):
+    """
+    Why a range-probed record is not a usable image, or None if it is
+    """
+    if record['error']:
+        return record['error']
+    if record['status_code'] not in (200, 206):
+        return f"HTTP {record['status_code']}"
+    if record['format'] is None:
+        return f"Not an image (served as {record['content_type'] or 'unknown type'})"
+    if record['width'] is None:
+        return f"Unreadable {record['format'].upper()} header"
+    if record['complete'] is False:
+        return f"Truncated {record['format'].upper()}"
+    return None
+
+
+def describe_range_record(record):
+    return f"{record['format'].upper()} {record['width']}x{record['height']}"
+
+
+PROBES = {'head': probe_image, 'range': probe_image_range}
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    key TEXT PRIMARY KEY,
+    method TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS probes_checked_at ON probes (checked_at);
+"""
+
+
+class ImageStatusStore:
+    def __init__(self, path=DEFAULT_STORE_PATH, ttl=DEFAULT_TTL, refresh=False, method='head'):
+        self.path = path
+        self.ttl = ttl
+        self.method = method
+        self.probes = 0
+        self.reused = 0
+        # With refresh, only records probed during this run count
+        self.not_before = time.time() if refresh else 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._inflight = {}
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path or ':memory:', check_same_thread=False, timeout=30)
+        self._db.executescript(SCHEMA)
+
+    def _usable(self, record):
+        checked_at = record.get('checked_at', 0)
+        if checked_at < self.not_before or time.time() - checked_at >= self.ttl:
+            return False
+        # A range probe's reachability answers HEAD questions too (put()
+        # stores it under the normalized URL), not the other way round
+        return self.method != 'range' or record.get('method', 'head') == 'range'
+
+    def _lookup(self, key):
+        record = self._pending.get(key)
+        if record is None:
+            row = self._db.execute("SELECT record FROM probes WHERE key = ?", (key,)).fetchone()
+            record = json.loads(row[0]) if row is not None else None
+        return record if record is not None and self._usable(record) else None
+
+    def _key(self, url):
+        return rendition_key(url) if self.method == 'range' else normalize_url(url)
+
+    def get(self, url):
+        """
+        Stored record for the URL (its rendition with range probes, else
+        its normalized form), or None if missing/expired
+        """
+        with self._lock:
+            return self._lookup(self._key(url))
+
+    def put(self, url, record):
+        """
+        Store a probe result. A range record is kept for its own rendition;
+        the normalized URL gets just its reachability, which HEAD checks of
+        any rendition can reuse.
+        """
+        with self._lock:
+            if record.get('method', 'head') == 'range':
+                self._pending[rendition_key(url)] = record
+                record = {field: record[field] for field in REACHABILITY_FIELDS if field in record}
+            self._pending[normalize_url(url)] = record
+            if len(self._pending) >= FLUSH_EVERY:
+                self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        with self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO probes (key, method, checked_at, record) VALUES (?, ?, ?, ?)",
+                ((key, record.get('method', 'head'), record.get('checked_at', 0), json.dumps(record))
+                 for key, record in self._pending.items()),
+            )
+        self._pending = {}
+
+    def check(self, url, timeout=10):
+        """
+        Return the record for `url`, probing the network only if no fresh
+        record exists. Concurrent callers asking for the same image share
+        one probe. Returns (record, probed).
+        """
+        key = self._key(url)
+        with self._lock:
+            record = self._lookup(key)
+            if record is not None:
+                self.reused += 1
+                return record, False
+            event = self._inflight.get(key)
+            owner = event is None
+            if owner:
+                event = self._inflight[key] = threading.Event()
+        if not owner:
+            event.wait()
+            with self._lock:
+                record = self._lookup(key)
+                if record is not None:
+                    self.reused += 1
+            if record is not None:
+                return record, False
+            # The owner's probe failed outright; probe it ourselves
+            return self.check(url, timeout)
+
+        try:
+            with metrics.timer('probe', method=self.method) as labels:
+                record = PROBES[self.method](url, timeout)
+                labels['status'] = record['status_code'] if record['error'] is None else 'error'
+            self.put(url, record)
+            with self._lock:
+                self.probes += 1
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+        return record, True
+
+    def save(self):
+        """
+        Write out buffered results and drop expired ones
+        """
+        with self._lock:
+            self._flush()
+            with self._db:
+                self._db.execute("DELETE FROM probes WHERE checked_at < ?", (time.time() - self.ttl,))
+
+    def close(self):
+        self.save()
+        with self._lock:
+            self._db.close()
+
+    def report(self):
+        return f"🗂️  Image status store: {self.probes} probed, {self.reused} reused from {self.path}"
+
+
+def add_status_arguments(parser):
+    parser.add_argument('--status-store', default=DEFAULT_STORE_PATH,
+                        help="SQLite file holding per-URL probe results shared between scripts")
+    parser.add_argument('--status-ttl', type=float, default=DEFAULT_TTL,
+                        help="seconds a stored probe result is trusted")
+    parser.add_argument('--refresh', action='store_true',
+                        help="ignore stored probe results and check every URL again")
+    parser.add_argument('--probe', choices=PROBE_METHODS, default='head',
+                        help="HEAD request, or Range GET of the first few KB to check the real "
+                             "format, dimensions and completeness")
+
+
+def store_from_args(args):
+    return ImageStatusStore(args.status_store, args.status_ttl, refresh=args.refresh, method=args.probe)
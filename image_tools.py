@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the product image tools.
+
+    python image_tools.py scrape --bulk --then verify --workers 8
+    python image_tools.py probe --probe range
+    python image_tools.py --products other/products.ts fix
+
+Commands:
+
+    scrape   find each product's real image on its brightet.com page
+    verify   probe every product image and replace broken placeholders
+    probe    check that every store image URL responds
+    fix      swap remaining Unsplash placeholders for store images
+    mirror   download every image into the local content-addressed mirror
+
+Stages chained with --then run in one process against a single read of
+products.ts: each sees the images the stages before it chose, and the
+file is written once, after the last one. --products and the metrics
+options apply to the whole run and may appear anywhere; every other
+option belongs to the stage it follows. A stage's module (and requests
+or bs4 with it) is only imported when that stage runs, so `fix` and
+`--help` start quickly.
+
+The old per-tool scripts (scrape_real_images.py, ...) still work and
+run the matching command.
+"""
+
+import argparse
+import dataclasses
+import importlib
+import sys
+from contextlib import ExitStack
+
+import catalog
+import metrics
+
+THEN = '--then'
+# command -> (module, help); each module provides add_arguments(parser)
+# and run(session, args)
+COMMANDS = {
+    'scrape': ('scrape_real_images', "find each product's real image on its brightet.com page"),
+    'verify': ('verify_and_fix_images', "probe every product image and replace broken placeholders"),
+    'probe': ('test_images', "check that every store image URL responds"),
+    'fix': ('fix_remaining_images', "swap remaining Unsplash placeholders for store images"),
+    'mirror': ('image_mirror', "download every image into the local content-addressed mirror"),
+}
+USAGE = "image_tools.py [--products PATH] COMMAND [options] [--then COMMAND [options] ...]"
+EPILOG = ("commands:\n" + "".join(f"  {name:<8} {help_text}\n" for name, (_, help_text) in COMMANDS.items())
+          + "\nRun `image_tools.py COMMAND --help` for a command's options.")
+
+
+class Session:
+    """
+    State shared by the stages of one run: products.ts read once, the
+    image changes stages have made so far, and the image status stores
+    they opened. Nothing is written until commit(), except by a lone
+    stage using patch_images().
+    """
+
+    def __init__(self, path=catalog.PRODUCTS_FILE, keep=False):
+        self.path = path
+        # Keep parsed records for later stages instead of streaming
+        self.keep = keep
+        self.updates = {}
+        self._records = None
+        self._data = None
+        self._stack = ExitStack()
+        self._stores = {}
+
+    def _mapped(self):
+        if self._data is None:
+            self._data = self._stack.enter_context(catalog.mapped(self.path))
+        return self._data
+
+    def _iter_records(self):
+        if self._records is not None:
+            return iter(self._records)
+        records = catalog.iter_products(self._mapped())
+        if not self.keep:
+            return records
+        with metrics.timer('catalog_load', source='products.ts'):
+            self._records = list(records)
+        return iter(self._records)
+
+    def products(self, *fields):
+        """
+        Products defining every one of `fields`, in file order, with the
+        images earlier stages chose. Streamed from the mapped file for a
+        single stage; parsed once and kept when more stages follow.
+        """
+        for record in self._iter_records():
+            image = self.updates.get(record.get('id'))
+            if image is not None:
+                record = dataclasses.replace(record, fields={**record.fields, 'image': image})
+            if all(record.get(name) is not None for name in fields):
+                yield record
+
+    def update_images(self, image_mapping):
+        """
+        Queue new images (id -> URL) for every product with that id
+        """
+        self.updates.update((product_id, url) for product_id, url in image_mapping.items() if url)
+
+    def patch_images(self, fixes):
+        """
+        Apply (record, new image) pairs, in file order, as they arrive. A
+        lone stage splices them straight into products.ts while it streams
+        the file, so no fix is held in memory; when more stages follow they
+        are queued like update_images(). Returns the number of entries
+        written (0 when queued).
+        """
+        if self.keep:
+            for record, image in fixes:
+                self.update_images({record.get('id'): image})
+            return 0
+        data = self._mapped()
+        edits = (catalog.field_edit(data, record, 'image', image) for record, image in fixes)
+        changed = catalog.write_patched(self.path, data, (edit for edit in edits if edit is not None))
+        self._data = None
+        self._stack.close()
+        if changed:
+            from catalog_artifact import refresh_artifact
+            refresh_artifact(self.path)
+        return changed
+
+    def status_store(self, args):
+        """
+        The image status store for a stage's --status-* options. Stages
+        with the same options share one, so later stages reuse results.
+        """
+        import image_status
+        key = (args.status_store, args.status_ttl, args.refresh, args.probe)
+        store = self._stores.get(key)
+        if store is None:
+            store = self._stores[key] = image_status.store_from_args(args)
+        return store
+
+    def commit(self):
+        """
+        Write every queued image to products.ts in one pass. Returns the
+        number of entries changed; nothing is written if none did.
+        """
+        if not self.updates:
+            return 0
+        data = self._mapped()
+        records = self._records if self._records is not None else catalog.iter_products(data)
+        edits = (catalog.field_edit(data, record, 'image', self.updates.get(record.get('id')))
+                 for record in records)
+        changed = catalog.write_patched(self.path, data, (edit for edit in edits if edit is not None))
+        # The mapping and spans describe the file as it was before
+        self.updates = {}
+        self._records = None
+        self._data = None
+        self._stack.close()
+        if changed:
+            from catalog_artifact import refresh_artifact
+            refresh_artifact(self.path)
+        return changed
+
+    def close(self):
+        for store in self._stores.values():
+            store.close()
+        self._stores = {}
+        self._stack.close()
+
+
+def common_parser():
+    # No -h here: it belongs to the command when one is given
+    parser = argparse.ArgumentParser(prog='image_tools.py', usage=USAGE, epilog=EPILOG, add_help=False,
+                                     allow_abbrev=False, formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     description="Scrape, verify, probe, fix and mirror product images.")
+    parser.add_argument('--products', default=catalog.PRODUCTS_FILE, metavar='PATH',
+                        help="products.ts to read and update")
+    metrics.add_metrics_arguments(parser)
+    return parser
+
+
+def split_stages(argv):
+    """
+    ['scrape', '--bulk', '--then', 'verify'] -> [['scrape', '--bulk'], ['verify']]
+    """
+    stages = [[]]
+    for arg in argv:
+        if arg == THEN:
+            stages.append([])
+        else:
+            stages[-1].append(arg)
+    return stages
+
+
+def parse_command_line(argv):
+    """
+    (run-wide options, [(command, module, stage options)]); a stage's
+    options also carry the run-wide ones
+    """
+    parser = common_parser()
+    common, rest = parser.parse_known_args(argv)
+    if not rest or rest[0] in ('-h', '--help'):
+        parser.print_help()
+        sys.exit(0 if rest else 2)
+
+    stages = []
+    for segment in split_stages(rest):
+        if not segment or segment[0] not in COMMANDS:
+            got = repr(segment[0]) if segment else 'nothing'
+            parser.error(f"expected a command ({', '.join(COMMANDS)}), got {got}")
+        name = segment[0]
+        module = importlib.import_module(COMMANDS[name][0])
+        stage_parser = argparse.ArgumentParser(prog=f"image_tools.py {name}", description=COMMANDS[name][1],
+                                               epilog="--products and the metrics options can be given too; "
+                                                      "see image_tools.py --help")
+        module.add_arguments(stage_parser)
+        args = stage_parser.parse_args(segment[1:], namespace=argparse.Namespace(**vars(common)))
+        stages.append((name, module, args))
+    return common, stages
+
+
+def main(argv=None):
+    common, stages = parse_command_line(sys.argv[1:] if argv is None else list(argv))
+    metrics.configure_metrics(common)
+    session = Session(common.products, keep=len(stages) > 1)
+    try:
+        for n, (name, module, args) in enumerate(stages, 1):
+            if len(stages) > 1:
+                print(f"\n▶️  Stage {n}/{len(stages)}: {name}")
+            module.run(session, args)
+        if session.updates:
+            print(f"\n🔄 Updating {common.products} with {len(session.updates)} new images...")
+            changed = session.commit()
+            if changed:
+                print(f"✅ Products file updated: {changed} images changed")
+            else:
+                print("✅ Products file already up to date, nothing written")
+    except KeyboardInterrupt:
+        print(f"\n⏸️  Interrupted - {common.products} was not written")
+        metrics.export(common)
+        sys.exit(130)
+    finally:
+        session.close()
+    metrics.report(common)
+
+
+if __name__ == "__main__":
+    main()
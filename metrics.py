@@ -0,0 +1,319 @@
+"""
+Lightweight run metrics for the image scripts.
+
+Per-phase timers (connect, ttfb, body, html_parse, write, probe, ...)
+are recorded into fixed-bucket latency histograms labelled by host
+and status code, alongside plain counters. Everything is kept in memory
+with one lock acquisition per observation, and can be exported as JSON
+or Prometheus text format at the end of a run - or mid-run by sending the
+process SIGUSR1 when `--metrics-json` / `--metrics-prom` are given.
+
+ProgressReporter replaces per-N-items progress prints with output
+throttled by wall-clock time, so a fast loop doesn't spend its time
+writing to the terminal.
+"""
+
+import json
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, Prometheus style; +Inf is implicit
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRIC_PREFIX = 'brightet'
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        index = 0
+        while index < len(BUCKETS) and value > BUCKETS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Estimate from the buckets, interpolating inside the one holding q
+        """
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= target:
+                lower = BUCKETS[index - 1] if index > 0 else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else self.max
+                estimate = lower + (upper - lower) * (target - seen) / bucket_count
+                return min(max(estimate, self.min), self.max)
+            seen += bucket_count
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': {str(bound): n for bound, n in zip(BUCKETS + ('+Inf',), self.counts)},
+        }
+
+
+def _label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self._histograms = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, phase, seconds, **labels):
+        key = (phase, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    @contextmanager
+    def timer(self, phase, **labels):
+        """
+        Time the block as one observation of `phase`. Labels can be filled
+        in from inside the block (e.g. the status code once it's known).
+        """
+        started = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(phase, time.perf_counter() - started, **labels)
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._counters = {}
+            self.started = time.time()
+
+    def to_json(self):
+        with self._lock:
+            histograms = [dict(phase=phase, labels=dict(labels), **histogram.to_dict())
+                          for (phase, labels), histogram in sorted(self._histograms.items())]
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self._counters.items())]
+        return {'started': self.started, 'exported': time.time(), 'phases': histograms, 'counters': counters}
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+        name = f"{METRIC_PREFIX}_phase_seconds"
+        if histograms:
+            lines.append(f"# HELP {name} Time spent per phase of the image scripts")
+            lines.append(f"# TYPE {name} histogram")
+        for (phase, labels), histogram in histograms:
+            base = (('phase', phase),) + labels
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ('+Inf',), histogram.counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_prom_labels(base + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_prom_labels(base)} {histogram.sum:.6f}")
+            lines.append(f"{name}_count{_prom_labels(base)} {histogram.count}")
+        seen = set()
+        for (counter, labels), value in counters:
+            metric = f"{METRIC_PREFIX}_{counter}_total"
+            if metric not in seen:
+                lines.append(f"# TYPE {metric} counter")
+                seen.add(metric)
+            lines.append(f"{metric}{_prom_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, top=8):
+        """
+        Phases with the most total time, one line each
+        """
+        with self._lock:
+            totals = {}
+            for (phase, _), histogram in self._histograms.items():
+                count, total = totals.get(phase, (0, 0.0))
+                totals[phase] = (count + histogram.count, total + histogram.sum)
+        rows = sorted(totals.items(), key=lambda item: -item[1][1])[:top]
+        return '\n'.join(f"   {phase:<14} {count:>6} x  {total:8.2f}s total  {total / count * 1000:8.1f}ms avg"
+                         for phase, (count, total) in rows if count)
+
+
+def _prom_labels(labels):
+    if not labels:
+        return ''
+    escaped = (f'{key}="{_prom_escape(value)}"' for key, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _prom_escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REGISTRY = Metrics()
+observe = REGISTRY.observe
+count = REGISTRY.count
+timer = REGISTRY.timer
+
+
+class TimedIterator:
+    """
+    Wraps an iterable (e.g. a streamed response body) and adds up the time
+    spent waiting on it; recorded as one `phase` observation on close() or
+    exhaustion. `waited` lets callers subtract it from a larger timing.
+    """
+
+    def __init__(self, iterable, phase, registry=REGISTRY, **labels):
+        self._iterator = iter(iterable)
+        self.phase = phase
+        self.labels = labels
+        self.registry = registry
+        self.waited = 0.0
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self.close()
+            raise
+        finally:
+            self.waited += time.perf_counter() - started
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self.registry.observe(self.phase, self.waited, **self.labels)
+
+
+class ProgressReporter:
+    """
+    Counts completed items from any thread and prints at most one progress
+    line per `interval` seconds, plus a final one from finish()
+    """
+
+    def __init__(self, total, label='items', interval=2.0, details=None, stream=None):
+        self.total = total
+        self.label = label
+        self.interval = interval
+        # Optional callable returning extra text for each line
+        self.details = details
+        self.stream = stream or sys.stdout
+        self.done = 0
+        self.counts = {}
+        self.started = time.monotonic()
+        self._next_report = self.started + interval
+        self._lock = threading.Lock()
+
+    def update(self, n=1, **counts):
+        with self._lock:
+            self.done += n
+            for key, value in counts.items():
+                self.counts[key] = self.counts.get(key, 0) + value
+            now = time.monotonic()
+            if now < self._next_report:
+                return
+            self._next_report = now + self.interval
+            line = self._line(now)
+        print(line, file=self.stream, flush=True)
+
+    def _line(self, now):
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        # total is None when items are streamed and the count isn't known up front
+        done = f"{self.done}/{self.total}" if self.total is not None else f"{self.done}"
+        parts = [f"📊 Progress: {done} {self.label}", f"{rate:.1f}/s"]
+        if rate and self.total is not None and self.total > self.done:
+            parts.append(f"ETA {(self.total - self.done) / rate:.0f}s")
+        parts.extend(f"{key} {value}" for key, value in self.counts.items())
+        if self.details is not None:
+            parts.append(self.details())
+        return ' | '.join(parts)
+
+    def finish(self):
+        with self._lock:
+            line = self._line(time.monotonic())
+        print(line, file=self.stream, flush=True)
+
+
+def add_metrics_arguments(parser):
+    parser.add_argument('--metrics-json', default=None,
+                        help="write per-phase timings and counters as JSON here at the end of the run")
+    parser.add_argument('--metrics-prom', default=None,
+                        help="write the same metrics in Prometheus text format here")
+    parser.add_argument('--progress-interval', type=float, default=2.0,
+                        help="seconds between progress lines")
+
+
+def export(args, registry=REGISTRY):
+    """
+    Write the files requested with --metrics-json / --metrics-prom
+    """
+    from catalog import write_atomic
+    if getattr(args, 'metrics_json', None):
+        write_atomic(args.metrics_json, json.dumps(registry.to_json(), indent=2).encode('utf-8'))
+    if getattr(args, 'metrics_prom', None):
+        write_atomic(args.metrics_prom, registry.to_prometheus().encode('utf-8'))
+
+
+def configure_metrics(args, registry=REGISTRY):
+    """
+    Start a fresh registry for this run and let SIGUSR1 dump it mid-run
+    """
+    registry.reset()
+    if (args.metrics_json or args.metrics_prom) and hasattr(signal, 'SIGUSR1') \
+            and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, lambda signum, frame: export_in_background(args, registry))
+
+
+def export_in_background(args, registry=REGISTRY):
+    """
+    export() on a daemon thread. The SIGUSR1 handler runs on the main
+    thread, possibly while it holds the registry's lock in observe() or
+    count(), so it must not take that lock itself.
+    """
+    threading.Thread(target=export, args=(args, registry), name='metrics-export', daemon=True).start()
+
+
+def report(args, registry=REGISTRY):
+    """
+    Print the busiest phases and write any requested export files
+    """
+    summary = registry.summary()
+    if summary:
+        print("\n⏱️  Time by phase:")
+        print(summary)
+    export(args, registry)
+    for path in (args.metrics_json, args.metrics_prom):
+        if path:
+            print(f"📈 Metrics written to {path}")
@@ -0,0 +1,115 @@
+"""
+Building blocks for running the image tools as streaming pipelines.
+
+Each tool is a chain of generators - products read one at a time from a
+memory-mapped products.ts (catalog.iter_products), checked by a bounded
+pool of workers (ordered_map), results written out as they arrive
+(JSONObjectWriter) and edits spliced into a new products.ts in the same
+pass (catalog.write_patched) - so peak memory depends on the window
+sizes, not on how many products the catalog holds.
+"""
+
+import itertools
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from catalog import atomic_file
+
+DEFAULT_WINDOW_PER_WORKER = 4
+
+
+def ordered_map(func, items, workers=1, window=None):
+    """
+    Yield (item, func(item)) for every item, in input order. Up to
+    `workers` calls run at once and at most `window` items are read ahead
+    of the consumer, so a slow consumer holds back the input instead of
+    results piling up.
+    """
+    if workers <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    window = max(window or workers * DEFAULT_WINDOW_PER_WORKER, workers)
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for item in items:
+            pending.append((item, executor.submit(func, item)))
+            if len(pending) >= window:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+    finally:
+        # Reached early on an error, Ctrl-C or when the consumer stops
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def iter_json_object(path):
+    """
+    Yield (key, value) for each entry of the JSON object in `path`. Files in
+    JSONObjectWriter's layout (one entry per line) are read a line at a
+    time; any other layout falls back to json.load.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        read = 0
+        if f.readline().strip() == '{':
+            for line in f:
+                line = line.strip()
+                if line == '}':
+                    return
+                try:
+                    ((key, value),) = json.loads('{' + line.removesuffix(',') + '}').items()
+                except ValueError:
+                    break
+                yield key, value
+                read += 1
+        # Not one entry per line (nested values, compact JSON): parse it
+        # whole and carry on after the entries already yielded
+        f.seek(0)
+        yield from itertools.islice(json.load(f).items(), read, None)
+
+
+class JSONObjectWriter:
+    """
+    Writes a JSON object to `path` one key at a time, in the same layout
+    as json.dump(..., indent=2). The file is created on the first add()
+    and replaces `path` atomically on close(); with nothing added, `path`
+    isn't touched. Use as a context manager: an exception discards it.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._stack = None
+        self._file = None
+
+    def add(self, key, value):
+        if self._file is None:
+            self._stack = ExitStack()
+            self._file = self._stack.enter_context(atomic_file(self.path))
+            self._file.write(b'{')
+        separator = b',\n  ' if self.count else b'\n  '
+        self._file.write(separator + json.dumps(str(key)).encode('utf-8') + b': '
+                         + json.dumps(value).encode('utf-8'))
+        self.count += 1
+
+    def close(self, exc_info=(None, None, None)):
+        if self._file is None:
+            return
+        if exc_info[0] is None:
+            self._file.write(b'\n}')
+        stack, self._stack, self._file = self._stack, None, None
+        stack.__exit__(*exc_info)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close(exc_info)
@@ -0,0 +1,344 @@
+"""
+Politeness limits shared by the image scripts.
+
+A token bucket per host caps how fast we hit brightet.com (or any other
+host) no matter how many worker threads are running, so total throughput
+is set directly instead of through fixed sleeps between requests.
+
+On top of that, HostThrottle reacts to what the server says: an AIMD
+controller grows concurrency while responses stay fast and healthy and
+halves it on 429/5xx, Retry-After pauses the whole host, and a per-host
+circuit breaker stops sending to a host that keeps failing.
+"""
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+import requests
+
+# Longest Retry-After we honour; a server asking for more gets this
+DEFAULT_MAX_RETRY_AFTER = 120.0
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second, holding at most `burst`
+    """
+
+    def __init__(self, rate, burst=1):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            self._updated = now
+
+    def reserve(self):
+        """
+        Take one token and return how many seconds the caller must wait for it
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1.0
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """
+        Block until a token is available
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    """
+    One token bucket per host, created lazily on first use
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket_for(self, url_or_host):
+        host = urlparse(url_or_host).netloc if '//' in url_or_host else url_or_host
+        host = host.lower()
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[host] = bucket
+            return bucket
+
+    def acquire(self, url_or_host):
+        """
+        Block until a request to the given URL's host is allowed
+        """
+        return self.bucket_for(url_or_host).acquire()
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    Raised instead of sending a request to a host whose breaker is open
+    """
+
+    def __init__(self, message, retry_in=0.0):
+        super().__init__(message)
+        self.retry_in = retry_in
+
+
+def parse_retry_after(value, now=None):
+    """
+    Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when is None:
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, when.timestamp() - now)
+
+
+def is_throttle_status(status_code):
+    return status_code == 429 or (status_code is not None and status_code >= 500)
+
+
+class AIMDController:
+    """
+    Adaptive concurrency limit: additive increase while requests succeed
+    within the latency target, multiplicative decrease on throttling or
+    server errors. Acts as a resizable semaphore for worker threads.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, latency_target=2.0,
+                 increase_every=None, decrease_factor=0.5, cooldown=1.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.latency_target = latency_target
+        self.increase_every = increase_every
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.active = 0
+        self._healthy_streak = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def current_limit(self):
+        return int(self.limit)
+
+    def acquire(self):
+        with self._condition:
+            while self.active >= int(self.limit):
+                self._condition.wait()
+            self.active += 1
+
+    def release(self, healthy, latency=None):
+        with self._condition:
+            self.active -= 1
+            if healthy and (latency is None or latency <= self.latency_target):
+                self._healthy_streak += 1
+                # One extra slot per "window" of healthy completions
+                window = self.increase_every or int(self.limit)
+                if self._healthy_streak >= window and self.limit < self.maximum:
+                    self.limit = min(self.maximum, self.limit + 1)
+                    self._healthy_streak = 0
+            elif not healthy:
+                self._healthy_streak = 0
+                now = time.monotonic()
+                # Back off once per cooldown so a burst of failures from
+                # the same congestion event doesn't collapse the limit
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+            self._condition.notify_all()
+
+    def abandon(self):
+        """
+        Free a slot without counting its request as healthy or not
+        """
+        with self._condition:
+            self.active -= 1
+            self._condition.notify_all()
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures;
+    open -> half-open after the reset timeout, letting one trial through;
+    the trial's outcome closes the breaker or reopens it for longer.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+    # How often callers held back by a half-open trial check its outcome
+    TRIAL_POLL = 1.0
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, max_reset_timeout=300.0):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def remaining(self):
+        """
+        Seconds to wait before asking again: until an open breaker lets a
+        trial through, or a poll interval while that trial is in flight
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN and self._trial_in_flight:
+                return min(self.TRIAL_POLL, self.reset_timeout)
+            if self.state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.reset_timeout = self.base_reset_timeout
+            self._trial_in_flight = False
+
+    def record_failure(self, retry_after=None):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+                self._open()
+            elif self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                self._open()
+            if self.state == self.OPEN and retry_after:
+                self.reset_timeout = max(self.reset_timeout, retry_after)
+
+    def abandon_trial(self):
+        """
+        The request let through as a half-open trial ended without an
+        answer about the host: let the next caller make the trial instead
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def _open(self):
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+
+class HostThrottle:
+    """
+    Everything that decides when a request may go out: per-host token
+    bucket, per-host Retry-After pauses and circuit breakers, and an
+    optional AIMD concurrency limit shared by all workers.
+    """
+
+    def __init__(self, rate, burst=1, controller=None, failure_threshold=5, reset_timeout=30.0,
+                 max_retry_after=DEFAULT_MAX_RETRY_AFTER):
+        self.rate_limiter = HostRateLimiter(rate, burst)
+        self.controller = controller
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_retry_after = max_retry_after
+        self._breakers = {}
+        self._paused_until = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url):
+        return urlparse(url).netloc.lower()
+
+    def breaker_for(self, url):
+        host = self.host_of(url)
+        with self._lock:
+            breaker = self._breakers.get(host)
+            if breaker is None:
+                breaker = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._breakers[host] = breaker
+            return breaker
+
+    def acquire(self, url):
+        """
+        Wait for permission to send a request to `url`.
+        Raises CircuitOpenError if the host's breaker is open.
+        """
+        breaker = self.breaker_for(url)
+        if not breaker.allow():
+            raise CircuitOpenError(f"circuit open for {self.host_of(url)}", breaker.remaining())
+        with self._lock:
+            paused_until = self._paused_until.get(self.host_of(url), 0.0)
+        wait = paused_until - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        if self.controller is not None:
+            self.controller.acquire()
+        self.rate_limiter.acquire(url)
+
+    def release(self, url, status_code=None, latency=None, retry_after=None, error=False):
+        """
+        Report the outcome of a request sent after acquire()
+        """
+        failed = error or is_throttle_status(status_code)
+        if retry_after:
+            retry_after = min(retry_after, self.max_retry_after)
+        breaker = self.breaker_for(url)
+        if failed:
+            breaker.record_failure(retry_after)
+        else:
+            breaker.record_success()
+        if retry_after:
+            with self._lock:
+                host = self.host_of(url)
+                self._paused_until[host] = max(self._paused_until.get(host, 0.0),
+                                               time.monotonic() + retry_after)
+        if self.controller is not None:
+            self.controller.release(not failed, latency)
+
+    def abandon(self, url):
+        """
+        Give back what acquire() took for a request that failed on our
+        side (a parser error, Ctrl-C) and so says nothing about the host:
+        neither the breaker nor the AIMD limit counts it
+        """
+        self.breaker_for(url).abandon_trial()
+        if self.controller is not None:
+            self.controller.abandon()
@@ -0,0 +1,179 @@
+"""
+Append-only progress journal for scrape_real_images.
+
+Every scraped product is written to a JSONL file the moment its result
+is known, so a crash, Ctrl-C or network drop only loses in-flight work.
+`--resume` skips products the journal already resolved, and compaction
+folds the journal into image_mapping.json. A run that finds an unfinished
+journal refuses to overwrite it unless told to `--resume` or `--restart`.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pipeline
+from catalog import write_atomic
+
+DEFAULT_JOURNAL_PATH = 'image_mapping.journal.jsonl'
+DEFAULT_MAPPING_PATH = 'image_mapping.json'
+
+
+class ScrapeJournal:
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, fresh=False, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._file = open(path, 'w' if fresh else 'a', encoding='utf-8')
+
+    def record(self, product_id, image_url, source='html'):
+        """
+        Append one result; a None image_url marks a failed attempt
+        """
+        line = json.dumps({
+            'id': product_id,
+            'image': image_url,
+            'source': source,
+            'ts': time.time(),
+        }, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def has_entries(path=DEFAULT_JOURNAL_PATH):
+    """
+    Whether the journal exists and holds anything, i.e. a run didn't finish
+    """
+    return os.path.exists(path) and os.path.getsize(path) > 0
+
+
+def iter_journal(path=DEFAULT_JOURNAL_PATH):
+    """
+    Entries in the order they were written. A torn last line from a crash
+    is ignored.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def read_journal(path=DEFAULT_JOURNAL_PATH):
+    """
+    Latest entry per product id, as a dict (see JournalIndex for big journals)
+    """
+    return {entry['id']: entry for entry in iter_journal(path)}
+
+
+class JournalIndex:
+    """
+    Latest entry per product id, read from the journal into a scratch
+    SQLite database that lives on disk, so resuming, patching and
+    compaction look products up without loading the journal into memory.
+    Ids keep their first position in the journal.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        # '' opens a private temporary database, removed on close
+        self._db = sqlite3.connect('')
+        self._db.executescript(
+            'PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF; PRAGMA cache_size = -512;'
+            'CREATE TABLE entries (id PRIMARY KEY, image TEXT, source TEXT, ts REAL);'
+        )
+        with self._db:
+            self._db.executemany(
+                'INSERT INTO entries VALUES (?, ?, ?, ?) ON CONFLICT (id) DO UPDATE '
+                'SET image = excluded.image, source = excluded.source, ts = excluded.ts',
+                ((entry['id'], entry.get('image'), entry.get('source'), entry.get('ts'))
+                 for entry in iter_journal(path)))
+
+    def get(self, product_id):
+        """
+        Latest entry for the product (a dict like the journal line), or None
+        """
+        row = self._db.execute('SELECT image, source, ts FROM entries WHERE id = ?', (product_id,)).fetchone()
+        if row is None:
+            return None
+        return {'id': product_id, 'image': row[0], 'source': row[1], 'ts': row[2]}
+
+    def image(self, product_id):
+        """
+        Image URL the journal resolved for the product, or None
+        """
+        row = self._db.execute('SELECT image FROM entries WHERE id = ?', (product_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def resolved(self):
+        """
+        How many products the journal resolved to an image
+        """
+        return self._db.execute('SELECT COUNT(*) FROM entries WHERE image IS NOT NULL').fetchone()[0]
+
+    def fold_into(self, mapping_path=DEFAULT_MAPPING_PATH):
+        """
+        Merge resolved entries into the mapping file (journal wins) and
+        write it atomically, streaming both through the scratch database.
+        Returns how many images the mapping holds.
+        """
+        with self._db:
+            self._db.execute('CREATE TABLE IF NOT EXISTS mapping (key TEXT PRIMARY KEY, image TEXT)')
+            self._db.execute('DELETE FROM mapping')
+            if os.path.exists(mapping_path):
+                self._db.executemany('INSERT OR REPLACE INTO mapping VALUES (?, ?)',
+                                     pipeline.iter_json_object(mapping_path))
+            # Existing keys keep their place; new ones follow in journal order
+            self._db.execute(
+                'INSERT INTO mapping SELECT CAST(id AS TEXT), image FROM entries WHERE image IS NOT NULL '
+                'ORDER BY rowid ON CONFLICT (key) DO UPDATE SET image = excluded.image')
+        with pipeline.JSONObjectWriter(mapping_path) as writer:
+            for key, image in self._db.execute('SELECT key, image FROM mapping ORDER BY rowid'):
+                writer.add(key, image)
+        if writer.count == 0:
+            write_atomic(mapping_path, b'{}')
+        return writer.count
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def compact(journal_path=DEFAULT_JOURNAL_PATH, mapping_path=DEFAULT_MAPPING_PATH, remove_journal=True):
+    """
+    Fold resolved journal entries into the mapping file (journal wins),
+    write it atomically and drop the journal. Returns how many images the
+    mapping holds.
+    """
+    with JournalIndex(journal_path) as index:
+        count = index.fold_into(mapping_path)
+    if remove_journal and os.path.exists(journal_path):
+        os.remove(journal_path)
+    return count
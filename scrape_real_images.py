@@ -1,92 +1,215 @@
 import requests
-import re
-import json
+import multiprocessing
+import os
+import queue
+import threading
 import time
-from bs4 import BeautifulSoup
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse
-import random
 
-def get_real_product_image(product_url, product_name, retries=3):
+import html_extract
+import http_client
+import http_cache
+import image_tools
+import metrics
+import pipeline
+import scrape_journal
+import shopify_feed
+import shopify_sitemap
+from rate_limit import DEFAULT_MAX_RETRY_AFTER, AIMDController, CircuitOpenError, HostThrottle, parse_retry_after
+
+BASE_URL = "https://brightet.com"
+
+# Default politeness: one request every two seconds per host, the same
+# average pace the old random 1-3s sleep gave us
+DEFAULT_CONCURRENCY = 4
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_RATE = 0.5
+DEFAULT_BURST = 1
+# How long one page may wait on an open circuit breaker, on top of its
+# retries, before the scraper gives up on it
+BREAKER_PATIENCE = 600.0
+# HTTP cache entries holding the image found on a page instead of the page
+EXTRACT_KIND = 'PAGE-IMAGE'
+
+def find_image_with_soup(content, product_name, base_url=BASE_URL):
     """
-    Scrape the actual product image from brightet.com
+    Full-document BeautifulSoup selector cascade.
+    Returns (image_url or None, via_fallback).
     """
-    base_url = "https://brightet.com"
-    full_url = urljoin(base_url, product_url)
+    # Imported here so the default streaming parser never loads bs4
+    from bs4 import BeautifulSoup
+    with metrics.timer('html_parse', parser='bs4'):
+        soup = BeautifulSoup(content, 'html.parser')
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Language': 'en-US,en;q=0.5',
-        'Accept-Encoding': 'gzip, deflate',
-        'Connection': 'keep-alive',
-        'Upgrade-Insecure-Requests': '1',
-    }
+    with metrics.timer('select', parser='bs4'):
+        return _select_image(soup, product_name, base_url)
+
+def _select_image(soup, product_name, base_url):
+    # Try multiple selectors to find product images
+    image_selectors = [
+        'img[data-src*="cdn.shop"]',
+        'img[src*="cdn.shop"]',
+        '.product-single__photo img',
+        '.product__photo img',
+        '.product-image img',
+        '.main-product-image img',
+        'img[alt*="' + product_name.split()[0] + '"]',
+        'img[data-zoom-src]',
+        'img.product-featured-image',
+        'img.product-image-main'
+    ]
     
-    for attempt in range(retries):
+    for selector in image_selectors:
+        try:
+            img_element = soup.select_one(selector)
+            if img_element:
+                # Try data-src first (lazy loading), then src
+                image_url = img_element.get('data-src') or img_element.get('src')
+                if image_url:
+                    # Make sure it's a full URL
+                    if image_url.startswith('//'):
+                        image_url = 'https:' + image_url
+                    elif image_url.startswith('/'):
+                        image_url = base_url + image_url
+                    
+                    # Verify it's a valid image URL
+                    if any(ext in image_url.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
+                        return image_url, False
+        except Exception as e:
+            continue
+    
+    # If no image found with selectors, try to find any image in the page
+    all_images = soup.find_all('img')
+    for img in all_images:
+        src = img.get('data-src') or img.get('src')
+        if src and 'cdn.shop' in src and any(ext in src.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
+            if src.startswith('//'):
+                src = 'https:' + src
+            elif src.startswith('/'):
+                src = base_url + src
+            return src, True
+    
+    return None, False
+
+def fetch_and_extract_image(full_url, product_name, base_url=BASE_URL, parser='stream'):
+    """
+    Download a product page and pull out its main image.
+    The streaming parser stops reading the body as soon as the image is
+    settled, so the HTTP cache keeps only the page's validators and the
+    image found in it: the next run sends If-None-Match /
+    If-Modified-Since and a 304 reuses that image without a body.
+    """
+    if parser == 'bs4':
+        response = http_client.get(full_url)
+        response.raise_for_status()
+        return find_image_with_soup(response.content, product_name, base_url)
+    
+    cache = http_client.get_cache()
+    saved = cache.lookup_derived(EXTRACT_KIND, full_url) if cache is not None else None
+    if saved is not None and cache.is_fresh(saved):
+        cache.stats.incr('hits')
+        cache.touch_derived(EXTRACT_KIND, full_url)
+        return tuple(saved['value'])
+    
+    headers = cache.validator_headers(saved) if saved is not None else {}
+    response = http_client.get(full_url, stream=True, headers=headers)
+    try:
+        if response.status_code == 304 and saved is not None:
+            cache.stats.incr('revalidated')
+            cache.touch_derived(EXTRACT_KIND, full_url, response)
+            return tuple(saved['value'])
+        response.raise_for_status()
+        # Body reads are interleaved with parsing; time them apart
+        chunks = metrics.TimedIterator(response.iter_content(html_extract.CHUNK_SIZE), 'body',
+                                       host=urlparse(full_url).netloc, method='GET',
+                                       status=response.status_code)
+        content_type = response.headers.get('Content-Type', '').lower()
+        encoding = response.encoding if 'charset' in content_type else 'utf-8'
+        started = time.perf_counter()
+        image_url, via_fallback, _ = html_extract.extract_product_image(
+            chunks, product_name, base_url, encoding)
+        chunks.close()
+        parse_time = time.perf_counter() - started - chunks.waited
+        metrics.observe('html_parse', parse_time, parser='stream')
+        if cache is not None:
+            cache.stats.incr('misses')
+            if cache.is_cacheable(response):
+                cache.store_derived(EXTRACT_KIND, full_url, response, [image_url, via_fallback])
+        return image_url, via_fallback
+    finally:
+        response.close()
+
+def retry_after_from(error):
+    """
+    Status code and Retry-After delay carried by a failed request, if any
+    """
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None, None
+    return response.status_code, parse_retry_after(response.headers.get('Retry-After'))
+
+def with_retries(full_url, product_name, action, retries=3, throttle=None):
+    """
+    Run action(full_url) under the host throttle, retrying failed requests
+    with Retry-After / exponential backoff. Returns the action's result,
+    or None if every attempt failed.
+    """
+    attempt = 0
+    breaker_wait = 0.0
+    while attempt < retries:
         try:
             print(f"🔍 Scraping: {product_name}")
             print(f"   URL: {full_url}")
             
-            response = requests.get(full_url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            # Try multiple selectors to find product images
-            image_selectors = [
-                'img[data-src*="cdn.shop"]',
-                'img[src*="cdn.shop"]',
-                '.product-single__photo img',
-                '.product__photo img',
-                '.product-image img',
-                '.main-product-image img',
-                'img[alt*="' + product_name.split()[0] + '"]',
-                'img[data-zoom-src]',
-                'img.product-featured-image',
-                'img.product-image-main'
-            ]
-            
-            image_url = None
-            
-            for selector in image_selectors:
-                try:
-                    img_element = soup.select_one(selector)
-                    if img_element:
-                        # Try data-src first (lazy loading), then src
-                        image_url = img_element.get('data-src') or img_element.get('src')
-                        if image_url:
-                            # Make sure it's a full URL
-                            if image_url.startswith('//'):
-                                image_url = 'https:' + image_url
-                            elif image_url.startswith('/'):
-                                image_url = base_url + image_url
-                            
-                            # Verify it's a valid image URL
-                            if any(ext in image_url.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
-                                print(f"   ✅ Found image: {image_url}")
-                                return image_url
-                except Exception as e:
-                    continue
+            if throttle is not None:
+                throttle.acquire(full_url)
+            attempt += 1
             
-            # If no image found with selectors, try to find any image in the page
-            all_images = soup.find_all('img')
-            for img in all_images:
-                src = img.get('data-src') or img.get('src')
-                if src and 'cdn.shop' in src and any(ext in src.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
-                    if src.startswith('//'):
-                        src = 'https:' + src
-                    elif src.startswith('/'):
-                        src = base_url + src
-                    print(f"   ✅ Found fallback image: {src}")
-                    return src
-            
-            print(f"   ❌ No image found for {product_name}")
-            return None
+            started = time.monotonic()
+            status_code, retry_after, error = 200, None, False
+            counted = True
+            try:
+                return action(full_url)
+            except requests.exceptions.RequestException as e:
+                status_code, retry_after = retry_after_from(e)
+                error = status_code is None
+                raise
+            except BaseException:
+                # The failure is on our side (unknown charset, parser
+                # error, Ctrl-C), so it's neither a success nor a failure
+                # of the host
+                counted = False
+                raise
+            finally:
+                # Always give the slot back, or the AIMD limit and a
+                # half-open breaker's trial are held forever
+                if throttle is not None and counted:
+                    throttle.release(full_url, status_code, time.monotonic() - started, retry_after, error=error)
+                elif throttle is not None:
+                    throttle.abandon(full_url)
             
+        except CircuitOpenError as e:
+            # Nothing was sent, so waiting on the breaker isn't an attempt
+            if breaker_wait >= BREAKER_PATIENCE:
+                print(f"   ⛔ {e}, giving up after {breaker_wait:.0f}s")
+                return None
+            print(f"   ⛔ {e}, asking again in {e.retry_in:.1f}s")
+            time.sleep(e.retry_in)
+            breaker_wait += e.retry_in
+            continue
         except requests.exceptions.RequestException as e:
-            print(f"   ⚠️  Request failed (attempt {attempt + 1}): {e}")
-            if attempt < retries - 1:
-                time.sleep(2 ** attempt)  # Exponential backoff
+            print(f"   ⚠️  Request failed (attempt {attempt}): {e}")
+            if attempt < retries:
+                # Honour the server's Retry-After (capped), else exponential
+                # backoff. The throttle has already paused the host for the
+                # capped Retry-After, and its acquire() will wait that out.
+                _, retry_after = retry_after_from(e)
+                if retry_after is None:
+                    time.sleep(2 ** (attempt - 1))
+                elif throttle is None:
+                    time.sleep(min(retry_after, DEFAULT_MAX_RETRY_AFTER))
             continue
         except Exception as e:
             print(f"   ❌ Error scraping {product_name}: {e}")
@@ -94,101 +217,370 @@ def get_real_product_image(product_url, product_name, retries=3):
     
     return None
 
-def extract_products_from_ts_file():
+def report_image(product_name, found):
     """
-    Extract product data from the TypeScript file
+    Print the outcome for one product and return its image URL (or None)
+    """
+    image_url, via_fallback = found or (None, False)
+    if image_url:
+        label = "fallback image" if via_fallback else "image"
+        print(f"   ✅ Found {label}: {image_url}")
+        return image_url
+    print(f"   ❌ No image found for {product_name}")
+    return None
+
+def get_real_product_image(product_url, product_name, retries=3, throttle=None, base_url=BASE_URL, parser='stream'):
+    """
+    Scrape the actual product image from brightet.com
+    """
+    full_url = urljoin(base_url, product_url)
+    found = with_retries(full_url, product_name,
+                         lambda url: fetch_and_extract_image(url, product_name, base_url, parser),
+                         retries, throttle)
+    if found is None:
+        return None
+    return report_image(product_name, found)
+
+def fetch_page(full_url):
+    """
+    Download a whole product page for the parse stage: (body bytes, encoding)
+    """
+    response = http_client.get(full_url)
+    response.raise_for_status()
+    content_type = response.headers.get('Content-Type', '').lower()
+    encoding = response.encoding if 'charset' in content_type else 'utf-8'
+    return response.content, encoding
+
+def parse_page(content, product_name, base_url=BASE_URL, parser='stream', encoding='utf-8'):
+    """
+    Parse stage worker (runs in a child process).
+    Returns (image_url, via_fallback, seconds spent parsing).
+    """
+    started = time.perf_counter()
+    if parser == 'bs4':
+        image_url, via_fallback = find_image_with_soup(content, product_name, base_url)
+    else:
+        image_url, via_fallback, _ = html_extract.extract_product_image(
+            html_extract.iter_chunks(content), product_name, base_url, encoding)
+    return image_url, via_fallback, time.perf_counter() - started
+
+class ParseStage:
+    """
+    Process pool for HTML parsing behind a bounded queue. Fetcher threads
+    hand over raw page bodies and go back to network I/O; submit() blocks
+    once `max_pending` bodies are queued or parsing, so fetchers can't run
+    ahead of the parsers and pile pages up in memory.
     """
-    products = []
     
-    with open('src/data/products.ts', 'r', encoding='utf-8') as file:
-        content = file.read()
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 2
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        # Workers start on first submit, from a fetcher thread; a plain fork
+        # there copies locks other threads hold (metrics, the HTTP pool) and
+        # the child can deadlock on them, so start them from a clean process
+        method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                             mp_context=multiprocessing.get_context(method))
     
-    # Use regex to extract product objects
-    product_pattern = r'\{[^}]*id:\s*[\'"]([^\'"]*)[\'"][^}]*name:\s*[\'"]([^\'"]*)[\'"][^}]*url:\s*[\'"]([^\'"]*)[\'"][^}]*\}'
+    def submit(self, content, product_name, base_url, parser, encoding):
+        started = time.perf_counter()
+        self._slots.acquire()
+        metrics.observe('parse_blocked', time.perf_counter() - started)
+        try:
+            future = self._executor.submit(parse_page, content, product_name, base_url, parser, encoding)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
     
-    matches = re.findall(product_pattern, content, re.DOTALL)
+    def shutdown(self, cancel=False):
+        self._executor.shutdown(wait=not cancel, cancel_futures=cancel)
+
+def scrape_via_stage(product, stage, done, throttle=None, base_url=BASE_URL, parser='stream'):
+    """
+    Fetch one product page on this thread, queue it for the parse stage and
+    return; (product, image URL or None) lands on `done` when parsing ends
+    """
+    try:
+        full_url = urljoin(base_url, product['url'])
+        page = with_retries(full_url, product['name'], fetch_page, throttle=throttle)
+        if page is None:
+            done.put((product, None))
+            return
+        content, encoding = page
+        submitted = time.perf_counter()
+        future = stage.submit(content, product['name'], base_url, parser, encoding)
+    except Exception as e:
+        print(f"   ❌ Error scraping {product['name']}: {e}")
+        done.put((product, None))
+        return
     
-    for match in matches:
-        product_id, name, url = match
-        # Clean up the name and URL
-        name = name.replace('\\"', '"').strip()
-        url = url.strip()
-        
-        products.append({
-            'id': product_id,
-            'name': name,
-            'url': url
-        })
+    def parsed(future):
+        try:
+            image_url, via_fallback, seconds = future.result()
+            metrics.observe('html_parse', seconds, parser=parser, stage='process')
+            metrics.observe('parse_queue', max(0.0, time.perf_counter() - submitted - seconds))
+            done.put((product, report_image(product['name'], (image_url, via_fallback))))
+        except Exception as e:
+            print(f"   ❌ Error parsing {product['name']}: {e}")
+            done.put((product, None))
     
-    return products
+    future.add_done_callback(parsed)
+
+def scrape_one(product, done, throttle=None, base_url=BASE_URL, parser='stream'):
+    """
+    Fetch and parse one product page on this thread; (product, image URL
+    or None) lands on `done`
+    """
+    try:
+        image_url = get_real_product_image(product['url'], product['name'], throttle=throttle,
+                                           base_url=base_url, parser=parser)
+    except Exception as e:
+        print(f"   ❌ Error scraping {product['name']}: {e}")
+        image_url = None
+    done.put((product, image_url))
 
-def update_products_file_with_real_images(image_mapping):
+def scrape_products(products, concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, burst=DEFAULT_BURST, base_url=BASE_URL,
+                    parser='stream', journal=None, max_concurrency=None, progress_interval=2.0,
+                    parse_workers=0, parse_queue=None, total=None):
     """
-    Update the products.ts file with real image URLs
+    Scrape images for all products using a bounded thread pool.
+    Throughput is capped per host by a token bucket rather than fixed sleeps.
+    With `max_concurrency`, an AIMD controller starts at `concurrency` and
+    adapts between 1 and `max_concurrency` based on latency and 429/5xx.
+    With `parse_workers`, threads only fetch and pages are parsed in a
+    process pool (see ParseStage), overlapping network and CPU work.
+    `products` may be a generator: only a window of them is read ahead of
+    the results, and each result is appended to `journal` as soon as it
+    completes and is not kept here. Returns (found, missing) product counts.
     """
-    with open('src/data/products.ts', 'r', encoding='utf-8') as file:
-        content = file.read()
+    workers = max(1, max_concurrency or concurrency)
+    controller = AIMDController(initial=concurrency, maximum=workers) if max_concurrency else None
+    throttle = HostThrottle(rate, burst, controller)
+    http_client.get_session(workers, throttled=True)
+    found = missing = 0
+    details = (lambda: f"concurrency limit {controller.current_limit}") if controller is not None else None
+    if total is None and hasattr(products, '__len__'):
+        total = len(products)
+    progress = metrics.ProgressReporter(total, 'processed', progress_interval, details)
+    stage = ParseStage(parse_workers, parse_queue) if parse_workers else None
     
-    # Replace image URLs
-    for product_id, image_url in image_mapping.items():
-        if image_url:
-            # Find the product and replace its image URL
-            pattern = r'(id:\s*[\'"]' + re.escape(product_id) + r'[\'"][^}]*image:\s*[\'"])[^\'"]*([\'"],[^}]*\})'
-            replacement = r'\1' + image_url + r'\2'
-            content = re.sub(pattern, replacement, content, flags=re.DOTALL)
+    def finished(product, real_image_url):
+        nonlocal found, missing
+        if journal is not None:
+            journal.record(product['id'], real_image_url)
+        metrics.count('products', result='found' if real_image_url else 'missing')
+        if real_image_url:
+            found += 1
+            progress.update(found=1)
+        else:
+            missing += 1
+            progress.update(missing=1)
+    
+    # Results come back in completion order; at most `window` products are
+    # in flight, so a big catalog never sits in the executor's queue
+    window = workers * pipeline.DEFAULT_WINDOW_PER_WORKER
+    done = queue.Queue()
+    in_flight = 0
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for product in products:
+            if stage is None:
+                executor.submit(scrape_one, product, done, throttle, base_url, parser)
+            else:
+                executor.submit(scrape_via_stage, product, stage, done, throttle, base_url, parser)
+            in_flight += 1
+            while in_flight >= window:
+                finished(*done.get())
+                in_flight -= 1
+        while in_flight:
+            finished(*done.get())
+            in_flight -= 1
+    except KeyboardInterrupt:
+        # Drop queued work; everything finished so far is in the journal
+        executor.shutdown(wait=False, cancel_futures=True)
+        if stage is not None:
+            stage.shutdown(cancel=True)
+        raise
+    executor.shutdown()
+    if stage is not None:
+        stage.shutdown()
+    progress.finish()
+    
+    return found, missing
+
+def plan_incremental(products, state, base_url=BASE_URL, sitemap_url=None):
+    """
+    Narrow `products` to the ones the sitemap says are new or changed since
+    their last scrape. Falls back to all of them if the sitemap can't be read.
+    """
+    sitemap_url = sitemap_url or urljoin(base_url, shopify_sitemap.SITEMAP_PATH)
+    print(f"\n🗺️  Reading product sitemaps from {sitemap_url}...")
+    try:
+        with metrics.timer('sitemap'):
+            lastmods = shopify_sitemap.fetch_lastmods(base_url, sitemap_url)
+    except Exception as e:
+        print(f"   ⚠️  Sitemap unavailable ({e}), scraping every product")
+        return products
     
-    # Write back to file
-    with open('src/data/products.ts', 'w', encoding='utf-8') as file:
-        file.write(content)
+    plan = shopify_sitemap.plan_refresh(products, lastmods, state)
+    print(f"   📋 {len(lastmods)} products in the sitemap: {len(plan['new'])} new, "
+          f"{len(plan['changed'])} changed, {len(plan['unchanged'])} unchanged")
+    if plan['gone']:
+        print(f"   ⚠️  {len(plan['gone'])} catalog products are no longer in the sitemap (not scraped):")
+        for product in plan['gone']:
+            print(f"      - [{product['id']}] {product['name'][:60]} ({product.get('url')})")
+    return plan['new'] + plan['changed']
+
+def add_arguments(parser):
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help="number of products scraped in parallel (starting point when adaptive)")
+    parser.add_argument('--max-concurrency', type=int, default=DEFAULT_MAX_CONCURRENCY,
+                        help="upper bound for the adaptive (AIMD) concurrency limit")
+    parser.add_argument('--no-adaptive', action='store_true',
+                        help="keep concurrency fixed instead of adapting to latency and throttling")
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE,
+                        help="max requests per second to any single host")
+    parser.add_argument('--burst', type=int, default=DEFAULT_BURST,
+                        help="requests allowed back-to-back before the rate limit applies")
+    parser.add_argument('--bulk', action='store_true',
+                        help="resolve images from the Shopify /products.json feed first, "
+                             "scraping HTML pages only for products it doesn't cover")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only scrape products that are new or whose sitemap lastmod is newer than "
+                             "their last scrape, and report catalog URLs missing from the sitemap")
+    parser.add_argument('--sitemap', default=None,
+                        help="sitemap index to read for --incremental (default: <base-url>/sitemap.xml)")
+    parser.add_argument('--scrape-state', default=shopify_sitemap.DEFAULT_STATE_PATH,
+                        help="JSON file recording when each product page was last scraped")
+    parser.add_argument('--base-url', default=BASE_URL,
+                        help="store to scrape (e.g. a local stub_shopify_server.py)")
+    parser.add_argument('--parser', choices=['stream', 'bs4'], default='stream',
+                        help="streaming early-exit extractor, or the full BeautifulSoup cascade")
+    parser.add_argument('--parse-workers', type=int, default=0,
+                        help="parse pages in this many worker processes while threads keep fetching "
+                             "(0 parses on the fetching thread)")
+    parser.add_argument('--parse-queue', type=int, default=None,
+                        help="max pages waiting for or in the parse pool before fetchers block "
+                             "(default: twice the parse workers)")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue an interrupted run, skipping products already in the journal")
+    parser.add_argument('--restart', action='store_true',
+                        help="start over even though the journal holds an unfinished run "
+                             "(its results are folded into image_mapping.json first)")
+    parser.add_argument('--journal', default=scrape_journal.DEFAULT_JOURNAL_PATH,
+                        help="append-only JSONL file recording each result as it completes")
+    parser.add_argument('--compact', action='store_true',
+                        help="only fold the journal into image_mapping.json and exit")
+    http_cache.add_cache_arguments(parser)
 
-def main():
+def run(session, args):
+    if args.compact:
+        count = scrape_journal.compact(args.journal)
+        print(f"💾 Journal folded into image_mapping.json ({count} images)")
+        return
+    
+    if args.resume and args.restart:
+        raise SystemExit("--resume and --restart can't be combined")
+    if not args.resume and scrape_journal.has_entries(args.journal):
+        # A new run truncates the journal; don't lose an unfinished one
+        if not args.restart:
+            raise SystemExit(f"❌ {args.journal} holds results from an unfinished run. Rerun with --resume "
+                             f"to continue it, or --restart to start over.")
+        count = scrape_journal.compact(args.journal)
+        print(f"💾 Folded the unfinished run's journal into image_mapping.json ({count} images) before restarting")
+    
+    http_client.configure_cache(args)
     print("🚀 Starting real product image extraction from brightet.com...")
     
-    # Extract products from TypeScript file
-    products = extract_products_from_ts_file()
-    print(f"📦 Found {len(products)} products to process")
+    # Products stream from products.ts on every pass below instead of being
+    # held in a list, and resumed ids are looked up in the on-disk index
+    resumed = scrape_journal.JournalIndex(args.journal) if args.resume else None
+    
+    def pending():
+        for record in session.products('id', 'name', 'url'):
+            if resumed is None or not resumed.image(record['id']):
+                yield {'id': record['id'], 'name': record['name'].strip(), 'url': record['url'].strip()}
+    
+    total = sum(1 for _ in session.products('id', 'name', 'url'))
+    print(f"📦 Found {total} products to process")
+    mode = "fixed" if args.no_adaptive else f"adaptive up to {args.max_concurrency}"
+    print(f"⚙️  Concurrency: {args.concurrency} ({mode}), rate limit: {args.rate}/s per host (burst {args.burst})")
+    
+    to_scrape = pending()
+    queued = total
+    if resumed is not None:
+        queued = sum(1 for _ in pending())
+        print(f"⏩ Resuming: {resumed.resolved()} products already resolved, {queued} to go")
+    
+    state = shopify_sitemap.ScrapeState(args.scrape_state)
+    if args.incremental and queued:
+        # Planned against the whole sitemap, so this works on a list
+        to_scrape = plan_incremental(list(to_scrape), state, args.base_url, args.sitemap)
+        queued = len(to_scrape)
     
-    # Dictionary to store image mappings
-    image_mapping = {}
-    successful_scrapes = 0
     failed_scrapes = 0
+    try:
+        with scrape_journal.ScrapeJournal(args.journal, fresh=not args.resume) as journal:
+            if args.bulk and queued:
+                print(f"\n📚 Loading bulk product feed from {args.base_url}/products.json...")
+                try:
+                    feed_mapping, to_scrape = shopify_feed.resolve_from_feed(to_scrape, args.base_url)
+                    for product_id, image_url in feed_mapping.items():
+                        journal.record(product_id, image_url, source='feed')
+                    queued = len(to_scrape)
+                    print(f"   ✅ Feed resolved {len(feed_mapping)} products, {queued} left for HTML scraping")
+                except Exception as e:
+                    print(f"   ⚠️  Bulk feed unavailable ({e}), falling back to HTML scraping")
+            
+            try:
+                max_concurrency = None if args.no_adaptive else max(args.max_concurrency, args.concurrency)
+                if queued:
+                    _, failed_scrapes = scrape_products(
+                        to_scrape, args.concurrency, args.rate, args.burst, args.base_url, args.parser, journal,
+                        max_concurrency, args.progress_interval, args.parse_workers, args.parse_queue, total=queued)
+            except KeyboardInterrupt:
+                print(f"\n⏸️  Interrupted. Progress is saved in {args.journal}; rerun with --resume to continue.")
+                raise
+    finally:
+        if resumed is not None:
+            resumed.close()
     
-    # Process each product
-    for i, product in enumerate(products, 1):
-        print(f"\n[{i}/{len(products)}] Processing: {product['name']}")
-        
-        # Get real image URL
-        real_image_url = get_real_product_image(product['url'], product['name'])
+    # Every result (resumed, feed and scraped) is in the journal; it is the
+    # only copy, and products.ts is patched from it
+    with scrape_journal.JournalIndex(args.journal) as entries:
+        print(f"\n🎉 Scraping completed!")
+        print(f"   ✅ Successfully scraped: {entries.resolved()} images")
+        print(f"   ❌ Failed to scrape: {failed_scrapes} images")
         
-        if real_image_url:
-            image_mapping[product['id']] = real_image_url
-            successful_scrapes += 1
-        else:
-            failed_scrapes += 1
+        def resolved_images():
+            for record in session.products('id'):
+                image_url = entries.image(record['id'])
+                if image_url:
+                    yield record, image_url
         
-        # Add delay to be respectful to the server
-        time.sleep(random.uniform(1, 3))
+        # Spliced into products.ts in one streaming pass when scrape runs
+        # alone, else queued with the other stages' changes
+        written = session.patch_images(resolved_images())
+        if written:
+            print(f"✅ Products file updated: {written} images changed")
         
-        # Progress update every 10 items
-        if i % 10 == 0:
-            print(f"\n📊 Progress: {i}/{len(products)} processed")
-            print(f"   ✅ Successful: {successful_scrapes}")
-            print(f"   ❌ Failed: {failed_scrapes}")
-    
-    print(f"\n🎉 Scraping completed!")
-    print(f"   ✅ Successfully scraped: {successful_scrapes} images")
-    print(f"   ❌ Failed to scrape: {failed_scrapes} images")
-    
-    if successful_scrapes > 0:
-        print(f"\n🔄 Updating products.ts file with real images...")
-        update_products_file_with_real_images(image_mapping)
-        print(f"✅ Products file updated with {successful_scrapes} real product images!")
-    
-    # Save mapping for reference
-    with open('image_mapping.json', 'w') as f:
-        json.dump(image_mapping, f, indent=2)
+        # Remember scrape times for --incremental
+        state.record_journal(session.products('id', 'url'), entries)
+    state.save()
+    state.close()
+    # Then fold the journal into the mapping kept for reference
+    scrape_journal.compact(args.journal)
     
     print(f"\n💾 Image mapping saved to image_mapping.json")
+    
+    if http_client.get_cache() is not None:
+        print(http_client.cache_report())
+
+def main(argv=None):
+    image_tools.main(['scrape'] + (sys.argv[1:] if argv is None else list(argv)))
 
 if __name__ == "__main__":
-    main()
+    main()
\ No newline at end of file
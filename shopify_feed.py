@@ -0,0 +1,101 @@
+"""
+Bulk catalog ingestion from the Shopify storefront JSON feed.
+
+brightet.com is a Shopify store, so `/products.json?limit=250&page=N`
+returns every product with its images. Paging through it resolves the
+whole catalog in a handful of requests instead of one HTML page per SKU.
+"""
+
+from urllib.parse import urljoin
+
+import http_client
+
+BASE_URL = "https://brightet.com"
+PAGE_LIMIT = 250  # Shopify's maximum page size
+MAX_PAGES = 400
+
+
+def iter_feed_products(base_url=BASE_URL, limit=PAGE_LIMIT, max_pages=MAX_PAGES):
+    """
+    Yield raw product dicts from /products.json, one page at a time,
+    until the store returns a short or empty page
+    """
+    for page in range(1, max_pages + 1):
+        url = urljoin(base_url, f"/products.json?limit={limit}&page={page}")
+        response = http_client.get(url)
+        response.raise_for_status()
+        batch = response.json().get('products', [])
+        for product in batch:
+            yield product
+        if len(batch) < limit:
+            return
+
+
+def normalize_image_src(src, base_url=BASE_URL):
+    if not src:
+        return None
+    if src.startswith('//'):
+        return 'https:' + src
+    if src.startswith('/'):
+        return urljoin(base_url, src)
+    return src
+
+
+def primary_image(feed_product, base_url=BASE_URL):
+    """
+    Pick the product's main image: the lowest-position entry in `images`,
+    falling back to the single `image` field some themes expose
+    """
+    images = feed_product.get('images') or []
+    if images:
+        first = min(images, key=lambda image: image.get('position') or 0)
+        return normalize_image_src(first.get('src'), base_url)
+    image = feed_product.get('image') or {}
+    return normalize_image_src(image.get('src'), base_url)
+
+
+def fetch_image_index(base_url=BASE_URL, limit=PAGE_LIMIT):
+    """
+    Page through the feed and return two lookups:
+    product id -> image URL and product handle -> image URL
+    """
+    by_id = {}
+    by_handle = {}
+    for feed_product in iter_feed_products(base_url, limit):
+        image_url = primary_image(feed_product, base_url)
+        if not image_url:
+            continue
+        by_id[str(feed_product.get('id'))] = image_url
+        if feed_product.get('handle'):
+            by_handle[feed_product['handle']] = image_url
+    return by_id, by_handle
+
+
+def handle_from_url(product_url):
+    """
+    '/products/some-handle?variant=1' -> 'some-handle'
+    """
+    if not product_url:
+        return None
+    path = product_url.split('?', 1)[0].rstrip('/')
+    if '/products/' not in path:
+        return None
+    return path.rsplit('/products/', 1)[1] or None
+
+
+def resolve_from_feed(products, base_url=BASE_URL, limit=PAGE_LIMIT):
+    """
+    Match catalog products against the bulk feed by id, then by handle.
+    Returns (image_mapping, missing_products); only the missing ones need
+    the per-page HTML scraper.
+    """
+    by_id, by_handle = fetch_image_index(base_url, limit)
+    image_mapping = {}
+    missing = []
+    for product in products:
+        image_url = by_id.get(product['id']) or by_handle.get(handle_from_url(product.get('url')))
+        if image_url:
+            image_mapping[product['id']] = image_url
+        else:
+            missing.append(product)
+    return image_mapping, missing
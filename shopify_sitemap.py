@@ -0,0 +1,211 @@
+"""
+Incremental refresh driven by the Shopify product sitemaps.
+
+`/sitemap.xml` indexes `/sitemap_products_N.xml` files listing every
+product URL with its `lastmod`. Comparing those against when each product
+was last scraped lets a nightly run queue only new or changed products,
+and catalog entries whose URL has left the sitemap are reported instead
+of scraped. Sitemaps are parsed as they download and each entry is
+dropped once read, so memory doesn't grow with the size of the store.
+"""
+
+import os
+import sqlite3
+from datetime import datetime, timezone
+from urllib.parse import urljoin, urlsplit
+from xml.etree.ElementTree import XMLPullParser
+
+import http_client
+import pipeline
+from catalog import write_atomic
+from shopify_feed import BASE_URL, handle_from_url
+
+SITEMAP_PATH = '/sitemap.xml'
+DEFAULT_STATE_PATH = '.cache/scrape_state.json'
+CHUNK_SIZE = 64 * 1024
+
+
+def local_name(tag):
+    """
+    '{http://www.sitemaps.org/schemas/sitemap/0.9}loc' -> 'loc'
+    """
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_lastmod(value):
+    """
+    W3C datetime ('2024-05-01', '2024-05-01T10:00:00Z', '...+02:00') ->
+    epoch seconds, or None if missing or unparseable. No offset means UTC.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _entries(parser, root):
+    for event, element in parser.read_events():
+        if event == 'start':
+            if not root:
+                root.append(element)
+            continue
+        kind = local_name(element.tag)
+        if kind not in ('url', 'sitemap'):
+            continue
+        loc = lastmod = None
+        for child in element:
+            name = local_name(child.tag)
+            if name == 'loc':
+                loc = (child.text or '').strip()
+            elif name == 'lastmod':
+                lastmod = parse_lastmod(child.text)
+        # Detach the finished entry so the tree never holds more than one
+        if root and element in root[0]:
+            root[0].remove(element)
+        if loc:
+            yield kind, loc, lastmod
+
+
+def iter_sitemap(url):
+    """
+    Yield ('sitemap', loc, lastmod) for sitemap index entries and
+    ('url', loc, lastmod) for page entries, parsing while downloading
+    """
+    response = http_client.get(url, stream=True)
+    with response:
+        response.raise_for_status()
+        parser = XMLPullParser(events=('start', 'end'))
+        root = []
+        for chunk in response.iter_content(CHUNK_SIZE):
+            parser.feed(chunk)
+            yield from _entries(parser, root)
+        parser.close()
+        yield from _entries(parser, root)
+
+
+def iter_product_lastmods(base_url=BASE_URL, sitemap_url=None):
+    """
+    Yield (product page URL, lastmod) from every product sitemap reachable
+    from the store's sitemap index (pages, blogs and collections skipped)
+    """
+    pending = [sitemap_url or urljoin(base_url, SITEMAP_PATH)]
+    seen = set()
+    while pending:
+        url = pending.pop(0)
+        if url in seen:
+            continue
+        seen.add(url)
+        for kind, loc, lastmod in iter_sitemap(url):
+            if kind == 'sitemap':
+                if 'product' in urlsplit(loc).path:
+                    pending.append(urljoin(url, loc))
+            elif '/products/' in loc:
+                yield loc, lastmod
+
+
+def fetch_lastmods(base_url=BASE_URL, sitemap_url=None):
+    """
+    product handle -> lastmod (epoch seconds, or None when not given)
+    """
+    lastmods = {}
+    for loc, lastmod in iter_product_lastmods(base_url, sitemap_url):
+        handle = handle_from_url(urlsplit(loc).path)
+        if handle:
+            lastmods[handle] = lastmod
+    return lastmods
+
+
+class ScrapeState:
+    """
+    When each product page (by handle) last scraped successfully. Kept
+    across runs, unlike the journal, which is folded away at the end.
+    The state file is read into a scratch SQLite database on disk and
+    streamed back out by save(), so it isn't held in memory.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        # '' opens a private temporary database, removed on close
+        self._db = sqlite3.connect('')
+        self._db.executescript(
+            'PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF; PRAGMA cache_size = -512;'
+            'CREATE TABLE scraped (handle TEXT PRIMARY KEY, ts REAL);'
+        )
+        if path and os.path.exists(path):
+            try:
+                with self._db:
+                    self._db.executemany('INSERT OR REPLACE INTO scraped VALUES (?, ?)',
+                                         pipeline.iter_json_object(path))
+            except (OSError, ValueError, sqlite3.Error):
+                with self._db:
+                    self._db.execute('DELETE FROM scraped')
+
+    def last_scraped(self, product):
+        row = self._db.execute('SELECT ts FROM scraped WHERE handle = ?',
+                               (handle_from_url(product.get('url')),)).fetchone()
+        return row[0] if row is not None else None
+
+    def record_journal(self, products, entries):
+        """
+        Take scrape times for `products` (records with id and url) from
+        their journal entries (see scrape_journal.JournalIndex); failed
+        attempts aren't recorded, so they're retried next run
+        """
+        recorded = 0
+        with self._db:
+            for product in products:
+                entry = entries.get(product['id'])
+                handle = handle_from_url(product.get('url'))
+                if handle and entry and entry.get('image'):
+                    self._db.execute('INSERT INTO scraped VALUES (?, ?) ON CONFLICT (handle) '
+                                     'DO UPDATE SET ts = max(ts, excluded.ts)', (handle, entry['ts']))
+                    recorded += 1
+        return recorded
+
+    def save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Sorted by handle, as json.dump(..., sort_keys=True) wrote it
+        with pipeline.JSONObjectWriter(self.path) as writer:
+            for handle, ts in self._db.execute('SELECT handle, ts FROM scraped ORDER BY handle'):
+                writer.add(handle, ts)
+        if writer.count == 0:
+            write_atomic(self.path, b'{}')
+
+    def close(self):
+        self._db.close()
+
+
+def plan_refresh(products, lastmods, state):
+    """
+    Split catalog products against the sitemap into
+    'new' (never scraped), 'changed' (lastmod after the last scrape, or no
+    lastmod to compare), 'unchanged' and 'gone' (URL not in the sitemap).
+    Only new and changed products need scraping.
+    """
+    plan = {'new': [], 'changed': [], 'unchanged': [], 'gone': []}
+    for product in products:
+        handle = handle_from_url(product.get('url'))
+        if handle not in lastmods:
+            plan['gone'].append(product)
+            continue
+        scraped = state.last_scraped(product)
+        lastmod = lastmods[handle]
+        if scraped is None:
+            plan['new'].append(product)
+        elif lastmod is None or lastmod > scraped:
+            plan['changed'].append(product)
+        else:
+            plan['unchanged'].append(product)
+    return plan
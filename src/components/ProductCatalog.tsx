@@ -1,5 +1,5 @@
-import React, { useState } from 'react';
-import { products } from '../data/products';
+import React, { useEffect, useState } from 'react';
+import { CatalogIndex, loadCatalogIndex, loadCategory, loadPages } from '../data/catalogShards';
 import { ShoppingCart, Heart, Eye, Plus, Check, Box, Home, Smartphone, RotateCcw } from 'lucide-react';
 import { Product } from '../types';
 import Product3DViewer from './Product3DViewer';
@@ -16,13 +16,57 @@ const ProductCatalog: React.FC = () => {
   const [selectedForRoom, setSelectedForRoom] = useState<Set<string>>(new Set());
   const [show3DRoomPreview, setShow3DRoomPreview] = useState<Product | null>(null);
   const [showToast, setShowToast] = useState<string | null>(null);
+  const [catalogIndex, setCatalogIndex] = useState<CatalogIndex | null>(null);
+  const [filteredProducts, setFilteredProducts] = useState<Product[]>([]);
+  const [loadedProducts, setLoadedProducts] = useState<Map<string, Product>>(new Map());
+  const [isLoading, setIsLoading] = useState(true);
+  const [loadError, setLoadError] = useState<string | null>(null);
+  // Pages of the catalog shown in the "All" view
+  const [pagesShown, setPagesShown] = useState(1);
 
+  useEffect(() => {
+    loadCatalogIndex()
+      .then(setCatalogIndex)
+      .catch((error) => {
+        console.error('Failed to load catalog index:', error);
+        setLoadError('The product catalog could not be loaded.');
+        setIsLoading(false);
+      });
+  }, []);
 
-  const categories = ['All', ...Array.from(new Set(products.map(p => p.category)))];
+  // Fetch only the shard for the selected category, or for "All" the
+  // catalog pages shown so far
+  useEffect(() => {
+    if (!catalogIndex) return;
+    let cancelled = false;
+    const category = catalogIndex.categories.find(c => c.name === selectedCategory);
+    setIsLoading(true);
+    (category ? loadCategory(category) : loadPages(catalogIndex, pagesShown))
+      .then((items) => {
+        if (cancelled) return;
+        setFilteredProducts(items);
+        setLoadedProducts(previous => {
+          const next = new Map(previous);
+          items.forEach(item => next.set(item.id, item));
+          return next;
+        });
+        setLoadError(null);
+      })
+      .catch((error) => {
+        if (cancelled) return;
+        console.error('Failed to load products:', error);
+        setLoadError('Products could not be loaded. Please try again.');
+      })
+      .finally(() => {
+        if (!cancelled) setIsLoading(false);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [catalogIndex, selectedCategory, pagesShown]);
 
-  const filteredProducts = selectedCategory === 'All'
-    ? products
-    : products.filter(p => p.category === selectedCategory);
+  const categories = ['All', ...(catalogIndex ? catalogIndex.categories.map(c => c.name) : [])];
+  const hasMorePages = selectedCategory === 'All' && catalogIndex !== null && pagesShown < catalogIndex.pages.length;
 
   const toggleFavorite = (productId: string) => {
     const newFavorites = new Set(favorites);
@@ -72,7 +116,9 @@ const ProductCatalog: React.FC = () => {
   };
 
   const getSelectedProducts = (): Product[] => {
-    return products.filter(product => selectedForRoom.has(product.id));
+    return Array.from(selectedForRoom)
+      .map(productId => loadedProducts.get(productId))
+      .filter((product): product is Product => product !== undefined);
   };
 
   const ProductCard: React.FC<{ product: Product }> = ({ product }) => (
@@ -252,7 +298,10 @@ const ProductCatalog: React.FC = () => {
           {categories.map((category) => (
             <button
               key={category}
-              onClick={() => setSelectedCategory(category)}
+              onClick={() => {
+                setSelectedCategory(category);
+                setPagesShown(1);
+              }}
               className={`px-6 py-3 rounded-button font-medium transition-all duration-300 ${
                 selectedCategory === category
                   ? 'bg-accent-500 text-white shadow-warm'
@@ -270,7 +319,30 @@ const ProductCatalog: React.FC = () => {
           ))}
         </div>
 
-        {filteredProducts.length === 0 && (
+        {hasMorePages && !loadError && (
+          <div className="text-center mt-12">
+            <button
+              onClick={() => setPagesShown(pagesShown + 1)}
+              disabled={isLoading}
+              className="bg-white text-charcoal-700 px-8 py-3 rounded-button hover:bg-accent-50 hover:text-accent-600 transition-colors font-medium shadow-soft disabled:opacity-50"
+            >
+              {isLoading ? 'Loading...' : `Show more (${(catalogIndex?.count ?? 0) - filteredProducts.length} remaining)`}
+            </button>
+          </div>
+        )}
+
+        {isLoading && filteredProducts.length === 0 && (
+          <div className="text-center py-16 text-charcoal-600">Loading products...</div>
+        )}
+
+        {loadError && (
+          <div className="text-center py-16">
+            <h3 className="text-2xl font-bold text-charcoal-900 mb-2 font-gilda">Something went wrong</h3>
+            <p className="text-charcoal-600">{loadError}</p>
+          </div>
+        )}
+
+        {!isLoading && !loadError && filteredProducts.length === 0 && (
           <div className="text-center py-16">
             <div className="text-6xl mb-4">🔍</div>
             <h3 className="text-2xl font-bold text-charcoal-900 mb-2 font-gilda">No Products Found</h3>
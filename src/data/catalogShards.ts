@@ -0,0 +1,93 @@
+import { Product } from '../types';
+
+// Built from products.ts by `npm run catalog` (catalog_artifact.py) into public/catalog
+const CATALOG_BASE = '/catalog';
+
+export interface CatalogCategory {
+  name: string;
+  slug: string;
+  file: string;
+  count: number;
+}
+
+// A run of consecutive products in catalog order
+export interface CatalogPage {
+  file: string;
+  count: number;
+}
+
+export interface CatalogIndex {
+  version: number;
+  count: number;
+  // In the order categories first appear in the catalog
+  categories: CatalogCategory[];
+  pageSize: number;
+  pages: CatalogPage[];
+  ids: string;
+  search: string;
+}
+
+export interface CatalogSearchIndex {
+  ids: string[];
+  tokens: Record<string, number[]>;
+  facets: {
+    brand: Record<string, number[]>;
+    inStock: number[];
+  };
+  prices: (number | null)[];
+}
+
+const requests = new Map<string, Promise<unknown>>();
+
+// Each file is fetched once and shared; a failed request is forgotten so it can be retried
+const fetchOnce = <T>(path: string): Promise<T> => {
+  let request = requests.get(path) as Promise<T> | undefined;
+  if (!request) {
+    request = fetch(`${CATALOG_BASE}/${path}`)
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error(`Failed to load ${path}: ${response.status}`);
+        }
+        return response.json() as Promise<T>;
+      })
+      .catch((error) => {
+        requests.delete(path);
+        throw error;
+      });
+    requests.set(path, request);
+  }
+  return request;
+};
+
+export const loadCatalogIndex = (): Promise<CatalogIndex> => fetchOnce<CatalogIndex>('index.json');
+
+export const loadCategory = (category: CatalogCategory): Promise<Product[]> => fetchOnce<Product[]>(category.file);
+
+export const loadPage = (page: CatalogPage): Promise<Product[]> => fetchOnce<Product[]>(page.file);
+
+// The first `count` pages of the catalog, in catalog order; pages already
+// fetched come from the cache, so showing one more page costs one request
+export const loadPages = async (index: CatalogIndex, count: number): Promise<Product[]> => {
+  const pages = await Promise.all(index.pages.slice(0, count).map(loadPage));
+  return pages.flat();
+};
+
+export const loadSearchIndex = async (): Promise<CatalogSearchIndex> => {
+  const index = await loadCatalogIndex();
+  return fetchOnce<CatalogSearchIndex>(index.search);
+};
+
+// Ids of products matching every word of the query, in catalog order
+export const searchProductIds = async (query: string): Promise<string[]> => {
+  const words = (query.toLowerCase().match(/[a-z0-9]+/g) ?? []).filter((word) => word.length > 1);
+  if (words.length === 0) {
+    return [];
+  }
+  const search = await loadSearchIndex();
+  let matches = new Set(search.tokens[words[0]] ?? []);
+  for (const word of words.slice(1)) {
+    const next = new Set(search.tokens[word] ?? []);
+    matches = new Set(Array.from(matches).filter((ordinal) => next.has(ordinal)));
+  }
+  return Array.from(matches).sort((a, b) => a - b).map((ordinal) => search.ids[ordinal]);
+};
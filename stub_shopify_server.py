@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the brightet.com Shopify storefront.
+
+Serves `/products.json?limit=N&page=M`, `/products/<handle>` pages and
+a `/sitemap.xml` index of `/sitemap_products_N.xml` files from a fixture
+file (or a synthetic catalog of `--products N` items) so
+the image scripts can be exercised without touching the live store.
+Synthetic catalogs also get their images served from `/cdn/shop/files/`
+as small valid JPEGs padded to `--image-kb`, with Range support.
+`--page-kb` pads product pages with header navigation markup ahead of
+the gallery, so parsing costs about as much CPU as on a real theme page;
+`--page-charset` changes the charset product pages declare (an unknown
+one makes decoding fail on the client). Pages carry an ETag and answer
+a matching If-None-Match with 304.
+Throttling can be injected to exercise the scraper's backoff: random
+429s / 503s, and 429 with Retry-After whenever more than `--max-inflight`
+requests are in progress at once. Each request's service time is kept
+for bench_pipeline.py.
+
+    python stub_shopify_server.py --port 8765 --max-inflight 4
+    python scrape_real_images.py --base-url http://127.0.0.1:8765 --rate 50
+"""
+
+import argparse
+import base64
+import hashlib
+import html
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_FIXTURE = 'fixtures/shopify_products.json'
+IMAGE_PATH = '/cdn/shop/files/'
+DEFAULT_IMAGE_KB = 64
+DEFAULT_PAGE_KB = 0
+SITEMAP_PAGE_SIZE = 5000  # URLs per product sitemap file, as on Shopify
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+# 16x16 baseline JPEG; synthetic images are this plus comment segments
+# of filler, so they decode and header-probe like the real thing
+JPEG_TEMPLATE = base64.b64decode(
+    '/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDABALDA4MChAODQ4SERATGCgaGBYWGDEjJR0oOjM9PDkzODdASFxOQERXRTc4UG1RV19iZ2hnPk1x'
+    'eXBkeFxlZ2P/2wBDARESEhgVGC8aGi9jQjhCY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2NjY2P/wAAR'
+    'CAAQABADASIAAhEBAxEB/8QAHwAAAQUBAQEBAQEAAAAAAAAAAAECAwQFBgcICQoL/8QAtRAAAgEDAwIEAwUFBAQAAAF9AQIDAAQRBRIhMUEG'
+    'E1FhByJxFDKBkaEII0KxwRVS0fAkM2JyggkKFhcYGRolJicoKSo0NTY3ODk6Q0RFRkdISUpTVFVWV1hZWmNkZWZnaGlqc3R1dnd4eXqDhIWG'
+    'h4iJipKTlJWWl5iZmqKjpKWmp6ipqrKztLW2t7i5usLDxMXGx8jJytLT1NXW19jZ2uHi4+Tl5ufo6erx8vP09fb3+Pn6/8QAHwEAAwEBAQEB'
+    'AQEBAQAAAAAAAAECAwQFBgcICQoL/8QAtREAAgECBAQDBAcFBAQAAQJ3AAECAxEEBSExBhJBUQdhcRMiMoEIFEKRobHBCSMzUvAVYnLRChYk'
+    'NOEl8RcYGRomJygpKjU2Nzg5OkNERUZHSElKU1RVVldYWVpjZGVmZ2hpanN0dXZ3eHl6goOEhYaHiImKkpOUlZaXmJmaoqOkpaanqKmqsrO0'
+    'tba3uLm6wsPExcbHyMnK0tPU1dbX2Nna4uPk5ebn6Onq8vP09fb3+Pn6/9oADAMBAAIRAxEAPwDaooorzzc//9k='
+)
+
+SYNTHETIC_CATEGORIES = ['Chandeliers', 'Pendant Lights', 'Wall Sconces', 'Table Lamps', 'Floor Lamps',
+                        'Ceiling Lights', 'Outdoor Lighting', 'Bathroom Lighting']
+
+
+class StubShopifyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; without TCP_NODELAY small
+    # responses stall ~40ms on delayed ACKs and swamp the injected latency
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_response(self, code, message=None):
+        self.status_code = code
+        super().send_response(code, message)
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def send_json(self, payload, status=200):
+        self.send_body(status, json.dumps(payload).encode('utf-8'), 'application/json')
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        started = time.perf_counter()
+        self.status_code = None
+        throttled = self.server.enter()
+        try:
+            if throttled is not None:
+                self.send_throttled(*throttled)
+                return
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            if parsed.path == '/products.json':
+                self.serve_products_json(query)
+            elif parsed.path == '/sitemap.xml':
+                self.serve_sitemap_index()
+            elif parsed.path.startswith('/sitemap_products_') and parsed.path.endswith('.xml'):
+                self.serve_product_sitemap(parsed.path[len('/sitemap_products_'):-len('.xml')])
+            elif parsed.path.startswith('/products/'):
+                self.serve_product_page(parsed.path[len('/products/'):])
+            elif parsed.path.startswith(IMAGE_PATH):
+                self.serve_image(parsed.path[len(IMAGE_PATH):])
+            else:
+                self.send_body(404, b'Not Found', 'text/plain')
+        finally:
+            self.server.leave(request_kind(parsed.path), self.status_code, time.perf_counter() - started)
+
+    def send_throttled(self, status, retry_after):
+        self.send_response(status)
+        if retry_after is not None:
+            self.send_header('Retry-After', str(retry_after))
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_HEAD = do_GET
+
+    def serve_products_json(self, query):
+        limit = min(int(query.get('limit', ['30'])[0]), 250)
+        page = max(int(query.get('page', ['1'])[0]), 1)
+        start = (page - 1) * limit
+        products = [self.server.absolute(product) for product in self.server.catalog[start:start + limit]]
+        self.send_json({'products': products})
+
+    def serve_sitemap_index(self):
+        base_url = self.server.base_url
+        pages = max(1, -(-len(self.server.catalog) // self.server.sitemap_page_size))
+        entries = [f'<sitemap><loc>{base_url}/sitemap_products_{n}.xml</loc></sitemap>'
+                   for n in range(1, pages + 1)]
+        entries.append(f'<sitemap><loc>{base_url}/sitemap_pages_1.xml</loc></sitemap>')
+        body = f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="{SITEMAP_NS}">{"".join(entries)}</sitemapindex>'
+        self.send_body(200, body.encode('utf-8'), 'application/xml; charset=utf-8')
+
+    def serve_product_sitemap(self, number):
+        if not number.isdigit() or int(number) < 1:
+            self.send_body(404, b'Not Found', 'text/plain')
+            return
+        size = self.server.sitemap_page_size
+        start = (int(number) - 1) * size
+        entries = ''.join(
+            f'<url><loc>{self.server.base_url}/products/{html.escape(product["handle"])}</loc>'
+            f'<lastmod>{product.get("updated_at") or self.server.updated_at}</lastmod></url>'
+            for product in self.server.catalog[start:start + size] if product.get('handle'))
+        body = f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="{SITEMAP_NS}">{entries}</urlset>'
+        self.send_body(200, body.encode('utf-8'), 'application/xml; charset=utf-8')
+
+    def serve_product_page(self, handle):
+        product = self.server.by_handle.get(handle.rstrip('/'))
+        if product is None:
+            self.send_body(404, b'Not Found', 'text/html; charset=utf-8')
+            return
+        body = render_product_page(self.server.absolute(product), self.server.page_padding).encode('utf-8')
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', f'text/html; charset={self.server.page_charset}')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def serve_image(self, name):
+        if self.server.image_kb is None:
+            self.send_body(404, b'Not Found', 'text/plain')
+            return
+        body = synthetic_image(name, self.server.image_kb)
+        etag = '"%s"' % hashlib.md5(body).hexdigest()
+        start, end = 0, len(body) - 1
+        byte_range = self.headers.get('Range', '')
+        if byte_range.startswith('bytes=') and self.headers.get('If-Range', etag) == etag:
+            first, _, last = byte_range[len('bytes='):].partition('-')
+            if first:
+                start = int(first)
+                end = min(int(last), end) if last else end
+            else:
+                start = max(0, len(body) - int(last))
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{len(body)}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(body)}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'image/jpeg')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body[start:end + 1])
+
+
+def page_padding(size_kb):
+    """
+    About `size_kb` of mega-menu markup, like the header a theme renders
+    before the product section
+    """
+    if not size_kb:
+        return ''
+    items = []
+    size = 0
+    n = 0
+    while size < size_kb * 1024:
+        category = SYNTHETIC_CATEGORIES[n % len(SYNTHETIC_CATEGORIES)]
+        item = (f'<li class="mega-menu__item"><a href="/collections/{category.lower().replace(" ", "-")}?page={n}" '
+                f'class="mega-menu__link link"><span class="visually-hidden">Shop</span>{html.escape(category)} '
+                f'<svg aria-hidden="true" class="icon icon-caret" viewBox="0 0 10 6"><path d="M9 1 5 5 1 1"/></svg>'
+                f'</a></li>')
+        items.append(item)
+        size += len(item)
+        n += 1
+    return f'<header class="header"><nav><ul class="mega-menu__list">{"".join(items)}</ul></nav></header>'
+
+
+def render_product_page(product, padding=''):
+    """
+    Minimal Dawn-style product page with the gallery near the top,
+    after an optional block of header markup
+    """
+    title = html.escape(product.get('title', ''))
+    media = ''.join(
+        f'<li class="product__media-item"><div class="product__media media">'
+        f'<img src="{html.escape(image["src"])}&width=1946" alt="{title}" class="product__media-img"></div></li>'
+        for image in sorted(product.get('images', []), key=lambda image: image.get('position') or 0)
+    )
+    return (f'<!doctype html><html lang="en"><head><meta charset="utf-8"><title>{title}</title></head>'
+            f'<body>{padding}<main id="MainContent"><div class="product grid">'
+            f'<div class="product__media-wrapper"><ul class="product__media-list">{media}</ul></div>'
+            f'<div class="product__info-wrapper"><h1 class="product__title">{title}</h1></div>'
+            f'</div></main></body></html>')
+
+
+def request_kind(path):
+    if path == '/products.json':
+        return 'feed'
+    if path.startswith('/products/'):
+        return 'page'
+    if path.startswith(IMAGE_PATH):
+        return 'image'
+    if path.startswith('/sitemap'):
+        return 'sitemap'
+    return 'other'
+
+
+def synthetic_image(name, size_kb=DEFAULT_IMAGE_KB):
+    """
+    Deterministic JPEG of roughly `size_kb` KB whose bytes differ per name
+    """
+    seed = hashlib.sha256(name.encode('utf-8')).digest()
+    filler = (seed * (size_kb * 1024 // len(seed) + 1))[:max(0, size_kb * 1024 - len(JPEG_TEMPLATE))]
+    segments = []
+    # COM segments hold at most 65533 bytes each
+    for start in range(0, len(filler), 65533):
+        chunk = filler[start:start + 65533]
+        segments.append(b'\xff\xfe' + (len(chunk) + 2).to_bytes(2, 'big') + chunk)
+    # Filler goes right before the scan, after the frame header, as in
+    # real files where the bulk is entropy-coded data
+    scan = JPEG_TEMPLATE.index(b'\xff\xda')
+    return JPEG_TEMPLATE[:scan] + b''.join(segments) + JPEG_TEMPLATE[scan:]
+
+
+def synthetic_catalog(count, seed=0, images_per_product=3):
+    """
+    Shopify-style products with image paths served by the stub itself
+    """
+    rng = random.Random(seed)
+    catalog = []
+    for n in range(count):
+        product_id = 8000000000000 + n
+        handle = f"synthetic-light-{n:05d}"
+        category = SYNTHETIC_CATEGORIES[n % len(SYNTHETIC_CATEGORIES)]
+        catalog.append({
+            'id': product_id,
+            'title': f"Synthetic {category[:-1]} {n:05d}",
+            'handle': handle,
+            'vendor': 'Brightet',
+            'product_type': category,
+            'images': [{
+                'id': product_id * 10 + position,
+                'position': position,
+                'src': f"{IMAGE_PATH}{handle}-{position}.jpg?v={rng.randrange(10 ** 9, 10 ** 10)}",
+                'width': 1500,
+                'height': 1500,
+            } for position in range(1, images_per_product + 1)],
+        })
+    return catalog
+
+
+class StubShopifyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, catalog, host='127.0.0.1', port=0, verbose=False,
+                 throttle_rate=0.0, error_rate=0.0, max_inflight=None, retry_after=1, latency=0.0, seed=None,
+                 image_kb=None, page_kb=DEFAULT_PAGE_KB, page_charset='utf-8'):
+        super().__init__((host, port), StubShopifyHandler)
+        self.catalog = catalog
+        self.by_handle = {product.get('handle'): product for product in catalog}
+        self.verbose = verbose
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.max_inflight = max_inflight
+        self.retry_after = retry_after
+        self.latency = latency
+        self.image_kb = image_kb
+        self.page_padding = page_padding(page_kb)
+        self.page_charset = page_charset
+        self.sitemap_page_size = SITEMAP_PAGE_SIZE
+        # lastmod for products without their own updated_at
+        self.updated_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        self.random = random.Random(seed)
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.timings = []
+        self._lock = threading.Lock()
+
+    def enter(self):
+        """
+        Count a request in; returns (status, retry_after) when it should be
+        rejected instead of served
+        """
+        with self._lock:
+            self.requests += 1
+            self.inflight += 1
+            self.peak_inflight = max(self.peak_inflight, self.inflight)
+            if self.max_inflight and self.inflight > self.max_inflight:
+                self.throttled += 1
+                return 429, self.retry_after
+            roll = self.random.random()
+            if roll < self.throttle_rate:
+                self.throttled += 1
+                return 429, self.retry_after
+            if roll < self.throttle_rate + self.error_rate:
+                self.throttled += 1
+                return 503, None
+            return None
+
+    def leave(self, kind='other', status_code=None, seconds=None):
+        with self._lock:
+            self.inflight -= 1
+            if seconds is not None:
+                self.timings.append((kind, status_code, seconds))
+
+    def reset_stats(self):
+        with self._lock:
+            self.peak_inflight = self.inflight
+            self.requests = 0
+            self.throttled = 0
+            self.timings = []
+
+    def absolute(self, product):
+        """
+        Product with stub-relative image paths turned into full URLs
+        """
+        images = product.get('images', [])
+        if not any(image.get('src', '').startswith('/') for image in images):
+            return product
+        product = dict(product)
+        product['images'] = [dict(image, src=self.base_url + image['src']) if image.get('src', '').startswith('/')
+                             else image for image in images]
+        return product
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def load_fixture(path=DEFAULT_FIXTURE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)['products']
+
+
+def start_stub_server(catalog=None, port=0, verbose=False, **options):
+    """
+    Start the stub server on a background thread and return it.
+    Call `server.shutdown()` when done.
+    """
+    if catalog is None:
+        catalog = load_fixture()
+    server = StubShopifyServer(catalog, port=port, verbose=verbose, **options)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Shopify stand-in server")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fixture', default=DEFAULT_FIXTURE)
+    parser.add_argument('--products', type=int, default=None,
+                        help="serve a synthetic catalog of this many products instead of the fixture")
+    parser.add_argument('--image-kb', type=int, default=DEFAULT_IMAGE_KB,
+                        help="size of the synthetic images served for a synthetic catalog")
+    parser.add_argument('--page-kb', type=int, default=DEFAULT_PAGE_KB,
+                        help="pad product pages with this much header markup before the gallery")
+    parser.add_argument('--page-charset', default='utf-8',
+                        help="charset declared for product pages (e.g. an unknown one to test decode errors)")
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help="fraction of requests answered with 429")
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="fraction of requests answered with 503")
+    parser.add_argument('--max-inflight', type=int, default=None,
+                        help="answer 429 whenever more requests than this are in progress")
+    parser.add_argument('--retry-after', type=int, default=1,
+                        help="Retry-After seconds sent with 429 responses")
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="seconds each served response is delayed")
+    args = parser.parse_args()
+
+    synthetic = args.products is not None
+    server = StubShopifyServer(synthetic_catalog(args.products) if synthetic else load_fixture(args.fixture),
+                               port=args.port, verbose=True,
+                               throttle_rate=args.throttle_rate, error_rate=args.error_rate,
+                               max_inflight=args.max_inflight, retry_after=args.retry_after,
+                               latency=args.latency, image_kb=args.image_kb if synthetic else None,
+                               page_kb=args.page_kb, page_charset=args.page_charset)
+    print(f"🧪 Stub Shopify store serving {len(server.catalog)} products at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
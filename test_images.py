@@ -1,54 +1,90 @@
-import requests
-import re
+import sys
 import time
 
-def test_image_url(url, timeout=10):
+import http_client
+import http_cache
+import image_status
+import image_tools
+import pipeline
+
+def test_image_url(url, timeout=10, store=None):
     """Test if an image URL is accessible"""
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        response = requests.head(url, headers=headers, timeout=timeout)
-        return response.status_code == 200
-    except:
-        return False
-
-def extract_brightet_images():
-    """Extract all brightet.com image URLs from products.ts"""
-    with open('src/data/products.ts', 'r', encoding='utf-8') as file:
-        content = file.read()
-    
-    # Find all brightet.com image URLs
-    pattern = r'image:\s*[\'"]([^\'\"]*brightet\.com[^\'\"]*)[\'"]'
-    matches = re.findall(pattern, content)
-    
-    return matches
+    if store is not None:
+        record, _ = store.check(url, timeout)
+    else:
+        record = image_status.probe_image(url, timeout)
+    return is_working(record)
+
+def is_working(record):
+    if record.get('method') == 'range':
+        return image_status.range_problem(record) is None
+    return record['status_code'] == 200
+
+def extract_brightet_images(products, host='brightet.com'):
+    """Yield every brightet.com image URL, one product at a time"""
+    for record in products:
+        if host in record['image']:
+            yield record['image']
+
+def check_image(url, store, delay=0):
+    """
+    Pipeline stage: probe one image URL, or reuse the stored result for the same file
+    """
+    record, probed = store.check(url)
+    if probed and delay:
+        time.sleep(delay)  # Be respectful to the server
+    return record, probed
 
-def main():
+def add_arguments(parser):
+    parser.add_argument('--host', default='brightet.com',
+                        help="only test image URLs containing this host")
+    parser.add_argument('--delay', type=float, default=0.5,
+                        help="seconds to wait after each network probe")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="images probed in parallel (results are still reported in catalog order)")
+    http_cache.add_cache_arguments(parser)
+    image_status.add_status_arguments(parser)
+
+def run(session, args):
+    http_client.configure_cache(args)
+    # One pooled connection per probe worker; no HostThrottle here, so the
+    # transport keeps its own 5xx / Retry-After retries
+    http_client.get_session(args.workers, throttled=False)
     print("🧪 Testing all real brightet.com product images...")
     
-    image_urls = extract_brightet_images()
-    print(f"📦 Found {len(image_urls)} brightet.com images to test")
+    store = session.status_store(args)
     
+    # URLs stream from products.ts through the probes; products sharing an
+    # image file reuse the stored result instead of probing again
     working_images = 0
     broken_images = 0
-    
-    for i, url in enumerate(image_urls, 1):
-        print(f"[{i}/{len(image_urls)}] Testing: {url[:80]}...")
-        
-        if test_image_url(url):
-            print(f"   ✅ Working")
+    checked = pipeline.ordered_map(lambda url: check_image(url, store, args.delay),
+                                   extract_brightet_images(session.products('image'), args.host), args.workers)
+    for i, (url, (record, probed)) in enumerate(checked, 1):
+        print(f"[{i}] Testing: {url[:80]}...")
+        reused = '' if probed else ' (already checked)'
+        if is_working(record):
+            print(f"   ✅ Working{reused}")
             working_images += 1
         else:
-            print(f"   ❌ Broken")
+            problem = image_status.range_problem(record) if record.get('method') == 'range' else None
+            print(f"   ❌ Broken{reused}{': ' + problem if problem else ''}")
             broken_images += 1
-        
-        time.sleep(0.5)  # Be respectful to the server
+    
+    store.save()
+    print(store.report())
     
     print(f"\n🎉 Test Results:")
     print(f"   ✅ Working images: {working_images}")
     print(f"   ❌ Broken images: {broken_images}")
-    print(f"   📈 Success rate: {(working_images/len(image_urls)*100):.1f}%")
+    total = working_images + broken_images
+    print(f"   📈 Success rate: {(working_images / total * 100) if total else 0.0:.1f}%")
+    
+    if http_client.get_cache() is not None:
+        print(http_client.cache_report())
+
+def main(argv=None):
+    image_tools.main(['probe'] + (sys.argv[1:] if argv is None else list(argv)))
 
 if __name__ == "__main__":
     main()
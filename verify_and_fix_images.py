@@ -1,33 +1,46 @@
-import requests
-import re
-import json
+import sys
 import time
-from urllib.parse import urlparse
 
-def test_image_accessibility(image_url, timeout=10):
+import http_client
+import http_cache
+import image_status
+import image_tools
+import metrics
+import pipeline
+
+FIXES_PATH = 'image_fixes.json'
+REQUIRED_FIELDS = ('id', 'name', 'image', 'category')
+
+def accessibility_from_record(record):
     """
-    Test if an image URL is accessible and returns a valid image
+    Interpret a stored probe result: reachable and served as an image
     """
-    try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.head(image_url, headers=headers, timeout=timeout)
-        
-        if response.status_code == 200:
-            content_type = response.headers.get('content-type', '').lower()
-            if any(img_type in content_type for img_type in ['image/jpeg', 'image/jpg', 'image/png', 'image/webp']):
-                return True, "OK"
-            else:
-                return False, f"Invalid content type: {content_type}"
+    if record.get('method') == 'range':
+        # Range probe parsed the bytes themselves; trust that over the header
+        problem = image_status.range_problem(record)
+        if problem:
+            return False, problem
+        return True, image_status.describe_range_record(record)
+    if record['error']:
+        return False, record['error']
+    if record['status_code'] == 200:
+        content_type = record['content_type']
+        if any(img_type in content_type for img_type in ['image/jpeg', 'image/jpg', 'image/png', 'image/webp']):
+            return True, "OK"
         else:
-            return False, f"HTTP {response.status_code}"
-            
-    except requests.exceptions.RequestException as e:
-        return False, f"Request failed: {str(e)}"
-    except Exception as e:
-        return False, f"Error: {str(e)}"
+            return False, f"Invalid content type: {content_type}"
+    else:
+        return False, f"HTTP {record['status_code']}"
+
+def test_image_accessibility(image_url, timeout=10, store=None):
+    """
+    Test if an image URL is accessible and returns a valid image
+    """
+    if store is not None:
+        record, _ = store.check(image_url, timeout)
+    else:
+        record = image_status.probe_image(image_url, timeout)
+    return accessibility_from_record(record)
 
 def get_alternative_brightet_images():
     """
@@ -68,35 +81,16 @@ def get_alternative_brightet_images():
     
     return alternative_images
 
-def extract_products_with_images():
+def check_product_image(record, store, delay=0):
     """
-    Extract all products and their current image URLs from the TypeScript file
+    Pipeline stage: probe the product's current image, or reuse the
+    stored result for the same file
     """
-    products = []
-    
-    with open('src/data/products.ts', 'r', encoding='utf-8') as file:
-        content = file.read()
-    
-    # More comprehensive regex to extract product data
-    product_pattern = r'\{[^}]*id:\s*[\'"]([^\'"]*)[\'"][^}]*name:\s*[\'"]([^\'"]*)[\'"][^}]*image:\s*[\'"]([^\'"]*)[\'"][^}]*category:\s*[\'"]([^\'"]*)[\'"][^}]*\}'
-    
-    matches = re.findall(product_pattern, content, re.DOTALL)
-    
-    for match in matches:
-        product_id, name, image_url, category = match
-        # Clean up the data
-        name = name.replace('\\"', '"').strip()
-        image_url = image_url.strip()
-        category = category.strip()
-        
-        products.append({
-            'id': product_id,
-            'name': name,
-            'image': image_url,
-            'category': category
-        })
-    
-    return products
+    probe, probed = store.check(record['image'].strip())
+    if probed and delay:
+        # Small delay to be respectful
+        time.sleep(delay)
+    return accessibility_from_record(probe)
 
 def assign_alternative_image(category, used_alternatives):
     """
@@ -127,49 +121,20 @@ def assign_alternative_image(category, used_alternatives):
     key = available_keys[len(used_alternatives) % len(available_keys)]
     return alternatives[key]
 
-def update_products_with_fixed_images(image_updates):
+def fix_broken_images(checked, store, stats, fixes, progress, used_alternatives):
     """
-    Update the products.ts file with fixed image URLs
+    Pipeline stage: report each checked product, pick a replacement for
+    broken Unsplash placeholders and yield (product, new image) for
+    every fix. Fixes are also written to `fixes` as they are found.
     """
-    with open('src/data/products.ts', 'r', encoding='utf-8') as file:
-        content = file.read()
-    
-    # Replace image URLs
-    for product_id, new_image_url in image_updates.items():
-        # Find the product and replace its image URL
-        pattern = r'(id:\s*[\'"]' + re.escape(product_id) + r'[\'"][^}]*image:\s*[\'"])[^\'"]*([\'"],[^}]*)'
-        replacement = r'\1' + new_image_url + r'\2'
-        content = re.sub(pattern, replacement, content, flags=re.DOTALL)
-    
-    # Write back to file
-    with open('src/data/products.ts', 'w', encoding='utf-8') as file:
-        file.write(content)
-
-def main():
-    print("🔍 Verifying and fixing all product images...")
-    
-    # Extract all products with their current images
-    products = extract_products_with_images()
-    print(f"📦 Found {len(products)} products to verify")
-    
-    # Track results
-    accessible_images = 0
-    broken_images = 0
-    fixed_images = 0
-    image_updates = {}
-    used_alternatives = set()
-    
-    print("\n🧪 Testing image accessibility...")
-    
-    for i, product in enumerate(products, 1):
-        print(f"[{i}/{len(products)}] Testing: {product['name'][:50]}...")
-        
-        # Test current image
-        is_accessible, status = test_image_accessibility(product['image'])
+    for i, (product, (is_accessible, status)) in enumerate(checked, 1):
+        stats['total'] += 1
+        name = product['name'].strip()
+        print(f"[{i}] Testing: {name[:50]}...")
         
         if is_accessible:
             print(f"   ✅ Image accessible: {status}")
-            accessible_images += 1
+            stats['accessible'] += 1
         else:
             print(f"   ❌ Image broken: {status}")
             print(f"   🔄 Finding alternative image...")
@@ -177,50 +142,81 @@ def main():
             # Check if it's an Unsplash placeholder (needs replacement)
             if 'unsplash.com' in product['image']:
                 # Assign real brightet.com alternative
-                alternative_image = assign_alternative_image(product['category'], used_alternatives)
+                alternative_image = assign_alternative_image(product['category'].strip(), used_alternatives)
                 
-                # Test the alternative
-                alt_accessible, alt_status = test_image_accessibility(alternative_image)
+                # Test the alternative (probed at most once per run)
+                alt_accessible, alt_status = test_image_accessibility(alternative_image, store=store)
                 
                 if alt_accessible:
-                    image_updates[product['id']] = alternative_image
                     print(f"   ✅ Alternative found: {alternative_image}")
-                    fixed_images += 1
+                    stats['fixed'] += 1
+                    fixes.add(product['id'], alternative_image)
+                    yield product, alternative_image
                 else:
                     print(f"   ❌ Alternative also broken: {alt_status}")
-                    broken_images += 1
+                    stats['broken'] += 1
             else:
-                broken_images += 1
+                stats['broken'] += 1
         
-        # Small delay to be respectful
-        time.sleep(0.5)
-        
-        # Progress update every 10 items
-        if i % 10 == 0:
-            print(f"\n📊 Progress: {i}/{len(products)}")
-            print(f"   ✅ Accessible: {accessible_images}")
-            print(f"   🔄 Fixed: {fixed_images}")
-            print(f"   ❌ Still broken: {broken_images}")
+        progress.update()
+
+def add_arguments(parser):
+    parser.add_argument('--delay', type=float, default=0.5,
+                        help="seconds to wait after each network probe")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="images probed in parallel (results are still reported in catalog order)")
+    http_cache.add_cache_arguments(parser)
+    image_status.add_status_arguments(parser)
+
+def run(session, args):
+    http_client.configure_cache(args)
+    # One pooled connection per probe worker; no HostThrottle here, so the
+    # transport keeps its own 5xx / Retry-After retries
+    http_client.get_session(args.workers, throttled=False)
+    print("🔍 Verifying and fixing all product images...")
+    
+    # Products stream through probe -> report/fix one at a time: the
+    # catalog and probe results are never all held in memory, and fixes
+    # go to disk as they're found
+    store = session.status_store(args)
+    stats = {'total': 0, 'accessible': 0, 'fixed': 0, 'broken': 0}
+    # One entry per alternative image key, so this stays small
+    used_alternatives = set()
+    progress = metrics.ProgressReporter(
+        None, 'verified', args.progress_interval,
+        lambda: f"✅ {stats['accessible']} accessible, 🔄 {stats['fixed']} fixed, ❌ {stats['broken']} broken")
+    
+    print("\n🧪 Testing image accessibility...")
+    with pipeline.JSONObjectWriter(FIXES_PATH) as fixes:
+        checked = pipeline.ordered_map(lambda product: check_product_image(product, store, args.delay),
+                                       session.products(*REQUIRED_FIELDS), args.workers)
+        # Spliced into products.ts as they're found when verify runs alone
+        written = session.patch_images(fix_broken_images(checked, store, stats, fixes, progress,
+                                                         used_alternatives))
+    progress.finish()
     
     print(f"\n🎉 Verification completed!")
-    print(f"   ✅ Accessible images: {accessible_images}")
-    print(f"   🔄 Fixed images: {fixed_images}")
-    print(f"   ❌ Still broken: {broken_images}")
+    print(f"   ✅ Accessible images: {stats['accessible']}")
+    print(f"   🔄 Fixed images: {stats['fixed']}")
+    print(f"   ❌ Still broken: {stats['broken']}")
     
-    # Update the file with fixes
-    if image_updates:
-        print(f"\n🔄 Updating products.ts with {len(image_updates)} fixed images...")
-        update_products_with_fixed_images(image_updates)
-        print("✅ Products file updated with fixed images!")
-        
-        # Save the updates for reference
-        with open('image_fixes.json', 'w') as f:
-            json.dump(image_updates, f, indent=2)
-        print("💾 Image fixes saved to image_fixes.json")
+    if fixes.count:
+        print(f"💾 Image fixes saved to {FIXES_PATH}")
+    if written:
+        print(f"✅ Products file updated: {written} images changed")
+    
+    total_working = stats['accessible'] + stats['fixed']
+    success_rate = (total_working / stats['total']) * 100 if stats['total'] else 0.0
+    print(f"\n📈 Final success rate: {success_rate:.1f}% ({total_working}/{stats['total']} images working)")
     
-    total_working = accessible_images + fixed_images
-    success_rate = (total_working / len(products)) * 100
-    print(f"\n📈 Final success rate: {success_rate:.1f}% ({total_working}/{len(products)} images working)")
+    store.save()
+    print(store.report())
+    
+    if http_client.get_cache() is not None:
+        print(http_client.cache_report())
+
+def main(argv=None):
+    image_tools.main(['verify'] + (sys.argv[1:] if argv is None else list(argv)))
 
 if __name__ == "__main__":
     main()